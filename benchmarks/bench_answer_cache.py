@@ -0,0 +1,81 @@
+# bench_answer_cache.py
+# Offline hit-rate check for common.answer_cache: replays skewed analyst
+# traffic (a few questions, typed with varying case/punctuation/wording,
+# over several statements) against a stubbed LLM and the stub bag-of-words
+# embedder from fake_openai. No network.
+#
+#   python benchmarks/bench_answer_cache.py [--requests 5000] [--threshold 0.8] [--llm-ms 1500]
+import os, sys, time, random, argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from common.answer_cache import AnswerCache
+from fake_openai import bow_vector
+
+SYSTEM = "You are a bank financial analyst. Be concise and numeric."
+# canonical question -> ways analysts actually type it
+QUESTIONS = {
+    "ci": ["Is cost-to-income healthy?", "is cost to income healthy", "Is the cost-to-income healthy?",
+           "IS COST-TO-INCOME HEALTHY??", "is cost-to-income ratio healthy?"],
+    "npl": ["How is the NPL ratio trending?", "how is the npl ratio trending", "How is NPL ratio trending?"],
+    "cov": ["Is coverage adequate?", "is coverage adequate", "Is the coverage ratio adequate?"],
+    "roa": ["What drives ROA this quarter?", "what drives roa this quarter", "What drives the ROA this quarter?"],
+    "eps": ["Why did EPS change year on year?", "why did eps change year on year?", "Why did EPS change YoY?"],
+    "tax": ["Explain the effective tax rate.", "explain the effective tax rate", "Explain effective tax rate"],
+}
+
+
+def traffic(n, contexts, seed=0):
+    rng = random.Random(seed)
+    qids = list(QUESTIONS)
+    weights = [1 / (i + 1) for i in range(len(qids))]  # Zipf-ish: "ci" dominates
+    for _ in range(n):
+        qid = rng.choices(qids, weights)[0]
+        yield rng.choice(contexts), qid, rng.choice(QUESTIONS[qid])
+
+
+def run(cache, requests, contexts):
+    calls = wrong = 0
+    t_lookup = 0.0
+    for ctx, qid, prompt in traffic(requests, contexts):
+        def llm():
+            nonlocal calls
+            calls += 1
+            return f"{ctx}|{qid}"
+        t0 = time.perf_counter()
+        answer = cache.get_or_call("gpt-4o-mini", SYSTEM, ctx, prompt, llm) if cache else llm()
+        t_lookup += time.perf_counter() - t0
+        wrong += answer != f"{ctx}|{qid}"
+    return calls, wrong, t_lookup
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=5000)
+    ap.add_argument("--statements", type=int, default=20)
+    ap.add_argument("--threshold", type=float, default=0.8, help="semantic tier threshold (stub embedder)")
+    ap.add_argument("--llm-ms", type=float, default=1500, help="assumed cost of one real completion")
+    args = ap.parse_args()
+
+    contexts = [f"Key metrics & ratios for statement {i} ..." for i in range(args.statements)]
+    embed = lambda texts: [bow_vector(t) for t in texts]
+    setups = [
+        ("no cache", None),
+        ("exact", AnswerCache(max_entries=1024, ttl=3600)),
+        (f"exact+semantic@{args.threshold}", AnswerCache(max_entries=1024, ttl=3600, embed=embed,
+                                                         threshold=args.threshold)),
+    ]
+    print(f"{args.requests} questions over {args.statements} statements, "
+          f"{sum(map(len, QUESTIONS.values()))} phrasings of {len(QUESTIONS)} questions")
+    for name, cache in setups:
+        calls, wrong, t = run(cache, args.requests, contexts)
+        st = cache.stats() if cache else {}
+        print(f"{name:<22} llm calls={calls:5d}  hit rate={1 - calls / args.requests:6.1%}  "
+              f"(exact {st.get('exact_hits', 0)}, semantic {st.get('semantic_hits', 0)})  "
+              f"wrong answers={wrong}  cache overhead={t / args.requests * 1e6:6.1f} us/q  "
+              f"LLM time saved~{(args.requests - calls) * args.llm_ms / 1e3 / 60:.0f} min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# bench_api.py
+# What a script pays to get a WHOOP analysis, and the ENBD report, as
+#   html page      POST / (the dashboard, charts inlined as base64)
+#   json           GET /api/v1/whoop/<hash>/summary (+ the three PNGs once)
+#   304            the same GETs with If-None-Match (nothing recomputed)
+# on response bytes and per-request latency. The apps run from a temp
+# directory so uploads and caches do not touch the repo.
+#
+#   python benchmarks/bench_api.py [--n 200]
+import io, os, sys, time, argparse, tempfile, shutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "enbd"))
+sys.path.insert(0, os.path.join(ROOT, "whoop"))
+sys.path.insert(0, ROOT)
+
+PDF_PATH = os.path.join(ROOT, "enbd", "emirates_nbd_financial_statements_q1_2025_english.pdf")
+CSV_PATH = os.path.join(ROOT, "whoop", "physiological_cycles_today.csv")
+
+
+def timed(n, request):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        r = request()
+    return (time.perf_counter() - t0) / n * 1e3, r
+
+
+def row(label, ms, r):
+    print(f"  {label:22s} {r.status_code}  {len(r.data):9,d} B  {ms:8.2f} ms/request")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(tmp)
+    os.environ.setdefault("WHOOP_HISTORY", "0")
+    try:
+        import whoop_flassk_genai_3 as whoop
+        import financial_statement_flask as enbd
+
+        with open(CSV_PATH, "rb") as fh:
+            data = fh.read()
+        client = whoop.app.test_client()
+
+        def page():
+            return client.post("/", data={"file": (io.BytesIO(data), "cycles.csv")},
+                               content_type="multipart/form-data")
+        page()  # warm the page model and chart caches
+        print(f"WHOOP ({len(data):,} B export)")
+        row("html page (cached)", *timed(args.n, page))
+        r = client.post("/api/v1/whoop/uploads", data={"file": (io.BytesIO(data), "cycles.csv")},
+                        content_type="multipart/form-data")
+        summary, charts = r.json["summary"], list(r.json["charts"].values())
+        row("json summary (cold)", *timed(1, lambda: client.get(summary)))
+        ms, r = timed(args.n, lambda: client.get(summary))
+        row("json summary (cached)", ms, r)
+        etag = r.headers["ETag"]
+        row("json summary 304", *timed(args.n, lambda: client.get(summary, headers={"If-None-Match": etag})))
+        png = sum(len(client.get(url).data) for url in charts)
+        print(f"  charts as PNG resources {png:,} B once, then 304s")
+
+        client = enbd.app.test_client()
+        with open(PDF_PATH, "rb") as fh:
+            pdf = fh.read()
+        r = client.post("/api/v1/statements", data={"pdf_file": (io.BytesIO(pdf), "q1.pdf")},
+                        content_type="multipart/form-data")
+        url, etag = r.headers["Location"], r.headers["ETag"]
+        print(f"ENBD ({len(pdf):,} B statement)")
+        row("html report (cached)", *timed(args.n, lambda: client.get(url.replace("/api/v1/statements", "/report"))))
+        row("json report (cached)", *timed(args.n, lambda: client.get(url)))
+        row("json report 304", *timed(args.n, lambda: client.get(url, headers={"If-None-Match": etag})))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# bench_charts.py
+# WHOOP dashboard chart cost (bar + two pies per page):
+#   pyplot      the old make_bar_chart/make_pie_chart (global pyplot state, serialised by a lock)
+#   oo          whoop/charts.py Figure/Agg rendering, cache disabled
+#   oo+pool     same, the three charts rendered on a process pool
+#   cached      repeat page with the PNG cache warm
+# Single-threaded page latency, then pages/s from --threads request threads.
+#
+#   python benchmarks/bench_charts.py [--pages 40] [--threads 8] [--processes 3]
+import os, io, sys, time, base64, argparse, threading
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "whoop"))
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import charts
+
+_pyplot_lock = threading.Lock()  # pyplot is not thread-safe; the old code needed this to survive threads
+
+
+def legacy_page(averages, low, high, total):
+    def to_b64(fig):
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", bbox_inches='tight')
+        plt.close(fig)
+        return base64.b64encode(buf.getvalue()).decode()
+    with _pyplot_lock:
+        fig, ax = plt.subplots(figsize=(7, 3))
+        ax.bar(list(averages.keys()), list(averages.values()))
+        ax.set_ylabel('Average Value'); ax.set_title('Average Key Metrics'); plt.xticks(rotation=20)
+        out = [to_b64(fig)]
+        for n, title in [(low, "Low Recovery Days"), (high, "High Sleep Debt Days")]:
+            fig, ax = plt.subplots(figsize=(4, 4))
+            ax.pie([n, total - n], labels=["x", "y"], autopct='%1.1f%%', startangle=90)
+            ax.set_title(title)
+            out.append(to_b64(fig))
+    return out
+
+
+def new_page(averages, low, high, total, processes=0):
+    return charts.render_charts([
+        charts.bar_spec(averages),
+        charts.pie_spec(["x", "y"], [low, total - low], "Low Recovery Days"),
+        charts.pie_spec(["x", "y"], [high, total - high], "High Sleep Debt Days"),
+    ], processes=processes)
+
+
+def page_args(i):
+    # distinct data per page so the cache only helps when asked to
+    return ({"Recovery": 50 + i % 30, "Rest HR": 55.0, "HRV": 60 + i % 7, "Sleep Perf": 80.0, "Sleep Debt": 40.0},
+            5 + i % 11, 3 + i % 5, 60)
+
+
+def timed(fn, pages, threads):
+    t0 = time.perf_counter()
+    if threads == 1:
+        for i in range(pages):
+            fn(i)
+    else:
+        with ThreadPoolExecutor(threads) as ex:
+            list(ex.map(fn, range(pages)))
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=40)
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--processes", type=int, default=3)
+    args = ap.parse_args()
+
+    def uncached(processes):
+        def run(i):
+            charts.cache.clear()
+            return new_page(*page_args(i), processes=processes)
+        return run
+
+    new_page(*page_args(0), processes=args.processes)  # warm fonts and the pool
+    legacy_page(*page_args(0))
+    cases = [
+        ("pyplot", lambda i: legacy_page(*page_args(i))),
+        ("oo", uncached(0)),
+        (f"oo+pool({args.processes})", uncached(args.processes)),
+        ("cached", lambda i: new_page(*page_args(i))),
+    ]
+    print(f"{args.pages} pages x 3 charts")
+    for name, fn in cases:
+        if name == "cached":
+            for i in range(args.pages):
+                new_page(*page_args(i))
+        single = timed(fn, args.pages, 1) / args.pages
+        if name == "cached":
+            for i in range(args.pages):
+                new_page(*page_args(i))
+        threaded = args.pages / timed(fn, args.pages, args.threads)
+        print(f"  {name:<12} {single*1e3:7.1f} ms/page   {threaded:7.1f} pages/s with {args.threads} threads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# bench_extraction.py
+# Compares the legacy per-label re.search loop with StatementExtractor on the
+# bundled ENBD Q1 2025 statement, and checks both return identical dicts.
+#
+#   python benchmarks/bench_extraction.py [--repeat 50] [--scale 1]
+#
+# --scale N repeats the extracted text N times to mimic multi-MB annual reports.
+import os, sys, re, time, argparse
+import fitz
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENBD_DIR = os.path.join(ROOT, "enbd")
+sys.path.insert(0, ENBD_DIR)
+
+from statement_extractor import StatementExtractor, to_float
+import financial_statement_flask, financial_flask_genai, financial_flask_genai_2
+
+PDF_PATH = os.path.join(ENBD_DIR, "emirates_nbd_financial_statements_q1_2025_english.pdf")
+
+
+def legacy_extract(text, patterns_dual, patterns_single):
+    dual = {}
+    for k, p in patterns_dual.items():
+        m = re.search(p, text, re.IGNORECASE)
+        dual[k] = {
+            "current": to_float(m.group(1)) if m else None,
+            "prior": to_float(m.group(2)) if (m and m.lastindex and m.lastindex >= 2) else None,
+        }
+    single = {}
+    for k, p in patterns_single.items():
+        m = re.search(p, text, re.IGNORECASE)
+        single[k] = to_float(m.group(1)) if m else None
+    return dual, single
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times), sorted(times)[len(times) // 2]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--scale", type=int, default=1)
+    ap.add_argument("--pdf", default=PDF_PATH)
+    args = ap.parse_args()
+
+    with fitz.open(args.pdf) as doc:
+        text = "\n".join(pg.get_text() for pg in doc)
+    text = "\n".join([text] * args.scale)
+    print(f"{os.path.basename(args.pdf)}: {len(text):,} chars")
+
+    for mod in (financial_statement_flask, financial_flask_genai, financial_flask_genai_2):
+        pd_, ps_ = mod.patterns_dual, mod.patterns_single
+        extractor = StatementExtractor(pd_, ps_)
+        assert extractor.extract(text) == legacy_extract(text, pd_, ps_), f"{mod.__name__}: results differ"
+
+        legacy_min, legacy_med = best_of(lambda: legacy_extract(text, pd_, ps_), args.repeat)
+        new_min, new_med = best_of(lambda: extractor.extract(text), args.repeat)
+        print(f"{mod.__name__:<28} labels={len(pd_) + len(ps_):<3} "
+              f"legacy min/med={legacy_min*1e3:7.2f}/{legacy_med*1e3:7.2f} ms  "
+              f"extractor min/med={new_min*1e3:6.2f}/{new_med*1e3:6.2f} ms  "
+              f"speedup={legacy_med / new_med:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# bench_llm_async.py
+# Concurrent chat traffic against a local fake OpenAI server:
+#   sync   shared OpenAI client called from a fixed pool of worker threads
+#          (the old /ask path: each question holds a worker for its round trip)
+#   async  common.async_llm.AsyncLLM: every question submitted at once, one
+#          event-loop thread, at most --concurrency in flight upstream
+#
+#   python benchmarks/bench_llm_async.py [--questions 400] [--latency 0.2] [--workers 8] [--concurrency 64]
+import os, sys, time, argparse
+from concurrent.futures import ThreadPoolExecutor, wait
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from openai import OpenAI
+from common.async_llm import AsyncLLM
+from fake_openai import FakeOpenAI
+
+MESSAGES = [
+    {"role": "system", "content": "You are a bank financial analyst. Be concise and numeric."},
+    {"role": "user", "content": "Key metrics & ratios: ...\n\nUser prompt: is cost-to-income healthy?"},
+]
+
+
+def pct(times, q):
+    times = sorted(times)
+    return times[min(len(times) - 1, int(len(times) * q))]
+
+
+def run_sync(base_url, n, workers):
+    client = OpenAI(api_key="fake", base_url=base_url, max_retries=0)
+    lat = []
+
+    def one(_):
+        t0 = time.perf_counter()
+        client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES, temperature=0.2)
+        lat.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(one, range(n)))
+    return time.perf_counter() - t0, lat
+
+
+def run_async(base_url, n, concurrency):
+    llm = AsyncLLM(api_key="fake", base_url=base_url, max_concurrency=concurrency, queue_timeout=300)
+    llm.chat(MESSAGES)  # start the loop + open a connection outside the timing
+    lat = []
+    t0 = time.perf_counter()
+    futures = []
+    for _ in range(n):
+        f = llm.submit_chat(MESSAGES, temperature=0.2)
+        f.started = time.perf_counter()
+        f.add_done_callback(lambda f: lat.append(time.perf_counter() - f.started))
+        futures.append(f)
+    wait(futures)
+    wall = time.perf_counter() - t0
+    for f in futures:
+        f.result()
+    llm.close()
+    return wall, lat
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--questions", type=int, default=400)
+    ap.add_argument("--latency", type=float, default=0.2, help="fake server seconds per completion")
+    ap.add_argument("--workers", type=int, default=8, help="worker threads for the sync path")
+    ap.add_argument("--concurrency", type=int, default=64, help="AsyncLLM max in-flight requests")
+    args = ap.parse_args()
+
+    fake = FakeOpenAI(latency=args.latency)
+    base_url = fake.start()
+    print(f"{args.questions} questions, fake latency {args.latency*1e3:.0f} ms")
+    for name, fn, width in (("sync", run_sync, args.workers), ("async", run_async, args.concurrency)):
+        fake.peak_in_flight = 0
+        wall, lat = fn(base_url, args.questions, width)
+        label = f"{'workers' if name == 'sync' else 'concurrency'}={width}"
+        print(f"{name:<6} {label:<15} {args.questions / wall:8.1f} q/s  wall={wall:6.2f}s  "
+              f"p50={pct(lat, 0.5)*1e3:7.1f} ms  p99={pct(lat, 0.99)*1e3:7.1f} ms  "
+              f"peak upstream={fake.peak_in_flight}")
+
+
+if __name__ == "__main__":
+    main()
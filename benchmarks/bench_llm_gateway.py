@@ -0,0 +1,115 @@
+# bench_llm_gateway.py
+# common.llm_gateway.Gateway against the local fake OpenAI server (no key needed):
+#   probe      a host without the Responses API: requests and latency per
+#              question for the old per-call try-responses-then-chat vs the
+#              gateway, which probes once and then goes straight to chat
+#   retries    questions while the server answers every k-th request with 503:
+#              success rate without retries vs with OPENAI_RETRIES
+#   breaker    the server goes down: time per failed question while the
+#              breaker is closed (every attempt is made) vs open (fail fast)
+#
+#   python benchmarks/bench_llm_gateway.py [--n 50] [--llm-ms 50]
+import os, sys, time, argparse, statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, ROOT)
+
+from common.llm_gateway import Gateway, CircuitBreaker, LLMUnavailable
+from fake_openai import FakeOpenAI
+
+MESSAGES = [{"role": "system", "content": "You are a health & sleep coach."},
+            {"role": "user", "content": "How is my HRV?"}]
+
+
+def per_call(fake, n, ask):
+    r0, times, ok = fake.requests, [], 0
+    for _ in range(n):
+        t0 = time.perf_counter()
+        try:
+            ask()
+            ok += 1
+        except Exception:
+            pass
+        times.append(time.perf_counter() - t0)
+    return (fake.requests - r0) / n, statistics.median(times) * 1e3, ok / n
+
+
+def bench_probe(fake, url, n):
+    fake.missing = ("/responses",)
+    plain = Gateway(api_key="x", base_url=url, surface="responses", retries=0)
+
+    def old_way():  # what the apps did on every question
+        try:
+            return plain.respond(MESSAGES)
+        except Exception:
+            return plain.chat(MESSAGES)
+
+    gw = Gateway(api_key="x", base_url=url)
+    print(f"probe: host without /responses, {n} questions")
+    for label, ask in (("try responses, then chat", old_way), ("gateway (probed once)", lambda: gw.ask(MESSAGES))):
+        reqs, ms, _ = per_call(fake, n, ask)
+        print(f"  {label:26s} {reqs:4.2f} requests/question  {ms:6.1f} ms median")
+    print(f"  gateway surface: {gw.surface} ({gw.probe_error})")
+    fake.missing = ()
+    plain.close()
+    gw.close()
+
+
+def bench_retries(fake, url, n, every=3):
+    print(f"retries: every {every}rd request answers 503, {n} questions")
+    for retries in (0, 2):
+        gw = Gateway(api_key="x", base_url=url, surface="chat", retries=retries, backoff=0.01,
+                     breaker=CircuitBreaker(failures=10 ** 6))
+        r0, ok = fake.requests, 0
+        for i in range(n):
+            if (fake.requests - r0) % every == every - 1:
+                fake.fail_next = 1
+            try:
+                gw.chat(MESSAGES)
+                ok += 1
+            except Exception:
+                pass
+        fake.fail_next = 0
+        print(f"  retries={retries}  {ok / n:6.1%} answered  {(fake.requests - r0) / n:4.2f} requests/question")
+        gw.close()
+
+
+def bench_breaker(fake, url, n):
+    fake.down = True
+    gw = Gateway(api_key="x", base_url=url, surface="chat", retries=2, backoff=0.05,
+                 breaker=CircuitBreaker(failures=5, reset_s=60))
+    closed, opened = [], []
+    for _ in range(n):
+        state = gw.breaker.state
+        t0 = time.perf_counter()
+        try:
+            gw.chat(MESSAGES)
+        except LLMUnavailable:
+            opened.append(time.perf_counter() - t0)
+        except Exception:
+            (closed if state == "closed" else opened).append(time.perf_counter() - t0)
+    fake.down = False
+    print(f"breaker: server down, {n} questions (retries=2, opens after 5 failures)")
+    print(f"  while closed {len(closed):3d} questions  {statistics.median(closed) * 1e3:8.2f} ms median")
+    print(f"  while open   {len(opened):3d} questions  {statistics.median(opened) * 1e3:8.2f} ms median")
+    print(f"  {gw.stats()['breaker']}")
+    gw.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=50)
+    ap.add_argument("--llm-ms", type=float, default=50, help="fake server time to first token")
+    args = ap.parse_args()
+
+    fake = FakeOpenAI(latency=args.llm_ms / 1e3)
+    url = fake.start()
+    print(f"fake OpenAI {args.llm_ms:g} ms per call")
+    bench_probe(fake, url, args.n)
+    bench_retries(fake, url, args.n)
+    bench_breaker(fake, url, args.n)
+
+
+if __name__ == "__main__":
+    main()
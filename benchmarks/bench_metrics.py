@@ -0,0 +1,100 @@
+# bench_metrics.py
+# Cost of common.metrics, with APP_METRICS=1 vs APP_METRICS=0 (each mode in
+# its own process, since the switch is read at import):
+#   span       one empty `with span(...)` block, inside a request context
+#   hooks      Flask request pre/post-processing of an empty response (the
+#              per-request hooks: timings, histograms, Server-Timing header)
+#   requests   per-request latency of cached, cheap pages (where a fixed cost
+#              shows most): ENBD GET /report/<key> and WHOOP GET /, through
+#              the Flask test client. These vary by several percent between
+#              runs on a shared machine, so the overhead column is estimated
+#              from the two rows above (hooks + one render span per request)
+# Modes alternate over --rounds child processes and the best time of each is
+# kept, which evens out drift on a busy machine. The apps run from a temp
+# directory so caches and uploads do not touch the repo.
+#
+#   python benchmarks/bench_metrics.py [--n 1000] [--rounds 4]
+import io, os, sys, json, time, argparse, subprocess, tempfile, shutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PDF_PATH = os.path.join(ROOT, "enbd", "emirates_nbd_financial_statements_q1_2025_english.pdf")
+
+
+def per_call(n, fn):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n
+
+
+def child(n):
+    sys.path.insert(0, os.path.join(ROOT, "enbd"))
+    sys.path.insert(0, os.path.join(ROOT, "whoop"))
+    sys.path.insert(0, ROOT)
+    from flask import Response
+    from common.metrics import span
+    import financial_statement_flask as enbd
+    import whoop_flassk_genai_3 as whoop
+
+    def empty_span():
+        with span("bench"):
+            pass
+
+    client = enbd.app.test_client()
+    with open(PDF_PATH, "rb") as fh:
+        r = client.post("/api/v1/statements", data={"pdf_file": (io.BytesIO(fh.read()), "q1.pdf")},
+                        content_type="multipart/form-data")
+    report = r.headers["Location"].replace("/api/v1/statements", "/report")
+    whoop_client = whoop.app.test_client()
+
+    def hooks():
+        with enbd.app.test_request_context("/"):
+            enbd.app.preprocess_request()
+            enbd.app.process_response(Response())
+
+    with enbd.app.test_request_context("/"):
+        out = {"span": per_call(n * 100, empty_span)}
+    out["hooks"] = per_call(n * 10, hooks)
+    out["enbd"] = per_call(n, lambda: client.get(report))
+    out["whoop"] = per_call(n, lambda: whoop_client.get("/"))
+    print(json.dumps(out))
+
+
+def run_mode(enabled, n):
+    tmp = tempfile.mkdtemp()
+    env = dict(os.environ, APP_METRICS="1" if enabled else "0", WHOOP_HISTORY="0", ENBD_PARSE_CACHE_DIR=tmp)
+    try:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", "--n", str(n)],
+                             cwd=tmp, env=env, capture_output=True, text=True, check=True)
+    finally:
+        shutil.rmtree(tmp)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1000)
+    ap.add_argument("--rounds", type=int, default=4)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        return child(args.n)
+
+    runs = {True: [], False: []}
+    for _ in range(args.rounds):
+        for enabled in (True, False):
+            runs[enabled].append(run_mode(enabled, args.n))
+    on, off = ({k: min(r[k] for r in runs[mode]) for k in runs[mode][0]} for mode in (True, False))
+    print(f"best of {args.rounds} rounds")
+    print(f"  {'':24s} {'APP_METRICS=0':>14s} {'APP_METRICS=1':>14s}   overhead")
+    print(f"  {'empty span':24s} {off['span'] * 1e9:11.0f} ns {on['span'] * 1e9:11.0f} ns")
+    print(f"  {'request hooks':24s} {off['hooks'] * 1e6:11.1f} us {on['hooks'] * 1e6:11.1f} us   "
+          f"{(on['hooks'] - off['hooks']) * 1e6:+.1f} us/request")
+    fixed = on["hooks"] - off["hooks"] + on["span"] - off["span"]
+    for key, label in (("enbd", "ENBD GET /report/<key>"), ("whoop", "WHOOP GET /")):
+        print(f"  {label:24s} {off[key] * 1e6:11.1f} us {on[key] * 1e6:11.1f} us   "
+              f"~{fixed / off[key]:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# bench_parse_pdf.py
+# parse_pdf latency: full-text extraction vs page-targeted extraction
+# (cold = layout not seen yet, warm = layout cached), on the bundled ENBD
+# statement optionally padded with narrative pages to mimic a 200+ page
+# annual report. Also checks all three modes return the same dicts.
+#
+#   python benchmarks/bench_parse_pdf.py [--pad-pages 180] [--repeat 5]
+import os, sys, time, argparse, tempfile
+import fitz
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENBD_DIR = os.path.join(ROOT, "enbd")
+sys.path.insert(0, ENBD_DIR)
+
+import financial_statement_flask as app_module
+from page_locator import PageLocator
+
+PDF_PATH = os.path.join(ENBD_DIR, "emirates_nbd_financial_statements_q1_2025_english.pdf")
+FILLER_PATH = os.path.join(ROOT, "0-DataIngestParsing", "data", "pdf", "attention.pdf")
+
+
+def build_pdf(pad_pages):
+    # Narrative pages first (as in an annual report), statements at the back.
+    out = fitz.open()
+    with fitz.open(FILLER_PATH) as filler:
+        while out.page_count < pad_pages:
+            n = min(filler.page_count, pad_pages - out.page_count)
+            out.insert_pdf(filler, from_page=0, to_page=n - 1)
+    with fitz.open(PDF_PATH) as src:
+        out.insert_pdf(src)
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+    tmp.close()
+    out.save(tmp.name)
+    out.close()
+    return tmp.name
+
+
+def timed(fn, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return sorted(times)[len(times) // 2], result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pad-pages", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    path = build_pdf(args.pad_pages) if args.pad_pages else PDF_PATH
+    try:
+        with fitz.open(path) as doc:
+            print(f"{doc.page_count} pages")
+
+        full_t, full = timed(lambda: app_module.parse_pdf(path, targeted=False), args.repeat)
+
+        def cold():
+            locator = PageLocator(app_module.extractor)
+            with fitz.open(path) as doc:
+                return locator.parse(doc)
+        cold_t, cold_res = timed(cold, args.repeat)
+
+        locator = PageLocator(app_module.extractor)
+        with fitz.open(path) as doc:
+            locator.parse(doc)
+        def warm():
+            with fitz.open(path) as doc:
+                return locator.parse(doc)
+        warm_t, warm_res = timed(warm, args.repeat)
+
+        assert full == cold_res == warm_res, "targeted extraction differs from full-text extraction"
+        print(f"full text        p50={full_t*1e3:8.1f} ms")
+        print(f"targeted (cold)  p50={cold_t*1e3:8.1f} ms  ({full_t / cold_t:4.1f}x)")
+        print(f"targeted (warm)  p50={warm_t*1e3:8.1f} ms  ({full_t / warm_t:4.1f}x)")
+        (_, _, resolved), = locator._layouts.values()
+        if not resolved:
+            print("  (a label is unresolved in this PDF, so the warm path reads every page like the cold one)")
+    finally:
+        if path != PDF_PATH:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# bench_prompt_context.py
+# common.prompt_context.ContextBuilder:
+#   budget     many random contexts (sections, line lengths, budgets); fails if
+#              any built text counts more tokens than its budget
+#   size       a WHOOP-style context as fields are added (extra
+#              metric lines and raw example records): joined as-is vs built
+#              with a fixed budget
+#   latency    median completion latency for those contexts against the local
+#              fake OpenAI server with a per-prompt-token prefill delay. The
+#              delay is a model of the real API (time to first token grows
+#              with the prompt), so these rows restate the token counts in
+#              milliseconds; they do not measure the API (no key needed)
+# Packing, ordering and token-estimate checks are in tests/test_prompt_context.py.
+#
+#   python benchmarks/bench_prompt_context.py [--cases 2000] [--budget 256] [--calls 20] [--prefill-ms 0.5]
+import os, sys, time, random, argparse, statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, ROOT)
+
+from common.prompt_context import ContextBuilder, count_tokens, counter_name, num
+from common.async_llm import AsyncLLM
+from fake_openai import FakeOpenAI
+
+WORDS = ["Recovery", "HRV", "Sleep", "debt", "Rest", "HR", "(bpm)", "avg", "latest", "Low/Med/High", "Cost-to-Income",
+         "NPL", "ratio", "Coverage", "%", "|", "7d", "30d", "vs", "examples:", "Cycle_start_time", "{'Low':"]
+
+
+def random_line(rng):
+    parts = [rng.choice(WORDS) if rng.random() < 0.6 else str(rng.choice([rng.randint(0, 99999), rng.random() * 100]))
+             for _ in range(rng.randint(1, 25))]
+    return " ".join(parts) + rng.choice(["", ":", ".", "\n"])
+
+
+def check_budgets(cases, seed=0):
+    rng = random.Random(seed)
+    worst = 0.0
+    for _ in range(cases):
+        ctx = ContextBuilder(budget=rng.randint(0, 600))
+        for _ in range(rng.randint(0, 8)):
+            ctx.add([random_line(rng) for _ in range(rng.randint(0, 30))], priority=rng.randint(0, 4),
+                    title=rng.choice([None, "Ratios:", "Key metrics (current/prior):"]))
+        text = ctx.build()
+        tokens = count_tokens(text)
+        assert tokens == ctx.tokens <= ctx.budget, (tokens, ctx.tokens, ctx.budget)
+        worst = max(worst, tokens / ctx.budget if ctx.budget else 0)
+    return worst
+
+
+def whoop_sections(fields, seed=1):
+    # (priority, lines): averages, distributions, baselines, then what tends
+    # to get appended over time: more metrics and raw example rows.
+    rng = random.Random(seed)
+    averages = [f"Avg {name}: {rng.uniform(10, 100):.6f}" for name in
+                ("Recovery", "Rest HR (bpm)", "HRV (ms)", "Sleep Perf", "Sleep Debt (min)")]
+    dists = ["Recovery Dist Low/Med/High: {'Low': 173, 'Medium': 105, 'High': 40}",
+             "Sleep Debt Dist Low/Moderate/High: {'Low': 181, 'Moderate': 82, 'High': 55}"]
+    baselines = [f"Baseline {m}: latest 8 | 7d 8.3 | 30d 9.4 | 90d 9.3 | vs 30d -14.7%"
+                 for m in ("HRV (ms)", "Rest HR (bpm)", "Sleep Debt (min)")]
+    extra = [f"Avg Metric_{i}_(unit): {rng.uniform(0, 1000):.6f}" for i in range(fields)]
+    records = [str([{"Cycle_start_time": f"0{d % 9 + 1}/09/2025 23:{d % 60:02d}", f"Metric_{i}": rng.uniform(0, 99),
+                     "Day_Strain": rng.uniform(0, 21), "Energy_burned_(cal)": rng.uniform(1500, 4000)}
+                    for d in range(3)]) for i in range(fields // 4)]
+    return [(0, averages), (2, dists), (1, baselines), (3, extra), (4, records)]
+
+
+def contexts(fields, budget):
+    sections = whoop_sections(fields)
+    raw = "\n".join(line for _, lines in sections for line in lines)
+    ctx = ContextBuilder(budget=budget)
+    for priority, lines in sections:
+        ctx.add([" ".join(num(w) if _is_float(w) else w for w in line.split(" ")) for line in lines], priority)
+    return raw, ctx.build()
+
+
+def _is_float(word):
+    try:
+        float(word)
+        return "." in word
+    except ValueError:
+        return False
+
+
+def median_latency(llm, context, calls):
+    times = []
+    for i in range(calls):
+        messages = [{"role": "system", "content": "You are a health & sleep coach."},
+                    {"role": "user", "content": f"Dataset summary:\n{context}\n\nUser prompt:\nQuestion {i}"}]
+        t0 = time.perf_counter()
+        llm.chat(messages)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=2000)
+    ap.add_argument("--budget", type=int, default=256)
+    ap.add_argument("--calls", type=int, default=20)
+    ap.add_argument("--prefill-ms", type=float, default=0.5, help="fake server delay per prompt token")
+    args = ap.parse_args()
+
+    print(f"token counter: {counter_name()}")
+    t0 = time.perf_counter()
+    worst = check_budgets(args.cases)
+    print(f"budget: {args.cases} random contexts, none over budget (fullest {worst:.0%}), "
+          f"{(time.perf_counter() - t0) / args.cases * 1e3:.2f} ms per build")
+
+    fake = FakeOpenAI(latency=0.05, prefill_delay=args.prefill_ms / 1000)
+    llm = AsyncLLM(api_key="x", base_url=fake.start())
+    print(f"size/latency (budget {args.budget} tokens, fake server 50 ms + {args.prefill_ms:g} ms per prompt token):")
+    print(f"  {'fields':>6s}  {'joined':>7s} {'built':>7s} tokens   {'joined':>8s} {'built':>8s} median latency")
+    try:
+        for fields in (0, 20, 80, 160):
+            raw, built = contexts(fields, args.budget)
+            assert count_tokens(built) <= args.budget
+            lat_raw, lat_built = median_latency(llm, raw, args.calls), median_latency(llm, built, args.calls)
+            print(f"  {fields:6d}  {count_tokens(raw):7d} {count_tokens(built):7d}          "
+                  f"{lat_raw * 1e3:6.0f}ms {lat_built * 1e3:6.0f}ms")
+    finally:
+        llm.close()
+
+
+if __name__ == "__main__":
+    main()
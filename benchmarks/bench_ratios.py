@@ -0,0 +1,62 @@
+# bench_ratios.py
+# Ratio screening over many statements: per-statement ratio_records() (what
+# the apps do for one upload) vs one vectorized RatioEngine.evaluate() over a
+# statement frame. Also checks both paths agree.
+#
+#   python benchmarks/bench_ratios.py [--statements 10000]
+import os, sys, time, random, argparse
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "enbd"))
+
+from financial_statement_flask import parse_pdf
+from ratio_engine import engine, statement_frame
+
+PDF_PATH = os.path.join(ROOT, "enbd", "emirates_nbd_financial_statements_q1_2025_english.pdf")
+
+
+def synthetic(base_dual, base_single, n, seed=0):
+    # Jitter the real statement; drop ~5% of items to exercise missing data.
+    rng = random.Random(seed)
+    def j(v):
+        return None if v is None or rng.random() < 0.05 else round(v * rng.uniform(0.5, 1.5), 2)
+    return [({k: {"current": j(v["current"]), "prior": j(v["prior"])} for k, v in base_dual.items()},
+             {k: j(v) for k, v in base_single.items()}) for _ in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--statements", type=int, default=10000)
+    args = ap.parse_args()
+
+    dual, single = parse_pdf(PDF_PATH)
+    stmts = synthetic(dual, single, args.statements)
+
+    t0 = time.perf_counter()
+    loop = [engine.ratio_records(d, s) for d, s in stmts]
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    frame = statement_frame(stmts)
+    t_frame = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    table = engine.evaluate(frame)
+    flags = engine.flags(table)
+    t_vec = time.perf_counter() - t0
+
+    got = table.to_numpy()
+    want = np.array([[np.nan if r["value"] is None else r["value"] for r in recs] for recs in loop])
+    # Rounding to 4 dp on both sides: allow one unit in the last place.
+    assert np.allclose(got, want, equal_nan=True, rtol=0, atol=1.0001e-4), "vectorized and per-statement ratios differ"
+
+    n = args.statements
+    print(f"{n} statements, {len(engine.names)} ratios, {flags.shape[1]} threshold rules")
+    print(f"per-statement ratio_records  {t_loop*1e3:9.1f} ms  ({t_loop/n*1e6:6.1f} us/statement)")
+    print(f"statement_frame build        {t_frame*1e3:9.1f} ms")
+    print(f"evaluate + flags             {t_vec*1e3:9.1f} ms  ({t_vec/n*1e6:6.2f} us/statement)")
+    print("flag rates: " + ", ".join(f"{m[:24]}… {v:.1%}" for m, v in flags.mean().items()))
+
+
+if __name__ == "__main__":
+    main()
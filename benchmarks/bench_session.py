@@ -0,0 +1,81 @@
+# bench_session.py
+# Cookie/request size and per-request latency for the ENBD and WHOOP assistant
+# apps with Flask's signed-cookie session vs the server-side stores in
+# common.server_session. No OpenAI key needed: only session-reading routes are hit.
+#
+#   python benchmarks/bench_session.py [--n 500]
+import os, sys, time, argparse, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "enbd"))
+sys.path.insert(0, os.path.join(ROOT, "whoop"))
+sys.path.insert(0, ROOT)
+
+from flask.sessions import SecureCookieSessionInterface
+from common.server_session import ServerSideSessionInterface, MemoryStore, SQLiteStore
+
+PDF_PATH = os.path.join(ROOT, "enbd", "emirates_nbd_financial_statements_q1_2025_english.pdf")
+CSV_PATH = os.path.join(ROOT, "whoop", "physiological_cycles_today.csv")
+
+
+def enbd_upload(client):
+    with open(PDF_PATH, "rb") as fh:
+        client.post("/upload", data={"pdf_file": (fh, "q1.pdf")}, content_type="multipart/form-data")
+
+
+def whoop_upload(client):
+    with open(CSV_PATH, "rb") as fh:
+        client.post("/", data={"file": (fh, "bench_session.csv")}, content_type="multipart/form-data")
+
+
+def measure(app, upload, path, n):
+    client = app.test_client()
+    upload(client)
+    cookie = client.get_cookie(app.config["SESSION_COOKIE_NAME"])
+    header = len(f"{cookie.key}={cookie.value}") if cookie else 0
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        r = client.get(path)
+        times.append(time.perf_counter() - t0)
+        assert r.status_code == 200, r.status_code
+    times.sort()
+    return header, times[len(times) // 2], times[int(len(times) * 0.95)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=500, help="requests per backend")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.setdefault("ENBD_PARSE_CACHE_DIR", tmp)
+    os.environ.pop("OPENAI_API_KEY", None)
+    import financial_flask_genai_2 as enbd_app
+    import whoop_flassk_genai_3 as whoop_app
+
+    backends = [
+        ("cookie", lambda: SecureCookieSessionInterface()),
+        ("memory", lambda: ServerSideSessionInterface(MemoryStore())),
+        ("sqlite", lambda: ServerSideSessionInterface(SQLiteStore(os.path.join(tmp, "sessions.sqlite3")))),
+    ]
+    cases = [
+        ("ENBD /", enbd_app.app, enbd_upload, "/"),
+        ("WHOOP /debug", whoop_app.app, whoop_upload, "/debug"),
+    ]
+    os.chdir(ROOT)  # WHOOP saves uploads under ./uploads
+    try:
+        for label, app, upload, path in cases:
+            print(f"{label} (n={args.n})")
+            for name, make in backends:
+                app.session_interface = make()
+                header, p50, p95 = measure(app, upload, path, args.n)
+                print(f"  {name:<7} Cookie header {header:6d} B   p50 {p50*1e3:6.2f} ms   p95 {p95*1e3:6.2f} ms")
+    finally:
+        leftover = os.path.join(ROOT, "uploads", "bench_session.csv")
+        if os.path.exists(leftover):
+            os.remove(leftover)
+
+
+if __name__ == "__main__":
+    main()
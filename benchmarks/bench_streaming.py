@@ -0,0 +1,63 @@
+# bench_streaming.py
+# Time-to-first-token vs total latency for the ENBD assistant:
+#   /ask         blocking POST, the page renders when the whole answer is in
+#   /ask/stream  SSE, first "delta" event as soon as the model emits a token
+# against the local fake OpenAI server (fixed TTFT + per-token delay).
+#
+#   python benchmarks/bench_streaming.py [--ttft 0.4] [--token-delay 0.03] [--n 10]
+import os, sys, time, argparse, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "enbd"))
+sys.path.insert(0, ROOT)
+
+from fake_openai import FakeOpenAI
+
+PDF_PATH = os.path.join(ROOT, "enbd", "emirates_nbd_financial_statements_q1_2025_english.pdf")
+ANSWER = " ".join(["Cost-to-income of 27% is strong; NPL ratio and coverage are the items to watch."] * 4)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ttft", type=float, default=0.4, help="fake server time to first token (s)")
+    ap.add_argument("--token-delay", type=float, default=0.03, help="fake server seconds per token")
+    ap.add_argument("--n", type=int, default=10)
+    args = ap.parse_args()
+
+    fake = FakeOpenAI(latency=args.ttft, token_delay=args.token_delay, answer=ANSWER)
+    os.environ["OPENAI_BASE_URL"] = fake.start()
+    os.environ["OPENAI_API_KEY"] = "fake"
+    # Every call must reach the fake server, not the answer cache.
+    os.environ["LLM_CACHE_MAX"] = "0"
+    os.environ.setdefault("ENBD_PARSE_CACHE_DIR", tempfile.mkdtemp())
+    import financial_flask_genai_2 as app_module
+
+    client = app_module.app.test_client()
+    with open(PDF_PATH, "rb") as fh:
+        client.post("/upload", data={"pdf_file": (fh, "q1.pdf")}, content_type="multipart/form-data")
+
+    blocking, first, total = [], [], []
+    for _ in range(args.n):
+        t0 = time.perf_counter()
+        r = client.post("/ask", data={"prompt": "Is cost-to-income healthy?"})
+        blocking.append(time.perf_counter() - t0)
+        assert r.status_code == 200
+
+        t0 = time.perf_counter()
+        r = client.get("/ask/stream", query_string={"prompt": "Is cost-to-income healthy?"}, buffered=False)
+        got_first = None
+        for chunk in r.response:
+            if got_first is None and b"event: delta" in chunk:
+                got_first = time.perf_counter() - t0
+        total.append(time.perf_counter() - t0)
+        first.append(got_first)
+        r.close()
+
+    med = lambda xs: sorted(xs)[len(xs) // 2]
+    print(f"fake TTFT {args.ttft*1e3:.0f} ms, {len(ANSWER.split())} tokens x {args.token_delay*1e3:.0f} ms, n={args.n}")
+    print(f"/ask         first byte of answer = full page  {med(blocking)*1e3:7.1f} ms")
+    print(f"/ask/stream  first delta                       {med(first)*1e3:7.1f} ms  (complete {med(total)*1e3:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
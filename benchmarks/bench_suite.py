@@ -0,0 +1,289 @@
+# bench_suite.py
+# Offline benchmark suite for the parsing and analytics hot paths, with JSON
+# baselines and a regression check. Cases:
+#   enbd.pdf_text.<doc>        fitz text of every page (the bundled ENBD statement, attention.pdf)
+#   enbd.extract.<doc>         StatementExtractor.extract on that text (extract_dual + extract_single)
+#   enbd.parse_pdf.cold|warm   the apps' parse_pdf with targeted=True (page layout unseen / cached)
+#   enbd.compute_ratios        ratio_engine.ratio_records on the parsed statement
+#   whoop.summary.<rows>       read_whoop_csv + summarize on physiological_cycles_today.csv
+#                              tiled to 10k / 1M rows (dates shifted, values jittered)
+#   whoop.summary_stream.1m    summarize_csv, the chunked path used above WHOOP_STREAM_MB
+#   whoop.charts               one dashboard's three charts, chart cache cleared
+#
+#   python benchmarks/bench_suite.py run [--quick] [--only REGEX] [--save NAME | --out FILE]
+#   python benchmarks/bench_suite.py compare BASELINE [CURRENT] [--threshold 0.25] [--only REGEX]
+#
+# run prints the best and median time per call and writes them, with each
+# case's result check and the library versions, as JSON (--save NAME writes
+# benchmarks/baselines/NAME.json). compare runs the suite (or reads CURRENT)
+# and exits 1 when a case's best time is more than --threshold slower than the
+# baseline's, or its result check differs (e.g. a field no longer extracted).
+# Times depend on the machine: save the baseline where the comparison runs
+# (best-of-5 times on a shared single-CPU box moved by up to ~30% between runs;
+# raise --repeat or --threshold there).
+# --quick skips the 1M-row cases. Scaled exports are cached under cache/bench/.
+import os, re, sys, json, time, argparse, platform, subprocess, statistics
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "enbd"))
+sys.path.insert(0, os.path.join(ROOT, "whoop"))
+sys.path.insert(0, ROOT)
+
+import fitz
+import matplotlib
+
+PDF_PATHS = {
+    "enbd": os.path.join(ROOT, "enbd", "emirates_nbd_financial_statements_q1_2025_english.pdf"),
+    "attention": os.path.join(ROOT, "0-DataIngestParsing", "data", "pdf", "attention.pdf"),
+}
+CSV_PATH = os.path.join(ROOT, "whoop", "physiological_cycles_today.csv")
+BASELINE_DIR = os.path.join(ROOT, "benchmarks", "baselines")
+CACHE_DIR = os.path.join(ROOT, "cache", "bench")
+SCALE_VERSION = "2"  # bump when scaled_export() output changes
+
+SUMMARY_COLUMNS = ["Recovery_score_", "Resting_heart_rate_(bpm)", "Heart_rate_variability_(ms)",
+                   "Sleep_performance_", "Sleep_debt_(min)"]
+VIEW_COLUMNS = ["Cycle_start_time"] + SUMMARY_COLUMNS
+
+
+# ---------- Inputs ----------
+def pdf_text(path):
+    with fitz.open(path) as doc:
+        return "\n".join(page.get_text() for page in doc)
+
+
+def scaled_export(rows, seed=0):
+    """physiological_cycles_today.csv tiled to ``rows`` rows: each copy moved one
+    export length further back in time (wrapping after ~30 years, then a minute
+    later so rows stay distinct), numeric cells jittered by ~2%."""
+    from ingest import DATETIME_COLUMNS, CATEGORY_COLUMNS, WHOLE_COLUMNS, parse_export_time, format_export_time
+    path = os.path.join(CACHE_DIR, f"whoop_{rows}_v{SCALE_VERSION}.csv")
+    if os.path.exists(path):
+        return path
+    raw = pd.read_csv(CSV_PATH, dtype=str)
+    copies = -(-rows // len(raw))
+    out = pd.concat([raw] * copies, ignore_index=True).iloc[:rows]
+    copy = np.repeat(np.arange(copies), len(raw))[:rows]
+    shift = pd.to_timedelta(copy % 33 * len(raw), unit="D") + pd.to_timedelta(copy // 33, unit="min")
+    rng = np.random.default_rng(seed)
+    for col in raw.columns:
+        name = col.strip()
+        if name in DATETIME_COLUMNS:
+            out[col] = format_export_time(parse_export_time(out[col]) - shift)
+        elif name not in CATEGORY_COLUMNS:
+            values = pd.to_numeric(out[col], errors="coerce")
+            values = values * rng.normal(1, 0.02, rows)
+            out[col] = values.round(0 if name in WHOLE_COLUMNS else 2)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    out.to_csv(tmp, index=False, float_format="%g")
+    os.replace(tmp, path)
+    return path
+
+
+# ---------- Cases ----------
+# name -> setup(); setup returns (fn, check): fn() is timed, check(result) is a
+# small JSON value that must stay the same (what a faster version must still compute).
+def _filled(dual, single):
+    return sum(v is not None for d in dual.values() for v in d.values()) + \
+        sum(v is not None for v in single.values())
+
+
+def enbd_cases():
+    import financial_statement_flask as app_module
+    from ratio_engine import engine
+
+    cases = {}
+    for doc, path in PDF_PATHS.items():
+        cases[f"enbd.pdf_text.{doc}"] = lambda path=path: (lambda: pdf_text(path), len)
+
+        def extract(path=path):
+            text = pdf_text(path)
+            return lambda: app_module.extractor.extract(text), lambda r: _filled(*r)
+        cases[f"enbd.extract.{doc}"] = extract
+
+    path = PDF_PATHS["enbd"]
+
+    def parse_cold():
+        def fn():
+            app_module.page_locator._layouts.clear()
+            return app_module.parse_pdf(path, targeted=True)
+        return fn, lambda r: _filled(*r)
+
+    def parse_warm():
+        app_module.parse_pdf(path, targeted=True)
+        return lambda: app_module.parse_pdf(path, targeted=True), lambda r: _filled(*r)
+
+    def ratios():
+        dual, single = app_module.parse_pdf(path)
+        return (lambda: engine.ratio_records(dual, single),
+                lambda r: {x["name"]: round(x["value"], 6) if x["value"] is not None else None for x in r})
+
+    cases["enbd.parse_pdf.cold"] = parse_cold
+    cases["enbd.parse_pdf.warm"] = parse_warm
+    cases["enbd.compute_ratios"] = ratios
+    return cases
+
+
+def whoop_cases(quick):
+    from ingest import read_whoop_csv
+    from stats_kernel import summarize
+    from stats_stream import summarize_csv
+    import charts
+
+    def check(st):
+        return {"rows": st.rows, "recovery_mean": round(st.mean("Recovery_score_"), 4),
+                "low_recovery": st.count("Recovery_score_", "<", 50)}
+
+    def summary(rows):
+        def setup():
+            path = scaled_export(rows)
+            return lambda: summarize(read_whoop_csv(path, columns=VIEW_COLUMNS), SUMMARY_COLUMNS), check
+        return setup
+
+    def stream():
+        path = scaled_export(1_000_000)
+        return lambda: summarize_csv(path, SUMMARY_COLUMNS), lambda st: {"rows": st.rows}
+
+    def dashboard_charts():
+        averages = {"Recovery": 58.2, "Rest HR": 61.0, "HRV": 44.5, "Sleep Perf": 81.0, "Sleep Debt": 52.3}
+        specs = [charts.bar_spec(averages),
+                 charts.pie_spec(["Low Recovery (<50)", "Normal/High"], [120, 206], "Low Recovery Days", size=8),
+                 charts.pie_spec(["High Sleep Debt (>100)", "Normal/Low"], [90, 236], "High Sleep Debt Days", size=8)]
+
+        def fn():
+            charts.cache.clear()
+            return charts.render_charts(specs, processes=0)
+        return fn, len
+
+    cases = {"whoop.summary.10k": summary(10_000)}
+    if not quick:
+        cases["whoop.summary.1m"] = summary(1_000_000)
+        cases["whoop.summary_stream.1m"] = stream
+    cases["whoop.charts"] = dashboard_charts
+    return cases
+
+
+# ---------- Running ----------
+def measure(fn, repeat, min_time=0.2):
+    result = fn()  # warm-up; also the value checked
+    t0 = time.perf_counter()
+    fn()
+    once = time.perf_counter() - t0
+    number = max(1, int(min_time / once)) if once > 0 else 1000
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - t0) / number)
+    return result, times, number
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+            "commit": commit, "numpy": np.__version__, "pandas": pd.__version__,
+            "pymupdf": fitz.VersionBind, "matplotlib": matplotlib.__version__}
+
+
+def run_suite(quick, only, repeat):
+    cases = dict(enbd_cases(), **whoop_cases(quick))
+    results = {}
+    for name, setup in cases.items():
+        if only and not re.search(only, name):
+            continue
+        fn, check = setup()
+        result, times, number = measure(fn, repeat)
+        results[name] = {"best_s": min(times), "median_s": statistics.median(times), "repeat": repeat,
+                         "number": number, "check": check(result)}
+        print(f"  {name:28s} best {min(times) * 1e3:10.3f} ms   median {statistics.median(times) * 1e3:10.3f} ms"
+              f"   ({repeat}x{number})", flush=True)
+    return {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(), "cases": results}
+
+
+def baseline_path(name_or_path):
+    if os.path.exists(name_or_path) or name_or_path.endswith(".json"):
+        return name_or_path
+    return os.path.join(BASELINE_DIR, f"{name_or_path}.json")
+
+
+def compare(base, cur, threshold, only=None):
+    """Prints a case-by-case comparison; returns the number of failures."""
+    failures = 0
+    names = set(base["cases"]) | set(cur["cases"])
+    if only:
+        names = {name for name in names if re.search(only, name)}
+    for key in sorted(set(base["environment"]) - {"commit"}):
+        if base["environment"].get(key) != cur["environment"].get(key):
+            print(f"  note: {key} {base['environment'].get(key)} -> {cur['environment'].get(key)}")
+    print(f"  {'case':28s} {'baseline':>12s} {'current':>12s}   change")
+    for name in sorted(names):
+        b, c = base["cases"].get(name), cur["cases"].get(name)
+        if b is None or c is None:
+            print(f"  {name:28s} {'only in ' + ('current' if b is None else 'baseline'):>26s}")
+            continue
+        ratio = c["best_s"] / b["best_s"]
+        if c["check"] != b["check"]:
+            status = f"CHECK CHANGED {b['check']!r} -> {c['check']!r}"
+            failures += 1
+        elif ratio > 1 + threshold:
+            status = "REGRESSION"
+            failures += 1
+        elif ratio < 1 / (1 + threshold):
+            status = "faster"
+        else:
+            status = "ok"
+        print(f"  {name:28s} {b['best_s'] * 1e3:9.3f} ms {c['best_s'] * 1e3:9.3f} ms   {ratio - 1:+7.1%}  {status}")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="command", required=True)
+    for name in ("run", "compare"):
+        p = sub.add_parser(name)
+        p.add_argument("--quick", action="store_true", help="skip the 1M-row cases")
+        p.add_argument("--only", help="regex on case names")
+        p.add_argument("--repeat", type=int, default=5)
+        if name == "run":
+            out = p.add_mutually_exclusive_group()
+            out.add_argument("--save", help="baseline name (benchmarks/baselines/NAME.json)")
+            out.add_argument("--out", help="JSON file to write")
+        else:
+            p.add_argument("baseline", help="baseline name or JSON file")
+            p.add_argument("current", nargs="?", help="JSON file from `run --out` (default: run now)")
+            p.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown of the best time")
+    args = ap.parse_args()
+
+    if args.command == "run":
+        report = run_suite(args.quick, args.only, args.repeat)
+        path = baseline_path(args.save) if args.save else args.out
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(report, fh, indent=2)
+            print(f"wrote {path}")
+        return 0
+
+    with open(baseline_path(args.baseline), encoding="utf-8") as fh:
+        base = json.load(fh)
+    if args.current:
+        with open(args.current, encoding="utf-8") as fh:
+            cur = json.load(fh)
+    else:
+        only = args.only or ("|".join(re.escape(name) for name in base["cases"]) if base["cases"] else None)
+        cur = run_suite(args.quick, only, args.repeat)
+    failures = compare(base, cur, args.threshold, args.only)
+    print(f"{failures} regression(s) beyond {args.threshold:.0%}" if failures else "no regressions")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
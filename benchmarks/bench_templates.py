@@ -0,0 +1,152 @@
+# bench_templates.py
+# Inline templates compiled per request (render_template_string, which the
+# apps used) vs once at startup (common/templates.py):
+#   templates  per template: compiling the source (what every request paid
+#              before) vs rendering the compiled template, with the context of
+#              a real request captured from Flask's template_rendered signal
+#   pages      cheap cache-hit pages through the Flask test client: latency
+#              and requests/s when each request compiles its template again
+#              (the app's Jinja cache switched off) vs compiled once
+#   startup    compiling every template of the six apps from source vs
+#              loading them from a warm TEMPLATE_BYTECODE_DIR cache
+# The apps run from a temp directory so caches and uploads do not touch the repo.
+#
+#   python benchmarks/bench_templates.py [--n 300]
+import io, os, sys, time, argparse, tempfile, shutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "enbd"))
+sys.path.insert(0, os.path.join(ROOT, "whoop"))
+sys.path.insert(0, ROOT)
+PDF_PATH = os.path.join(ROOT, "enbd", "emirates_nbd_financial_statements_q1_2025_english.pdf")
+CSV_PATH = os.path.join(ROOT, "whoop", "physiological_cycles_today.csv")
+
+
+def best_per_call(n, fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / n)
+    return best
+
+
+def load_apps():
+    os.environ.setdefault("WHOOP_HISTORY", "0")
+    os.environ.setdefault("ENBD_PARSE_CACHE_DIR", os.getcwd())
+    import financial_statement_flask, financial_flask_genai, financial_flask_genai_2
+    import whoop_band_flask, whoop_flask_genai, whoop_flassk_genai_3
+    return {"enbd_statement": financial_statement_flask.app, "enbd_genai": financial_flask_genai.app,
+            "enbd_genai_2": financial_flask_genai_2.app, "whoop_band": whoop_band_flask.app,
+            "whoop_genai": whoop_flask_genai.app, "whoop_genai_3": whoop_flassk_genai_3.app}
+
+
+def upload(client, path, field, url):
+    with open(path, "rb") as fh:
+        return client.post(url, data={field: (io.BytesIO(fh.read()), os.path.basename(path))},
+                           content_type="multipart/form-data")
+
+
+def warm_pages(apps):
+    """Drives each app once (uploads included) and returns the cache-hit pages to time."""
+    pages = []
+    for name in ("enbd_statement", "enbd_genai"):
+        client = apps[name].test_client()
+        html = upload(client, PDF_PATH, "pdf_file", "/upload" if name == "enbd_statement" else "/").get_data(as_text=True)
+        key = html.split("/report/", 1)[1].split('"', 1)[0]
+        pages.append((name, client, f"/report/{key}"))
+    for name in ("enbd_genai_2", "whoop_band", "whoop_genai", "whoop_genai_3"):
+        client = apps[name].test_client()
+        if name == "enbd_genai_2":
+            upload(client, PDF_PATH, "pdf_file", "/")
+        else:
+            upload(client, CSV_PATH, "file", "/")
+        pages.append((name, client, "/"))
+    pages.append(("whoop_genai_3", apps["whoop_genai_3"].test_client(), "/cohort"))
+    return pages
+
+
+def bench_templates(apps, captured, n):
+    from flask import render_template
+    print("templates (ms per call)")
+    print(f"  {'':28s} {'compile':>8s} {'render':>8s}   compile share")
+    for (app, name), context in sorted(captured.items()):
+        env = apps[app].jinja_env
+        source = env.loader.get_source(env, name)[0]
+        with apps[app].test_request_context("/"):
+            compile_s = best_per_call(max(n // 10, 5), lambda: env.from_string(source))
+            render_s = best_per_call(n, lambda: render_template(name, **context))
+        print(f"  {name:28s} {compile_s * 1e3:8.2f} {render_s * 1e3:8.3f}   "
+              f"{compile_s / (compile_s + render_s):6.1%}")
+
+
+def bench_pages(pages, n):
+    print("cache-hit pages (test client)")
+    print(f"  {'':28s} {'compile per request':>22s} {'compiled once':>22s}")
+    for name, client, url in pages:
+        env = client.application.jinja_env
+        cache, times = env.cache, {}
+        for label, c in (("per_request", None), ("once", cache)):
+            env.cache = c
+            times[label] = best_per_call(n // 3, lambda: client.get(url))
+        env.cache = cache
+        cols = [f"{times[k] * 1e3:7.2f} ms {1 / times[k]:7.0f}/s" for k in ("per_request", "once")]
+        print(f"  {name + ' ' + url[:12]:28s} {cols[0]:>22s} {cols[1]:>22s}   "
+              f"{times['per_request'] / times['once'] - 1:+.0%} without the cache")
+
+
+def bench_startup(apps, captured, n):
+    from jinja2 import FileSystemBytecodeCache
+    names = {}
+    for app, name in captured:
+        names.setdefault(app, []).append(name)
+    bcc_dir = tempfile.mkdtemp()
+
+    def compile_all(bcc):
+        for app, todo in names.items():
+            env = apps[app].jinja_env.overlay(cache_size=0, bytecode_cache=bcc)
+            for name in todo:
+                env.get_template(name)
+
+    bcc = FileSystemBytecodeCache(bcc_dir)
+    compile_all(bcc)  # fill it
+    source_s = best_per_call(max(n // 30, 3), lambda: compile_all(None))
+    cached_s = best_per_call(max(n // 30, 3), lambda: compile_all(bcc))
+    shutil.rmtree(bcc_dir)
+    print(f"startup: all {len(captured)} templates")
+    print(f"  from source {source_s * 1e3:8.1f} ms   from bytecode cache {cached_s * 1e3:8.1f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=300)
+    args = ap.parse_args()
+
+    tmp, cwd = tempfile.mkdtemp(), os.getcwd()
+    os.chdir(tmp)
+    try:
+        from flask import template_rendered
+        apps = load_apps()
+        captured = {}
+
+        def capture(sender, template, context, **extra):
+            captured[(next(k for k, a in apps.items() if a is sender), template.name)] = \
+                {k: v for k, v in context.items() if k not in ("g", "request", "session", "config", "url_for",
+                                                               "get_flashed_messages")}
+        template_rendered.connect(capture)
+        pages = warm_pages(apps)
+        for _, client, url in pages:
+            client.get(url)
+        template_rendered.disconnect(capture)
+
+        bench_templates(apps, captured, args.n)
+        bench_pages(pages, args.n)
+        bench_startup(apps, captured, args.n)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
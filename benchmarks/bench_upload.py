@@ -0,0 +1,90 @@
+# bench_upload.py
+# /upload latency: legacy NamedTemporaryFile path (f.save + fitz.open(path))
+# vs the in-memory SpillRequest path (fitz.open(stream=...)). Requests go
+# through the Flask test client so multipart parsing is included.
+#
+#   python benchmarks/bench_upload.py [--requests 200] [--work open|parse]
+#
+# --work open   only opens the PDF and counts pages (isolates the I/O cost)
+# --work parse  runs the warm page-targeted parse as the apps do
+import os, sys, io, time, argparse, tempfile
+import fitz
+from flask import Flask, request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENBD_DIR = os.path.join(ROOT, "enbd")
+sys.path.insert(0, ENBD_DIR)
+
+import financial_statement_flask as app_module
+from upload_buffer import SpillRequest, upload_buffer
+
+PDF_PATH = os.path.join(ENBD_DIR, "emirates_nbd_financial_statements_q1_2025_english.pdf")
+
+
+def make_apps(work):
+    legacy = Flask("legacy")
+    streamed = Flask("streamed")
+    streamed.request_class = SpillRequest
+    streamed.config["UPLOAD_SPILL_BYTES"] = 16 * 1024 * 1024
+
+    @legacy.route("/upload", methods=["POST"])
+    def legacy_upload():
+        f = request.files["pdf_file"]
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+        try:
+            f.save(tmp.name)
+            with fitz.open(tmp.name) as doc:
+                out = work(doc)
+        finally:
+            tmp.close()
+            if os.path.exists(tmp.name):
+                os.unlink(tmp.name)
+        return str(out)
+
+    @streamed.route("/upload", methods=["POST"])
+    def streamed_upload():
+        buf = upload_buffer(request.files["pdf_file"])
+        with buf.open_pdf() as doc:
+            out = work(doc)
+        return str(out)
+
+    return legacy, streamed
+
+
+def run(app, data, n):
+    client = app.test_client()
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        r = client.post("/upload", data={"pdf_file": (io.BytesIO(data), "q1.pdf")},
+                        content_type="multipart/form-data")
+        times.append(time.perf_counter() - t0)
+        assert r.status_code == 200, r.data
+    times.sort()
+    return times[len(times) // 2], times[min(len(times) - 1, int(len(times) * 0.99))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--work", choices=["open", "parse"], default="open")
+    args = ap.parse_args()
+
+    with open(PDF_PATH, "rb") as fh:
+        data = fh.read()
+    if args.work == "open":
+        work = lambda doc: doc.page_count
+    else:
+        work = lambda doc: app_module.parse_document(doc, targeted=True)
+
+    legacy, streamed = make_apps(work)
+    run(legacy, data, 5)
+    run(streamed, data, 5)  # warm-up (and learns the page layout)
+    print(f"{os.path.basename(PDF_PATH)}: {len(data) / 1024:.0f} KB, work={args.work}, n={args.requests}")
+    for name, app in (("tempfile", legacy), ("in-memory", streamed)):
+        p50, p99 = run(app, data, args.requests)
+        print(f"{name:<10} p50={p50*1e3:7.2f} ms  p99={p99*1e3:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
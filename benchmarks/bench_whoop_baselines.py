@@ -0,0 +1,81 @@
+# bench_whoop_baselines.py
+# Rolling 7/30/90-day baselines per request over a long history:
+#   rebuild      a fresh BaselineEngine over the whole history (what a
+#                stateless request would do)
+#   pandas       time-based rolling mean/min/max over the whole history
+#   tracker      BaselineTracker following the HistoryStore: one new day
+#                appended per upload, windows updated in place
+# Checks the tracker's snapshot against the rebuild after every day.
+#
+#   python benchmarks/bench_whoop_baselines.py [--years 10] [--days 20]
+import os, sys, time, shutil, argparse, tempfile
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "whoop"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_whoop_history import export, write_as_of
+from history import HistoryStore
+from baselines import BaselineEngine, BaselineTracker, METRICS, WINDOWS
+
+
+def rebuild(df):
+    engine = BaselineEngine()
+    engine.feed(df)
+    return engine.snapshot()
+
+
+def pandas_rolling(df):
+    s = df.sort_values("Cycle_start_time").set_index("Cycle_start_time")[list(METRICS)].astype("float64")
+    out = {}
+    for n in WINDOWS:
+        r = s.shift(1).rolling(f"{n}D")
+        out[n] = (r.mean().iloc[-1], r.min().iloc[-1], r.max().iloc[-1])
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--years", type=int, default=10)
+    ap.add_argument("--days", type=int, default=20)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        full = export(args.years * 365 + args.days)
+        path = os.path.join(tmp, "physiological_cycles_today.csv")
+        store = HistoryStore(os.path.join(tmp, "history"))
+        tracker = BaselineTracker(store)
+        write_as_of(full, args.days, path)
+        store.upsert(path)
+        t0 = time.perf_counter()
+        tracker.snapshot()
+        print(f"{len(store.frame()):,} cycles; first tracker build {(time.perf_counter() - t0) * 1e3:.1f} ms")
+
+        t_rebuild, t_pandas, t_track = [], [], []
+        for day in range(args.days - 1, -1, -1):
+            write_as_of(full, day, path)
+            store.upsert(path)
+            df = store.frame()
+            t0 = time.perf_counter()
+            ref = rebuild(df)
+            t_rebuild.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            pandas_rolling(df)
+            t_pandas.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            got = tracker.snapshot()
+            t_track.append(time.perf_counter() - t0)
+            assert got == ref, day
+        print(f"per daily upload ({args.days}x, median):")
+        print(f"  rebuild   {np.median(t_rebuild) * 1e3:8.2f} ms")
+        print(f"  pandas    {np.median(t_pandas) * 1e3:8.2f} ms")
+        print(f"  tracker   {np.median(t_track) * 1e3:8.2f} ms   {tracker.counts}")
+        print("  tracker == rebuild: True")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
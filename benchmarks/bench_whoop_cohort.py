@@ -0,0 +1,75 @@
+# bench_whoop_cohort.py
+# Cohort report over a directory of per-athlete WHOOP exports:
+#   per-user loop   each file read and summarized one after another, with the
+#                   streaks walked cycle by cycle in Python (the obvious way)
+#   cohort (1)      cohort.cohort_report in-process (groupby statistics)
+#   cohort (N)      the same with a process pool of --workers
+# Checks that the streaks and distributions agree with the per-user loop.
+#
+#   python benchmarks/bench_whoop_cohort.py [--users 200] [--days 730] [--workers 4]
+import os, sys, time, shutil, argparse, tempfile
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "whoop"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_whoop_history import export
+from ingest import read_whoop_csv
+from stats_kernel import summarize
+import cohort
+
+
+def write_cohort(directory, users, days):
+    for i in range(users):
+        df = export(days, seed=i)
+        rng = np.random.default_rng(i)
+        recovery = next(c for c in df.columns if c.strip() == "Recovery_score_")
+        df[recovery] = rng.integers(0, 100, days).astype(float)
+        df.loc[rng.random(days) < 0.05, recovery] = np.nan
+        df.to_csv(os.path.join(directory, f"athlete{i:04d}.csv"), index=False)
+
+
+def per_user_loop(directory):
+    out = {}
+    for user, path in cohort.cohort_files(directory).items():
+        df = read_whoop_csv(path, columns=cohort.COLUMNS)
+        summarize(df, cohort.METRICS)
+        scores = df.sort_values("Cycle_start_time")["Recovery_score_"].dropna()
+        longest = current = 0
+        for v in scores:
+            current = current + 1 if v < cohort.LOW_RECOVERY else 0
+            longest = max(longest, current)
+        low = int((scores < 50).sum())
+        out[user] = (longest, current, low)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--days", type=int, default=730)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        write_cohort(tmp, args.users, args.days)
+        print(f"{args.users} athletes x {args.days} days, {os.cpu_count()} CPUs")
+        t0 = time.perf_counter()
+        ref = per_user_loop(tmp)
+        print(f"  per-user loop  {time.perf_counter() - t0:7.2f} s")
+        for workers in sorted({1, args.workers}):
+            t0 = time.perf_counter()
+            report = cohort.cohort_report(cohort.cohort_files(tmp), workers=workers)
+            print(f"  cohort ({workers})     {time.perf_counter() - t0:7.2f} s")
+        for row in report["users"]:
+            s = row["low_streak"]
+            assert ref[row["user"]] == (s["longest"], s["current"], row["recovery_dist"]["Low"]), row["user"]
+        print(f"  matches the per-user loop for all {len(report['users'])} athletes")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# bench_whoop_followup.py
+# Latency of a WHOOP v3 follow-up prompt (POST / with a prompt, no file) with
+# and without the page-model cache. The LLM is the local fake OpenAI server;
+# every prompt is distinct so the answer cache never short-circuits it.
+#
+#   python benchmarks/bench_whoop_followup.py [--n 30] [--llm-ms 0]
+import os, sys, time, argparse, tempfile, shutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "whoop"))
+sys.path.insert(0, ROOT)
+
+from fake_openai import FakeOpenAI
+
+CSV_PATH = os.path.join(ROOT, "whoop", "physiological_cycles_today.csv")
+UPLOAD_NAME = "bench_followup.csv"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=30)
+    ap.add_argument("--llm-ms", type=float, default=0, help="fake LLM latency per call")
+    args = ap.parse_args()
+
+    fake = FakeOpenAI(latency=args.llm_ms / 1e3, answer="Sleep earlier on weekdays.")
+    os.environ["OPENAI_BASE_URL"] = fake.start()
+    os.environ["OPENAI_API_KEY"] = "fake"
+    # The app keeps uploads and the history under the working directory.
+    tmp = tempfile.mkdtemp()
+    os.chdir(tmp)
+    import whoop_flassk_genai_3 as app_module
+
+    client = app_module.app.test_client()
+    with open(CSV_PATH, "rb") as fh:
+        client.post("/", data={"file": (fh, UPLOAD_NAME)}, content_type="multipart/form-data")
+
+    cache = app_module.page_models
+    results = {}
+    try:
+        for name, max_entries in [("recompute", 0), ("page cache", cache.max_entries or 32)]:
+            cache.clear()
+            cache.max_entries = max_entries
+            times = []
+            for i in range(args.n):
+                t0 = time.perf_counter()
+                r = client.post("/", data={"prompt": f"{name} follow-up #{i}: how is my HRV?"})
+                times.append(time.perf_counter() - t0)
+                assert r.status_code == 200 and b"Sleep earlier" in r.data
+            times.sort()
+            results[name] = times[len(times) // 2]
+            print(f"{name:<11} follow-up p50 {results[name]*1e3:7.1f} ms   p95 {times[int(len(times)*0.95)]*1e3:7.1f} ms")
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(tmp)
+    print(f"fake LLM {args.llm_ms:.0f} ms/call; speed-up x{results['recompute'] / results['page cache']:.1f}; "
+          f"cache {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# bench_whoop_history.py
+# Re-uploading a grown WHOOP export into whoop/history.py. A synthetic daily
+# export of --years is imported once, then each following "day" re-uploads
+# the full export with one new cycle on top and yesterday's open cycle
+# finished. Reports per-upload time for:
+#   read only   read_whoop_csv of the export (what each upload cost before)
+#   upsert      HistoryStore.upsert + frame() of the dashboard columns
+# plus how many months each upsert had to rewrite.
+#
+#   python benchmarks/bench_whoop_history.py [--years 5] [--days 10]
+import os, sys, time, shutil, argparse, tempfile
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "whoop"))
+
+from ingest import read_whoop_csv, WHOLE_COLUMNS
+from history import HistoryStore
+
+VIEW_COLUMNS = ["Cycle_start_time", "Recovery_score_", "Resting_heart_rate_(bpm)", "Heart_rate_variability_(ms)",
+                "Sleep_performance_", "Sleep_debt_(min)"]
+
+
+def export(days, seed=0):
+    # Daily cycles, newest first like WHOOP.
+    sample = pd.read_csv(os.path.join(ROOT, "whoop", "physiological_cycles_today.csv"), nrows=1)
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2025-09-04 23:00") - pd.to_timedelta(np.arange(days), unit="D")
+    fmt = lambda ts: ts.strftime("%d/%m/%Y ") + ts.hour.astype(str) + ts.strftime(":%M")
+    cols = {}
+    for raw in sample.columns:
+        name = raw.strip()
+        if name in ("Cycle_start_time", "Sleep_onset"):
+            cols[raw] = fmt(start)
+        elif name in ("Cycle_end_time", "Wake_onset"):
+            cols[raw] = fmt(start + pd.Timedelta(hours=24))
+        elif name == "Cycle_timezone":
+            cols[raw] = "UTC+04:00"
+        elif name in WHOLE_COLUMNS:
+            cols[raw] = rng.integers(0, 700, days).astype(float)
+        else:
+            cols[raw] = rng.normal(30, 5, days).round(2)
+    return pd.DataFrame(cols)
+
+
+def write_as_of(full, day, path):
+    # The export as downloaded `day` days ago: its top cycle is still open.
+    snap = full.iloc[day:].copy()
+    snap.iloc[0, 1] = np.nan
+    snap.to_csv(path, index=False)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--years", type=int, default=5)
+    ap.add_argument("--days", type=int, default=10, help="daily re-uploads to time")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        total = args.years * 365 + args.days
+        full = export(total)
+        path = os.path.join(tmp, "physiological_cycles_today.csv")
+        store = HistoryStore(os.path.join(tmp, "history"))
+
+        write_as_of(full, args.days, path)
+        t0 = time.perf_counter()
+        first = store.upsert(path)
+        print(f"initial import  {total - args.days:,} cycles  {(time.perf_counter() - t0) * 1e3:7.1f} ms  "
+              f"({first['months_written']} months written)")
+
+        t_read, t_up, written = [], [], []
+        for day in range(args.days - 1, -1, -1):
+            write_as_of(full, day, path)
+            t0 = time.perf_counter()
+            read_whoop_csv(path, columns=VIEW_COLUMNS)
+            t_read.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            r = store.upsert(path)
+            store.frame(VIEW_COLUMNS)
+            t_up.append(time.perf_counter() - t0)
+            written.append(r["months_written"])
+            assert r["inserted"] == 1 and r["updated"] == 1, r
+        print(f"daily re-upload ({args.days}x, median):")
+        print(f"  read only   {np.median(t_read) * 1e3:7.1f} ms")
+        print(f"  upsert      {np.median(t_up) * 1e3:7.1f} ms   months written per upload: {max(written)}")
+        print(f"store: {store.stats()}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
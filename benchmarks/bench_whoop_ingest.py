@@ -0,0 +1,106 @@
+# bench_whoop_ingest.py
+# Parse time and peak memory for a synthetic WHOOP export (padded headers,
+# dd/mm/yyyy H:MM dates, ~3% missing cells):
+#   legacy        pd.read_csv(path) + header strip, all 26 columns, dates as text
+#   typed-c       whoop/ingest.read_whoop_csv, dashboard columns, pandas C parser
+#   typed-arrow   same on the pyarrow engine
+#   typed-arrow-all  all 26 columns, pyarrow engine
+# Each variant runs in a fresh subprocess; peak is the high-water RSS minus
+# the RSS after imports.
+#
+#   python benchmarks/bench_whoop_ingest.py [--rows 1000000] [--csv path/to/keep.csv]
+import os, sys, json, time, argparse, tempfile, subprocess
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "whoop"))
+
+VIEW_COLUMNS = ["Cycle_start_time", "Recovery_score_", "Resting_heart_rate_(bpm)", "Heart_rate_variability_(ms)",
+                "Sleep_performance_", "Asleep_duration_(min)", "Sleep_efficiency_", "Sleep_consistency_",
+                "Day_Strain", "Energy_burned_(cal)", "Sleep_debt_(min)"]
+
+
+def write_export(path, rows, seed=0):
+    import pandas as pd
+    from ingest import DATETIME_COLUMNS, WHOLE_COLUMNS
+    sample = pd.read_csv(os.path.join(ROOT, "whoop", "physiological_cycles_today.csv"), nrows=1)
+    rng = np.random.default_rng(seed)
+    # Dates are drawn from a pool of pre-formatted strings (strftime on 1M rows is slow).
+    ts = pd.Series(np.datetime64("2010-01-01T00:00")
+                   + rng.integers(0, 15 * 365 * 24 * 60, 100_000).astype("timedelta64[m]"))
+    pool = (ts.dt.strftime("%d/%m/%Y ") + ts.dt.hour.astype(str) + ts.dt.strftime(":%M")).to_numpy()
+    cols = {}
+    for raw in sample.columns:
+        name = raw.strip()
+        if name in DATETIME_COLUMNS:
+            values = pd.Series(pool[rng.integers(0, len(pool), rows)])
+        elif name == "Cycle_timezone":
+            values = pd.Series(rng.choice(["UTC+04:00", "UTC+05:30", "UTC+01:00"], rows))
+        elif name in WHOLE_COLUMNS:
+            values = pd.Series(rng.integers(0, 700, rows).astype(float))
+        else:
+            values = pd.Series(rng.normal(30, 5, rows).round(2))
+        if name != "Cycle_start_time":
+            values = values.where(rng.random(rows) >= 0.03)
+        cols[raw] = values
+    pd.DataFrame(cols).to_csv(path, index=False, float_format="%g")
+
+
+def peak_rss_mb():
+    # VmHWM resets on exec; ru_maxrss can carry the parent's peak across it.
+    try:
+        with open("/proc/self/status") as fh:
+            return int(fh.read().split("VmHWM:")[1].split()[0]) / 1024
+    except (OSError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def child(variant, path):
+    import pandas as pd
+    from ingest import read_whoop_csv
+    base = peak_rss_mb()
+    t0 = time.perf_counter()
+    if variant == "legacy":
+        df = pd.read_csv(path)
+        df.columns = df.columns.str.strip()
+    elif variant == "typed-c":
+        df = read_whoop_csv(path, columns=VIEW_COLUMNS, engine="c")
+    elif variant == "typed-arrow":
+        df = read_whoop_csv(path, columns=VIEW_COLUMNS, engine="pyarrow")
+    else:
+        df = read_whoop_csv(path, engine="pyarrow")
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({"seconds": elapsed, "peak_mb": peak_rss_mb() - base, "cols": df.shape[1],
+                      "frame_mb": df.memory_usage(deep=True).sum() / 2**20}))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--csv", help="reuse/keep the synthetic export at this path")
+    ap.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        return child(*args.child)
+
+    path = args.csv or os.path.join(tempfile.mkdtemp(), "whoop_1m.csv")
+    if not os.path.exists(path):
+        t0 = time.perf_counter()
+        write_export(path, args.rows)
+        print(f"wrote {args.rows:,} rows ({os.path.getsize(path) / 2**20:.0f} MB) in {time.perf_counter() - t0:.1f}s")
+    try:
+        for variant in ["legacy", "typed-c", "typed-arrow", "typed-arrow-all"]:
+            out = subprocess.run([sys.executable, __file__, "--child", variant, path],
+                                 capture_output=True, text=True, check=True).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"  {variant:<16} {r['seconds']:6.2f} s   peak +{r['peak_mb']:6.0f} MB   "
+                  f"frame {r['frame_mb']:6.0f} MB ({r['cols']} cols)")
+    finally:
+        if not args.csv:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# bench_whoop_stats.py
+# WHOOP summary statistics: the per-column pandas code the apps used
+# (describe() per metric, repeated means, boolean-mask bucket counts,
+# nlargest/nsmallest) vs whoop/stats_kernel.py on a synthetic multi-year,
+# multi-user export. Also checks both give the same numbers and rows.
+#
+#   python benchmarks/bench_whoop_stats.py [--rows 1000000] [--repeat 3]
+import os, sys, time, argparse
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "whoop"))
+
+from stats_kernel import summarize
+
+METRICS = ["Recovery_score_", "Resting_heart_rate_(bpm)", "Heart_rate_variability_(ms)", "Sleep_performance_",
+           "Asleep_duration_(min)", "Sleep_efficiency_", "Sleep_consistency_", "Day_Strain", "Energy_burned_(cal)"]
+DEBT = "Sleep_debt_(min)"
+
+
+def synthetic(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Cycle_start_time": pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3650 * 24, rows), unit="h"),
+        "Recovery_score_": rng.integers(1, 100, rows).astype(float),
+        "Resting_heart_rate_(bpm)": rng.integers(40, 80, rows).astype(float),
+        "Heart_rate_variability_(ms)": rng.integers(20, 150, rows).astype(float),
+        "Sleep_performance_": rng.integers(30, 100, rows).astype(float),
+        "Asleep_duration_(min)": rng.normal(420, 60, rows).round(),
+        "Sleep_efficiency_": rng.integers(70, 100, rows).astype(float),
+        "Sleep_consistency_": rng.integers(30, 100, rows).astype(float),
+        "Day_Strain": rng.gamma(4, 3, rows).round(1),
+        "Energy_burned_(cal)": rng.normal(2500, 400, rows).round(),
+        DEBT: rng.exponential(60, rows).round(),
+    })
+    for c in METRICS + [DEBT]:
+        df.loc[rng.random(rows) < 0.03, c] = np.nan  # missing days
+    return df
+
+
+def pandas_path(df):
+    summary_stats = {c: df[c].describe().round(2).to_dict() for c in METRICS}
+    averages = [round(df[c].mean(), 2) for c in METRICS[:4] + [DEBT]]
+    r, d = df["Recovery_score_"], df[DEBT]
+    recovery_dist = {"Low": int((r < 50).sum()), "Medium": int(((r >= 50) & (r < 80)).sum()), "High": int((r >= 80).sum())}
+    sleep_debt_dist = {"Low": int((d < 30).sum()), "Moderate": int(((d >= 30) & (d < 100)).sum()), "High": int((d >= 100).sum())}
+    counts = (len(df[r < 50]), len(df[d > 100]))
+    tops = [list(f(3, c).index) for c in ("Recovery_score_", DEBT) for f in (df.nlargest, df.nsmallest)]
+    return summary_stats, averages, recovery_dist, sleep_debt_dist, counts, tops
+
+
+def kernel_path(df):
+    st = summarize(df, METRICS + [DEBT])
+    summary_stats = {c: st.describe(c) for c in METRICS}
+    averages = [st.mean(c) for c in METRICS[:4] + [DEBT]]
+    counts = (len(st.where("Recovery_score_", "<", 50)), len(st.where(DEBT, ">", 100)))
+    tops = [list(df.index[st.top(c, 3, largest)]) for c in ("Recovery_score_", DEBT) for largest in (True, False)]
+    return summary_stats, averages, st.buckets("Recovery_score_"), st.buckets(DEBT), counts, tops
+
+
+def best_of(fn, df, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(df)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    df = synthetic(args.rows)
+    t_pd, ref = best_of(pandas_path, df, args.repeat)
+    t_np, got = best_of(kernel_path, df, args.repeat)
+    print(f"{args.rows:,} rows x {len(METRICS) + 1} metrics")
+    print(f"  pandas per-column  {t_pd*1e3:8.1f} ms")
+    print(f"  stats kernel       {t_np*1e3:8.1f} ms   x{t_pd / t_np:.1f}")
+    print(f"  identical output: {ref == got}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# bench_whoop_stream.py
+# Summarizing a very large WHOOP export whole vs in chunks:
+#   memory   read_whoop_csv + stats_kernel.summarize (the regular path)
+#   stream   stats_stream.summarize_csv (uploads above WHOOP_STREAM_MB)
+# Each mode runs in its own process so peak RSS is comparable. Reports time,
+# peak RSS, the largest deviation of the streamed describe() figures, and the
+# rank error of the streamed quartiles (the digest is compressed on the
+# continuous columns of the synthetic export).
+#
+#   python benchmarks/bench_whoop_stream.py [--rows 1000000] [--chunk-rows 100000]
+import os, sys, json, time, shutil, argparse, resource, subprocess, tempfile
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "whoop"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+COLUMNS = ["Recovery_score_", "Resting_heart_rate_(bpm)", "Heart_rate_variability_(ms)", "Sleep_performance_",
+           "Asleep_duration_(min)", "Sleep_efficiency_", "Day_Strain", "Energy_burned_(cal)", "Sleep_debt_(min)"]
+
+
+def write_export(rows, path, seed=1):
+    # Ten years of daily cycles repeated; the decimal metrics are redrawn per
+    # row so they have far more distinct values than the digest keeps exactly.
+    from bench_whoop_history import export
+    from ingest import WHOLE_COLUMNS
+    block = export(3650)
+    df = pd.concat([block] * -(-rows // len(block)), ignore_index=True).iloc[:rows]
+    rng = np.random.default_rng(seed)
+    for raw in df.columns:
+        if df[raw].dtype.kind == "f" and raw.strip() not in WHOLE_COLUMNS:
+            df[raw] = rng.normal(30, 5, rows).round(3)
+    df.to_csv(path, index=False)
+
+
+def run(mode, path, chunk_rows):
+    from ingest import read_whoop_csv
+    from stats_kernel import summarize
+    from stats_stream import summarize_csv
+    t0 = time.perf_counter()
+    if mode == "memory":
+        st = summarize(read_whoop_csv(path, columns=["Cycle_start_time"] + COLUMNS), COLUMNS)
+    else:
+        st = summarize_csv(path, COLUMNS, chunk_rows=chunk_rows)
+    seconds = time.perf_counter() - t0
+    print(json.dumps({"seconds": seconds, "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                      "stats": st.stats, "counts": [st.count("Recovery_score_", "<", 50),
+                                                    st.count("Sleep_debt_(min)", ">", 100)]}))
+
+
+def child(mode, path, chunk_rows):
+    out = subprocess.run([sys.executable, __file__, "--run", mode, "--path", path, "--chunk-rows", str(chunk_rows)],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--chunk-rows", type=int, default=100_000)
+    ap.add_argument("--run", choices=["memory", "stream"], help=argparse.SUPPRESS)
+    ap.add_argument("--path", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.run:
+        return run(args.run, args.path, args.chunk_rows)
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "physiological_cycles_today.csv")
+        write_export(args.rows, path)
+        print(f"{args.rows:,} rows, {os.path.getsize(path) / 2**20:.0f} MB, chunks of {args.chunk_rows:,}")
+        res = {mode: child(mode, path, args.chunk_rows) for mode in ("memory", "stream")}
+        for mode, r in res.items():
+            print(f"  {mode:7s} {r['seconds']:6.2f} s   peak RSS {r['rss_mb']:7.0f} MB")
+        mem, stream = res["memory"]["stats"], res["stream"]["stats"]
+        assert res["memory"]["counts"] == res["stream"]["counts"]
+
+        from ingest import read_whoop_csv
+        df = read_whoop_csv(path, columns=COLUMNS)
+        dev = {"count/min/max": 0.0, "mean/std": 0.0, "quartiles": 0.0}
+        rank, shown = 0.0, 0
+        for c in COLUMNS:
+            x = np.sort(df[c].to_numpy("float64", na_value=np.nan))
+            x = x[~np.isnan(x)]
+            for k, a in mem[c].items():
+                b = stream[c][k]
+                group = "mean/std" if k in ("mean", "std") else "quartiles" if "%" in k else "count/min/max"
+                dev[group] = max(dev[group], abs(a - b) / max(abs(a), 1e-12))
+                shown += round(a, 2) != round(b, 2)
+                if "%" in k:
+                    q = float(k[:-1]) / 100
+                    lo, hi = np.searchsorted(x, b, "left"), np.searchsorted(x, b, "right")
+                    target = q * (len(x) - 1)
+                    rank = max(rank, max(lo - target, target - hi, 0) / len(x))
+        print("stream vs memory, max relative deviation:")
+        for group, d in dev.items():
+            print(f"  {group:14s} {d:.2e}")
+        print(f"  quartile rank error {rank:.4%} of rows; displayed (2 dp) figures differing: {shown}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# bench_whoop_upload_store.py
+# A long-running instance receiving repeated WHOOP uploads: --uploads files
+# drawn from --distinct different exports (most people re-upload the same
+# file), all named physiological_cycles_today.csv. Compares
+#   save by name   file.save(uploads/<secure_filename>) as before: every
+#                  upload rewritten, users overwrite each other
+#   upload store   upload_store.UploadStore with a quota of --quota-mb
+# on bytes written, bytes kept on disk and per-upload time.
+#
+#   python benchmarks/bench_whoop_upload_store.py [--uploads 500] [--distinct 40] [--quota-mb 20]
+import os, io, sys, time, shutil, argparse, tempfile
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "whoop"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_whoop_history import export
+from upload_store import UploadStore
+
+
+def disk_bytes(root):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--uploads", type=int, default=500)
+    ap.add_argument("--distinct", type=int, default=40)
+    ap.add_argument("--quota-mb", type=float, default=20)
+    args = ap.parse_args()
+
+    files = [export(365 * (1 + i % 3), seed=i).to_csv(index=False).encode() for i in range(args.distinct)]
+    rng = np.random.default_rng(0)
+    # Zipf-like popularity: a few exports are uploaded over and over.
+    picks = np.minimum(rng.zipf(1.3, args.uploads) - 1, args.distinct - 1)
+    tmp = tempfile.mkdtemp()
+    try:
+        by_name = os.path.join(tmp, "by_name")
+        os.makedirs(by_name)
+        t0 = time.perf_counter()
+        for i in picks:
+            with open(os.path.join(by_name, "physiological_cycles_today.csv"), "wb") as fh:
+                fh.write(files[i])
+        t_name = time.perf_counter() - t0
+        written = sum(len(files[i]) for i in picks)
+
+        store = UploadStore(os.path.join(tmp, "store"), quota_bytes=args.quota_mb * 1024 * 1024)
+        stored = 0
+        t0 = time.perf_counter()
+        for n, i in enumerate(picks):
+            holder = f"session{n % 50}"  # 50 live sessions
+            seen = store.counts["deduplicated"]
+            digest = store.put(io.BytesIO(files[i]), holder)
+            stored += len(files[i]) if store.counts["deduplicated"] == seen else 0
+            assert store.path(digest, holder)
+        t_store = time.perf_counter() - t0
+
+        mb = 1024 * 1024
+        print(f"{args.uploads} uploads of {len(set(picks.tolist()))} distinct exports ({written / mb:.0f} MB in total)")
+        print(f"  save by name  {t_name / args.uploads * 1e3:6.2f} ms/upload  wrote {written / mb:6.1f} MB  "
+              f"kept {disk_bytes(by_name) / mb:5.1f} MB (each upload overwrites the last)")
+        print(f"  upload store  {t_store / args.uploads * 1e3:6.2f} ms/upload  wrote {stored / mb:6.1f} MB  "
+              f"kept {disk_bytes(os.path.join(tmp, 'store')) / mb:5.1f} MB (quota {args.quota_mb:g} MB)")
+        print(f"  store: {store.stats()}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# fake_openai.py
+# Minimal local stand-in for the OpenAI HTTP API (chat.completions and
+# responses, plain or stream=True, plus bag-of-words embeddings) with a fixed
+# time to first token and a per-token delay (optionally plus a prefill delay
+# per prompt token). Used by the LLM load tests; can also back the apps for
+# manual testing:
+#
+#   python benchmarks/fake_openai.py --port 8099 --latency 0.5 --token-delay 0.05
+#   OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=x python enbd/financial_flask_genai_2.py
+#
+# asyncio-based (HTTP/1.1 keep-alive, Content-Length bodies only) so it can
+# hold thousands of delayed requests at once without a thread per request.
+import re, json, time, zlib, asyncio, argparse, threading
+import numpy as np
+
+
+def bow_vector(text, dim=256):
+    """Deterministic stand-in embedding: hashed bag of words (+ word bigrams)."""
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    v = np.zeros(dim)
+    for tok in words + [a + " " + b for a, b in zip(words, words[1:])]:
+        v[zlib.crc32(tok.encode()) % dim] += 1.0
+    n = np.linalg.norm(v)
+    return (v / n if n else v).tolist()
+
+
+class FakeOpenAI:
+    def __init__(self, latency=0.2, host="127.0.0.1", port=0, answer="Fake answer.", token_delay=0.0,
+                 prefill_delay=0.0):
+        # latency: time to first token; a non-streamed reply also waits for
+        # every token (token_delay each), as the real API does. prefill_delay
+        # is added per prompt token (~4 characters of the messages).
+        self.latency, self.host, self.port, self.answer = latency, host, port, answer
+        self.token_delay, self.prefill_delay = token_delay, prefill_delay
+        # Failure injection: paths ending in one of ``missing`` answer 404, the
+        # next ``fail_next`` requests answer 503, and everything does while ``down``.
+        self.missing = ()
+        self.fail_next = 0
+        self.down = False
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._loop = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    # ----- payloads -----
+    def _chat(self, body):
+        return {
+            "id": f"chatcmpl-fake-{self.requests}", "object": "chat.completion",
+            "created": int(time.time()), "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": self.answer}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def _response(self, body):
+        return {
+            "id": f"resp-fake-{self.requests}", "object": "response", "status": "completed",
+            "created_at": int(time.time()), "model": body.get("model", "gpt-4o-mini"),
+            "output": [{"type": "message", "id": "msg-fake", "status": "completed", "role": "assistant",
+                        "content": [{"type": "output_text", "text": self.answer, "annotations": []}]}],
+            "parallel_tool_calls": False, "tool_choice": "auto", "tools": [],
+        }
+
+    def _embeddings(self, body):
+        texts = body.get("input")
+        texts = [texts] if isinstance(texts, str) else texts
+        return {
+            "object": "list", "model": body.get("model", "text-embedding-3-small"),
+            "data": [{"object": "embedding", "index": i, "embedding": bow_vector(t)} for i, t in enumerate(texts)],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    def _tokens(self):
+        words = self.answer.split(" ")
+        return [w + " " for w in words[:-1]] + words[-1:]
+
+    def _chat_chunk(self, body, delta, finish=None):
+        return {
+            "id": f"chatcmpl-fake-{self.requests}", "object": "chat.completion.chunk",
+            "created": int(time.time()), "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+
+    def _stream_events(self, path, body):
+        # (event name or None, payload) pairs in OpenAI's SSE order
+        if path.endswith("/chat/completions"):
+            yield None, self._chat_chunk(body, {"role": "assistant", "content": ""})
+            for tok in self._tokens():
+                yield "token", self._chat_chunk(body, {"content": tok})
+            yield None, self._chat_chunk(body, {}, "stop")
+            return
+        for i, tok in enumerate(self._tokens()):
+            yield "token", {"type": "response.output_text.delta", "item_id": "msg-fake", "output_index": 0,
+                            "content_index": 0, "delta": tok, "sequence_number": i}
+        yield "response.completed", {"type": "response.completed", "response": self._response(body),
+                                     "sequence_number": len(self._tokens())}
+
+    async def _stream(self, writer, path, body):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Transfer-Encoding: chunked\r\n\r\n")
+        first = True
+        for kind, payload in self._stream_events(path, body):
+            if kind == "token":
+                await asyncio.sleep(0 if first else self.token_delay)
+                first = False
+            name = payload.get("type")
+            frame = (f"event: {name}\n" if name else "") + f"data: {json.dumps(payload)}\n\n"
+            if path.endswith("/chat/completions") and payload["choices"][0]["finish_reason"]:
+                frame += "data: [DONE]\n\n"
+            data = frame.encode()
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    # ----- HTTP -----
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, path, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, v = h.decode("latin-1").split(":", 1)
+                    headers[k.strip().lower()] = v.strip()
+                raw = await reader.readexactly(int(headers.get("content-length", "0")))
+                body = json.loads(raw or b"{}")
+
+                self.requests += 1
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                path = path.split("?")[0]
+                known = method == "POST" and path.endswith(("/chat/completions", "/responses"))
+                failure = None
+                if self.missing and path.endswith(tuple(self.missing)):
+                    failure = "404 Not Found"
+                elif self.down or self.fail_next > 0:
+                    self.fail_next = max(0, self.fail_next - 1)
+                    failure = "503 Service Unavailable"
+                try:
+                    if not failure and not path.endswith("/embeddings"):
+                        prompt = json.dumps(body.get("messages") or body.get("input") or "")
+                        await asyncio.sleep(self.latency + self.prefill_delay * len(prompt) / 4)
+                    if not failure and known and body.get("stream"):
+                        await self._stream(writer, path, body)
+                        continue
+                    if not failure and known:
+                        await asyncio.sleep(self.token_delay * len(self._tokens()))
+                finally:
+                    self.in_flight -= 1
+
+                if failure:
+                    status, payload = failure, {"error": {"message": f"fake {failure}"}}
+                elif method == "POST" and path.endswith("/chat/completions"):
+                    status, payload = "200 OK", self._chat(body)
+                elif method == "POST" and path.endswith("/responses"):
+                    status, payload = "200 OK", self._response(body)
+                elif method == "POST" and path.endswith("/embeddings"):
+                    status, payload = "200 OK", self._embeddings(body)
+                else:
+                    status, payload = "404 Not Found", {"error": {"message": f"no route {path}"}}
+                data = json.dumps(payload).encode()
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        server = await asyncio.start_server(self._handle, self.host, self.port, backlog=4096)
+        self.port = server.sockets[0].getsockname()[1]
+        return server
+
+    def start(self):
+        """Runs the server on a daemon thread; returns base_url once listening."""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.serve())
+            ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, name="fake-openai", daemon=True).start()
+        ready.wait()
+        return self.base_url
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--latency", type=float, default=0.5, help="seconds to first token")
+    ap.add_argument("--token-delay", type=float, default=0.05, help="seconds per further token")
+    args = ap.parse_args()
+    answer = ("Cost-to-income is within the usual range for a large UAE bank; "
+              "watch the NPL ratio and coverage next quarter.")
+    fake = FakeOpenAI(latency=args.latency, port=args.port, answer=answer, token_delay=args.token_delay)
+
+    async def forever():
+        await fake.serve()
+        print(f"Fake OpenAI on {fake.base_url} (latency {args.latency}s)")
+        await asyncio.Event().wait()
+
+    asyncio.run(forever())
+
+
+if __name__ == "__main__":
+    main()
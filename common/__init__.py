@@ -0,0 +1,2 @@
+# Helpers shared by the ENBD and WHOOP apps. The apps run as plain scripts
+# (python enbd/x.py), so they put the repo root on sys.path before importing.
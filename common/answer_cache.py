@@ -0,0 +1,179 @@
+# answer_cache.py
+# In-process cache of assistant answers, shared by the ENBD and WHOOP apps.
+#
+# Exact tier: key = (model, system prompt, sha256(context), normalized prompt),
+# TTL + LRU. Optional near-duplicate tier: prompts are embedded and a miss is
+# served from the most similar cached prompt *for the same model, system
+# prompt and context* when cosine similarity >= threshold.
+#
+# Config (env): LLM_CACHE_MAX (entries, default 1024, 0 disables),
+# LLM_CACHE_TTL_S (default 3600), LLM_CACHE_SEMANTIC=1 to enable the
+# embedding tier, LLM_CACHE_SEMANTIC_THRESHOLD (default 0.92).
+import os, json, time, hashlib, threading
+from collections import OrderedDict
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX", "1024"))
+DEFAULT_TTL_S = float(os.environ.get("LLM_CACHE_TTL_S", "3600"))
+SEMANTIC_ENABLED = os.environ.get("LLM_CACHE_SEMANTIC", "0") == "1"
+DEFAULT_THRESHOLD = float(os.environ.get("LLM_CACHE_SEMANTIC_THRESHOLD", "0.92"))
+
+
+def normalize_prompt(prompt):
+    # "  Is Cost-to-Income healthy?? " -> "is cost-to-income healthy"
+    return " ".join((prompt or "").casefold().split()).rstrip("?!. ")
+
+
+def _sha(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """Thread-safe answer cache.
+
+    ``embed`` (list of texts -> list of vectors) turns on the near-duplicate
+    tier; pass a stub for offline use. ``clock`` is injectable for TTL tests.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_S, embed=None,
+                 threshold=DEFAULT_THRESHOLD, clock=time.monotonic):
+        self.max_entries, self.ttl = max_entries, ttl
+        self.embed, self.threshold = embed, threshold
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, answer, scope)
+        self._vectors = {}             # scope -> {key: unit vector}
+        self.counts = {"exact_hits": 0, "semantic_hits": 0, "misses": 0,
+                       "stores": 0, "evictions": 0, "expirations": 0}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _keys(self, model, system, context, prompt):
+        scope = _sha(json.dumps([model, system, _sha(context or "")]))
+        return scope, _sha(scope + "\n" + normalize_prompt(prompt))
+
+    def _embed(self, prompt):
+        v = np.asarray(self.embed([normalize_prompt(prompt)])[0], dtype="float64")
+        n = np.linalg.norm(v)
+        return v / n if n else v
+
+    def _live(self, key, now):
+        # Caller holds the lock. Returns the answer or None (dropping it if expired).
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            self._drop(key)
+            self.counts["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _drop(self, key):
+        _, _, scope = self._entries.pop(key)
+        vecs = self._vectors.get(scope)
+        if vecs is not None:
+            vecs.pop(key, None)
+            if not vecs:
+                del self._vectors[scope]
+
+    # ----- lookup / store -----
+    def lookup(self, model, system, context, prompt):
+        """-> (answer or None, "exact" | "semantic" | None, probe); pass probe to store()."""
+        scope, key = self._keys(model, system, context, prompt)
+        probe = {"scope": scope, "key": key, "prompt": prompt, "vec": None}
+        if not self.enabled:
+            return None, None, probe
+        with self._lock:
+            answer = self._live(key, self.clock())
+            if answer is not None:
+                self.counts["exact_hits"] += 1
+                return answer, "exact", probe
+            has_neighbours = bool(self._vectors.get(scope))
+
+        if self.embed is not None and has_neighbours:
+            probe["vec"] = vec = self._embed_safely(prompt)
+        if probe["vec"] is not None:
+            with self._lock:
+                vecs = self._vectors.get(scope) or {}
+                if vecs:
+                    keys = list(vecs)
+                    sims = np.vstack([vecs[k] for k in keys]) @ vec
+                    best = int(np.argmax(sims))
+                    if sims[best] >= self.threshold:
+                        answer = self._live(keys[best], self.clock())
+                        if answer is not None:
+                            self.counts["semantic_hits"] += 1
+                            # Alias this phrasing so a repeat is an exact hit (no embedding call).
+                            self._insert(key, scope, self._entries[keys[best]][0], answer, vec)
+                            return answer, "semantic", probe
+        with self._lock:
+            self.counts["misses"] += 1
+        return None, None, probe
+
+    def store(self, probe, answer):
+        if not self.enabled or not answer:
+            return
+        vec = probe["vec"]
+        if self.embed is not None and vec is None:
+            vec = self._embed_safely(probe["prompt"])
+        with self._lock:
+            self._insert(probe["key"], probe["scope"], self.clock() + self.ttl, answer, vec)
+            self.counts["stores"] += 1
+
+    def _insert(self, key, scope, expires_at, answer, vec):
+        # Caller holds the lock.
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (expires_at, answer, scope)
+        if vec is not None:
+            self._vectors.setdefault(scope, {})[key] = vec
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+            self.counts["evictions"] += 1
+
+    def _embed_safely(self, prompt):
+        # Embedding failures only disable the near-duplicate tier for this call.
+        try:
+            return self._embed(prompt)
+        except Exception:
+            return None
+
+    # ----- helpers for the apps -----
+    def get_or_call(self, model, system, context, prompt, call):
+        """Cached answer, else ``call()`` (exceptions propagate and are not cached)."""
+        answer, _, probe = self.lookup(model, system, context, prompt)
+        if answer is not None:
+            return answer
+        answer = call()
+        self.store(probe, answer)
+        return answer
+
+    def stream(self, model, system, context, prompt, deltas):
+        """Generator: the cached answer as one delta, else ``deltas()`` forwarded
+        and stored once the stream completes."""
+        answer, _, probe = self.lookup(model, system, context, prompt)
+        if answer is not None:
+            yield answer
+            return
+        parts = []
+        for delta in deltas():
+            parts.append(delta)
+            yield delta
+        self.store(probe, "".join(parts))
+
+    def stats(self):
+        with self._lock:
+            c = dict(self.counts)
+            c["entries"] = len(self._entries)
+        hits = c["exact_hits"] + c["semantic_hits"]
+        c["hit_rate"] = round(hits / (hits + c["misses"]), 4) if hits + c["misses"] else None
+        c["semantic"] = self.embed is not None
+        return c
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
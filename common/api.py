@@ -0,0 +1,66 @@
+# api.py
+# JSON API helpers shared by the ENBD and WHOOP apps (/api/v1/...).
+#
+# Every analysis is a pure function of the uploaded bytes, so a resource's
+# ETag is the upload's content hash plus the resource name and API_REVISION
+# (bump it when a payload's shape or computation changes). A request whose
+# If-None-Match carries that tag gets a 304 before anything is loaded or
+# computed; responses say Cache-Control: no-cache, so clients revalidate on
+# each use and pay for the body only when it changed.
+#
+# Bodies are compact JSON (no whitespace, NaN -> null). Charts are separate
+# image resources, never inlined as base64.
+import json
+import numpy as np
+from flask import Response, request
+
+API_REVISION = "1"
+CACHE_CONTROL = "no-cache"
+
+
+def etag_for(digest, *parts):
+    """Strong ETag (unquoted) for a resource derived from the content ``digest``."""
+    return "-".join((digest, API_REVISION) + parts)
+
+
+def not_modified(etag):
+    """A 304 response when the request's If-None-Match matches ``etag``, else None."""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    resp = Response(status=304)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = CACHE_CONTROL
+    return resp
+
+
+def json_response(payload, etag=None, status=200, headers=None):
+    body = json.dumps(jsonable(payload), separators=(",", ":"), ensure_ascii=False, allow_nan=False)
+    resp = Response(body, status=status, mimetype="application/json", headers=headers)
+    if etag:
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = CACHE_CONTROL
+    return resp
+
+
+def binary_response(data, mimetype, etag):
+    resp = Response(data, mimetype=mimetype)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = CACHE_CONTROL
+    return resp
+
+
+def api_error(message, status):
+    return json_response({"error": message}, status=status)
+
+
+def jsonable(value):
+    """``value`` with NumPy scalars as Python numbers, NaN/inf as None and tuples as lists."""
+    if isinstance(value, dict):
+        return {str(k): jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        return value if np.isfinite(value) else None
+    return value
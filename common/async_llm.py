@@ -0,0 +1,192 @@
+# async_llm.py
+# One AsyncOpenAI client on a background event loop, shared by every request
+# thread of an app. All in-flight questions are multiplexed over its pooled
+# HTTP connections; a semaphore caps how many reach OpenAI at once and the
+# rest wait (up to queue_timeout) instead of each holding a socket.
+import os, queue, asyncio, threading, contextlib
+from openai import AsyncOpenAI, Timeout
+
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "16"))
+DEFAULT_TIMEOUT_S = float(os.environ.get("OPENAI_TIMEOUT_S", "60"))
+DEFAULT_CONNECT_TIMEOUT_S = float(os.environ.get("OPENAI_CONNECT_TIMEOUT_S", "5"))
+DEFAULT_QUEUE_TIMEOUT_S = float(os.environ.get("OPENAI_QUEUE_TIMEOUT_S", "30"))
+
+
+class LLMBusy(Exception):
+    """Raised when a call waited longer than queue_timeout for a concurrency slot."""
+
+
+class AsyncLLM:
+    """Thread-safe front end to AsyncOpenAI.
+
+    Coroutines (``chat_async``/``respond_async``) can be awaited from async
+    code; Flask views and CLIs call the blocking ``chat``/``respond``, which
+    run on the shared loop and only park the calling thread on a future.
+    ``submit_chat`` returns that future directly for fan-out, and
+    ``stream_chat``/``stream_respond`` are plain generators of text deltas.
+    The loop thread and client are created on first use.
+    """
+
+    def __init__(self, api_key=None, base_url=None, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 timeout=DEFAULT_TIMEOUT_S, connect_timeout=DEFAULT_CONNECT_TIMEOUT_S,
+                 queue_timeout=DEFAULT_QUEUE_TIMEOUT_S, max_retries=1):
+        self.api_key, self.base_url = api_key, base_url
+        self.max_concurrency = max_concurrency
+        self.timeout = Timeout(timeout, connect=connect_timeout)
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.client = None
+        self._loop = None
+        self._sem = None
+        self._lock = threading.Lock()
+        # Gauges for /debug and the load test.
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_in_flight = 0
+
+    # ----- loop management -----
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is not None:
+                return self._loop
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="async-llm", daemon=True).start()
+
+            async def init():
+                # Client and semaphore must be created on the loop that uses them.
+                self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                          timeout=self.timeout, max_retries=self.max_retries)
+                self._sem = asyncio.Semaphore(self.max_concurrency)
+
+            asyncio.run_coroutine_threadsafe(init(), loop).result()
+            self._loop = loop
+            return loop
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def _deadline(self):
+        # Worst case for a blocking caller: queueing + the request itself (+ retries).
+        return self.queue_timeout + self.timeout.read * (self.max_retries + 1) + self.timeout.connect
+
+    @contextlib.asynccontextmanager
+    async def _slot(self):
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise LLMBusy(f"no free LLM slot after {self.queue_timeout:g}s "
+                          f"({self.max_concurrency} requests in flight)")
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._sem.release()
+
+    async def _call(self, fn, **kwargs):
+        async with self._slot():
+            return await fn(**kwargs)
+
+    # ----- coroutines (run on the shared loop) -----
+    async def chat_async(self, messages, model="gpt-4o-mini", **kwargs):
+        resp = await self._call(self.client.chat.completions.create, model=model, messages=messages, **kwargs)
+        return resp.choices[0].message.content
+
+    async def respond_async(self, input, model="gpt-4o-mini", **kwargs):
+        resp = await self._call(self.client.responses.create, model=model, input=input, **kwargs)
+        return resp.output_text
+
+    async def embed_async(self, texts, model="text-embedding-3-small"):
+        resp = await self._call(self.client.embeddings.create, model=model, input=list(texts))
+        return [d.embedding for d in resp.data]
+
+    async def stream_chat_async(self, messages, model="gpt-4o-mini", **kwargs):
+        """Yields text deltas of a stream=True chat completion (holds a slot until done)."""
+        async with self._slot():
+            stream = await self.client.chat.completions.create(
+                model=model, messages=messages, stream=True, **kwargs)
+            async with stream:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+
+    async def stream_respond_async(self, input, model="gpt-4o-mini", **kwargs):
+        """Yields text deltas of a stream=True Responses API call."""
+        async with self._slot():
+            stream = await self.client.responses.create(model=model, input=input, stream=True, **kwargs)
+            async with stream:
+                async for event in stream:
+                    if event.type == "response.output_text.delta":
+                        yield event.delta
+
+    def _iterate(self, agen, timeout=None):
+        # Drives an async generator on the shared loop and hands its items to
+        # the calling thread. Closing the returned generator early (client
+        # went away) cancels the upstream stream and frees the slot.
+        q = queue.Queue()
+        timeout = timeout or self._deadline()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    q.put((True, item))
+            except Exception as e:
+                q.put((False, e))
+            finally:
+                q.put((False, None))
+
+        fut = self._submit(pump())
+        try:
+            while True:
+                ok, item = q.get(timeout=timeout)
+                if ok:
+                    yield item
+                elif item is None:
+                    return
+                else:
+                    raise item
+        finally:
+            fut.cancel()
+
+    # ----- blocking wrappers for WSGI views / CLI -----
+    def run(self, coro, timeout=None):
+        """Runs any coroutine on the shared loop and waits (default: one call's worst case)."""
+        return self._submit(coro).result(timeout or self._deadline())
+
+    def iterate(self, agen, timeout=None):
+        """Blocking generator over an async generator run on the shared loop."""
+        return self._iterate(agen, timeout)
+
+    def submit_chat(self, messages, model="gpt-4o-mini", **kwargs):
+        return self._submit(self.chat_async(messages, model=model, **kwargs))
+
+    def chat(self, messages, model="gpt-4o-mini", **kwargs):
+        return self.submit_chat(messages, model=model, **kwargs).result(self._deadline())
+
+    def respond(self, input, model="gpt-4o-mini", **kwargs):
+        return self._submit(self.respond_async(input, model=model, **kwargs)).result(self._deadline())
+
+    def embed(self, texts, model="text-embedding-3-small"):
+        return self._submit(self.embed_async(texts, model=model)).result(self._deadline())
+
+    def stream_chat(self, messages, model="gpt-4o-mini", **kwargs):
+        return self._iterate(self.stream_chat_async(messages, model=model, **kwargs))
+
+    def stream_respond(self, input, model="gpt-4o-mini", **kwargs):
+        return self._iterate(self.stream_respond_async(input, model=model, **kwargs))
+
+    def stats(self):
+        return {"in_flight": self.in_flight, "waiting": self.waiting,
+                "peak_in_flight": self.peak_in_flight, "max_concurrency": self.max_concurrency}
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.client.close(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
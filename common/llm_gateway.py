@@ -0,0 +1,310 @@
+# llm_gateway.py
+# The apps' one way to OpenAI. gateway() returns the process's Gateway: one
+# AsyncLLM (one pooled AsyncOpenAI client on a background loop, see
+# async_llm.py) plus
+#   - API surface probing: ask()/stream() use the Responses API until a call
+#     fails in a way that means "not offered here" (404/400/422) and the same
+#     call then succeeds on chat.completions; from then on the process goes
+#     straight to chat.completions. OPENAI_API_SURFACE=responses|chat skips
+#     the probe.
+#   - bounded retries of transient failures (timeouts, connection errors,
+#     408/409/429, 5xx) with full-jitter exponential backoff. The SDK's own
+#     retries are off, so a call makes at most OPENAI_RETRIES + 1 attempts.
+#   - a per-call timeout (OPENAI_TIMEOUT_S, or timeout= on a call)
+#   - a circuit breaker: after OPENAI_BREAKER_FAILURES transient failures in a
+#     row, calls fail fast with LLMUnavailable for OPENAI_BREAKER_RESET_S; then
+#     a single trial call decides whether it closes again.
+# Streams are retried only before their first delta.
+#
+# The key comes from the environment after loading OPENAI_ENV_FILE, or when
+# that is unset the nearest .env found walking up from common/ (the project's
+# .env); variables already set win.
+#
+# Config (env): OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_ENV_FILE, OPENAI_API_SURFACE,
+#               OPENAI_RETRIES (default 2), OPENAI_BACKOFF_S (0.5), OPENAI_BACKOFF_MAX_S (8),
+#               OPENAI_BREAKER_FAILURES (5), OPENAI_BREAKER_RESET_S (30);
+#               pool size and timeouts as in async_llm.py
+import os, time, random, asyncio, threading
+import openai
+from dotenv import load_dotenv
+from common.async_llm import AsyncLLM, LLMBusy
+from common.metrics import span, timed_iter
+
+ENV_FILE = os.environ.get("OPENAI_ENV_FILE")
+NOT_CONFIGURED = "[OpenAI not configured: set OPENAI_API_KEY in the environment or .env]"
+
+RETRIES = int(os.environ.get("OPENAI_RETRIES", "2"))
+BACKOFF_S = float(os.environ.get("OPENAI_BACKOFF_S", "0.5"))
+BACKOFF_MAX_S = float(os.environ.get("OPENAI_BACKOFF_MAX_S", "8"))
+BREAKER_FAILURES = int(os.environ.get("OPENAI_BREAKER_FAILURES", "5"))
+BREAKER_RESET_S = float(os.environ.get("OPENAI_BREAKER_RESET_S", "30"))
+
+
+class LLMUnavailable(Exception):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+def transient(e):
+    """Worth retrying: the request may succeed as is a moment later."""
+    if isinstance(e, (openai.APIConnectionError, asyncio.TimeoutError)):  # includes APITimeoutError
+        return True
+    return isinstance(e, openai.APIStatusError) and (e.status_code in (408, 409, 429) or e.status_code >= 500)
+
+
+def unsupported(e):
+    """The endpoint itself was refused (or the SDK lacks it): try the other API surface."""
+    return isinstance(e, (openai.NotFoundError, openai.BadRequestError, openai.UnprocessableEntityError,
+                          AttributeError))
+
+
+# ---------- Circuit breaker ----------
+class CircuitBreaker:
+    """closed -> open after ``failures`` transient failures in a row -> half-open
+    after ``reset_s`` (one trial call) -> closed on success, open again on failure."""
+
+    def __init__(self, failures=BREAKER_FAILURES, reset_s=BREAKER_RESET_S, clock=time.monotonic):
+        self.failures, self.reset_s, self.clock = failures, reset_s, clock
+        self.state = "closed"
+        self._streak, self._opened_at, self._trial = 0, 0.0, False
+        self._lock = threading.Lock()
+        self.counts = {"opened": 0, "rejected": 0}
+
+    def before(self):
+        with self._lock:
+            if self.state == "open":
+                wait = self._opened_at + self.reset_s - self.clock()
+                if wait > 0:
+                    self.counts["rejected"] += 1
+                    raise LLMUnavailable(f"OpenAI unavailable (circuit open, next try in {wait:.0f}s)")
+                self.state, self._trial = "half_open", False
+            if self.state == "half_open":
+                if self._trial:
+                    self.counts["rejected"] += 1
+                    raise LLMUnavailable("OpenAI unavailable (circuit half-open, trial call in flight)")
+                self._trial = True
+
+    def success(self):
+        # Any upstream answer, error statuses included, shows it is reachable.
+        with self._lock:
+            self.state, self._streak, self._trial = "closed", 0, False
+
+    def failure(self):
+        with self._lock:
+            self._streak += 1
+            if self.state == "half_open" or self._streak >= self.failures:
+                if self.state != "open":
+                    self.counts["opened"] += 1
+                self.state, self._opened_at, self._trial = "open", self.clock(), False
+
+    def cancel(self):
+        # The call never reached upstream (local queue full).
+        with self._lock:
+            self._trial = False
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, state=self.state, failure_streak=self._streak)
+
+
+# ---------- Gateway ----------
+class Gateway:
+    """Blocking (``ask``/``chat``/``respond``/``stream``/``embed``) and ``*_async``
+    calls with surface probing, retries, timeouts and a circuit breaker."""
+
+    def __init__(self, api_key=None, base_url=None, surface=None, retries=RETRIES, backoff=BACKOFF_S,
+                 backoff_max=BACKOFF_MAX_S, breaker=None, **pool):
+        self.llm = AsyncLLM(api_key=api_key, base_url=base_url, max_retries=0, **pool)
+        self.timeout = self.llm.timeout.read
+        self.surface = surface or os.environ.get("OPENAI_API_SURFACE") or None
+        self._forced = self.surface is not None
+        self.retries, self.backoff, self.backoff_max = retries, backoff, backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.counts = {"calls": 0, "retries": 0, "failures": 0, "fallbacks": 0}
+        self.probe_error = None
+
+    def _sleep_for(self, attempt):
+        # Full jitter: uniform over [0, min(cap, base * 2^attempt)].
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+    def _deadline(self):
+        # Blocking callers wait for every attempt and backoff, plus queueing.
+        return self.llm.queue_timeout + (self.retries + 1) * (self.timeout + self.llm.timeout.connect) \
+            + self.retries * self.backoff_max
+
+    def _found(self, surface, error=None):
+        if self.surface is None:
+            self.surface = surface
+            self.probe_error = f"{type(error).__name__}: {error}" if error else None
+
+    # ----- retries + breaker -----
+    async def _call(self, make):
+        self.counts["calls"] += 1
+        for attempt in range(self.retries + 1):
+            self.breaker.before()
+            try:
+                result = await make()
+            except LLMBusy:
+                self.breaker.cancel()
+                raise
+            except Exception as e:
+                if not transient(e):
+                    self.breaker.success()
+                    raise
+                self.breaker.failure()
+                self.counts["failures"] += 1
+                if attempt == self.retries:
+                    raise
+                self.counts["retries"] += 1
+                await asyncio.sleep(self._sleep_for(attempt))
+            else:
+                self.breaker.success()
+                return result
+
+    async def _stream(self, open_stream):
+        self.counts["calls"] += 1
+        for attempt in range(self.retries + 1):
+            self.breaker.before()
+            agen, started = open_stream(), False
+            try:
+                async for delta in agen:
+                    if not started:
+                        started = True
+                        self.breaker.success()
+                    yield delta
+                if not started:
+                    self.breaker.success()
+                return
+            except LLMBusy:
+                self.breaker.cancel()
+                raise
+            except Exception as e:
+                if started:
+                    raise  # text already sent; a retry would repeat it
+                if not transient(e):
+                    self.breaker.success()
+                    raise
+                self.breaker.failure()
+                self.counts["failures"] += 1
+                if attempt == self.retries:
+                    raise
+                self.counts["retries"] += 1
+                await asyncio.sleep(self._sleep_for(attempt))
+            finally:
+                await agen.aclose()
+
+    def _kwargs(self, kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return kwargs
+
+    # ----- coroutines -----
+    async def chat_async(self, messages, model="gpt-4o-mini", **kwargs):
+        kwargs = self._kwargs(kwargs)
+        return await self._call(lambda: self.llm.chat_async(messages, model=model, **kwargs))
+
+    async def respond_async(self, input, model="gpt-4o-mini", **kwargs):
+        kwargs = self._kwargs(kwargs)
+        return await self._call(lambda: self.llm.respond_async(input, model=model, **kwargs))
+
+    async def embed_async(self, texts, model="text-embedding-3-small"):
+        return await self._call(lambda: self.llm.embed_async(texts, model=model))
+
+    async def ask_async(self, messages, model="gpt-4o-mini", **kwargs):
+        """Answer text via the probed API surface."""
+        if self.surface != "chat":
+            try:
+                text = await self.respond_async(messages, model=model, **kwargs)
+            except Exception as e:
+                if self._forced or self.surface == "responses" or not unsupported(e):
+                    raise
+                text = await self.chat_async(messages, model=model, **kwargs)
+                self.counts["fallbacks"] += 1
+                self._found("chat", e)
+                return text
+            self._found("responses")
+            return text
+        return await self.chat_async(messages, model=model, **kwargs)
+
+    async def stream_async(self, messages, model="gpt-4o-mini", **kwargs):
+        """Text deltas via the probed API surface."""
+        kwargs = self._kwargs(kwargs)
+        error = None
+        if self.surface != "chat":
+            started = False
+            try:
+                async for delta in self._stream(lambda: self.llm.stream_respond_async(messages, model=model, **kwargs)):
+                    started = True
+                    yield delta
+                self._found("responses")
+                return
+            except Exception as e:
+                if started or self._forced or self.surface == "responses" or not unsupported(e):
+                    raise
+                error = e
+            self.counts["fallbacks"] += 1
+        started = False
+        async for delta in self._stream(lambda: self.llm.stream_chat_async(messages, model=model, **kwargs)):
+            if not started and self.surface is None:
+                self._found("chat", error)
+            started = True
+            yield delta
+
+    async def stream_chat_async(self, messages, model="gpt-4o-mini", **kwargs):
+        kwargs = self._kwargs(kwargs)
+        async for delta in self._stream(lambda: self.llm.stream_chat_async(messages, model=model, **kwargs)):
+            yield delta
+
+    # ----- blocking wrappers for WSGI views / CLI (timed as the "openai" stage) -----
+    def _run(self, coro):
+        with span("openai"):
+            return self.llm.run(coro, self._deadline())
+
+    def ask(self, messages, model="gpt-4o-mini", **kwargs):
+        return self._run(self.ask_async(messages, model=model, **kwargs))
+
+    def chat(self, messages, model="gpt-4o-mini", **kwargs):
+        return self._run(self.chat_async(messages, model=model, **kwargs))
+
+    def respond(self, input, model="gpt-4o-mini", **kwargs):
+        return self._run(self.respond_async(input, model=model, **kwargs))
+
+    def embed(self, texts, model="text-embedding-3-small"):
+        return self._run(self.embed_async(texts, model=model))
+
+    def stream(self, messages, model="gpt-4o-mini", **kwargs):
+        return timed_iter("openai", self.llm.iterate(self.stream_async(messages, model=model, **kwargs),
+                                                     self._deadline()))
+
+    def stream_chat(self, messages, model="gpt-4o-mini", **kwargs):
+        return timed_iter("openai", self.llm.iterate(self.stream_chat_async(messages, model=model, **kwargs),
+                                                     self._deadline()))
+
+    def stats(self):
+        return dict(self.llm.stats(), **self.counts, surface=self.surface, probe_error=self.probe_error,
+                    breaker=self.breaker.stats())
+
+    def close(self):
+        self.llm.close()
+
+
+_lock = threading.Lock()
+_gateway = None
+
+
+def load_env():
+    if ENV_FILE is None:
+        load_dotenv()
+    elif os.path.exists(ENV_FILE):
+        load_dotenv(ENV_FILE)
+
+
+def gateway():
+    """The process's Gateway, or None when no OPENAI_API_KEY is configured."""
+    global _gateway
+    with _lock:
+        if _gateway is None:
+            load_env()
+            api_key = os.environ.get("OPENAI_API_KEY")
+            if not api_key:
+                return None
+            _gateway = Gateway(api_key=api_key, base_url=os.environ.get("OPENAI_BASE_URL") or None)
+        return _gateway
@@ -0,0 +1,250 @@
+# metrics.py
+# Per-stage latency for the ENBD and WHOOP apps.
+#
+#   with span("pdf_text"):      # or @timed("ratios") on a function
+#       ...
+#
+# Inside a request, span durations are summed per stage. When the response
+# goes out they are recorded into the app's latency histograms and returned as
+# a Server-Timing header (e.g. "pdf_text;dur=41.2, extract;dur=3.1,
+# render;dur=2.4, total;dur=52.0"), which browser devtools show per request.
+# Outside a request (CLI, or a streamed answer after its headers were sent)
+# each span is recorded on its own. Jinja rendering is timed with Flask's
+# template signals, so views need no span for it.
+#
+# install_metrics(app, name) adds the request hooks and GET /metrics:
+#   app_stage_seconds{app,stage}               histogram, per request and stage
+#   app_request_seconds{app,endpoint,method}   histogram, whole request
+#   app_responses_total{app,endpoint,method,status}
+# in the Prometheus text format. Values are kept per process; with several
+# workers, each one serves its own.
+#
+# Config (env): APP_METRICS (default 1; 0 makes spans no-ops and installs
+#               neither the hooks nor /metrics), APP_SERVER_TIMING (default 1)
+import os, time, bisect, functools, threading, contextvars
+from flask import Response, request, before_render_template, template_rendered
+
+ENABLED = os.environ.get("APP_METRICS", "1") != "0"
+SERVER_TIMING = os.environ.get("APP_SERVER_TIMING", "1") != "0"
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_stages = {}     # (app, stage) -> Histogram
+_requests = {}   # (app, endpoint, method) -> Histogram
+_responses = {}  # (app, endpoint, method, status) -> count
+_current = contextvars.ContextVar("metrics_request", default=None)
+_default_app = "cli"
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # per bucket, last one +Inf
+        self.sum, self.count = 0.0, 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+def _hist(table, key):
+    # Caller holds _lock.
+    hist = table.get(key)
+    if hist is None:
+        hist = table[key] = Histogram()
+    return hist
+
+
+def _observe(table, key, seconds):
+    with _lock:
+        _hist(table, key).observe(seconds)
+
+
+# ---------- Spans ----------
+class _RequestTimings:
+    __slots__ = ("t0", "stages", "render_t0")
+
+    def __init__(self):
+        self.t0, self.stages, self.render_t0 = time.perf_counter(), {}, None
+
+
+def record(stage, seconds):
+    req = _current.get()
+    if req is not None:
+        req.stages[stage] = req.stages.get(stage, 0.0) + seconds
+    else:
+        _observe(_stages, (_default_app, stage), seconds)
+
+
+class _Span:
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter() - self.t0)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+
+_NULL = _NullSpan()
+
+
+def span(stage):
+    """Context manager timing ``stage``; a shared no-op when APP_METRICS=0."""
+    return _Span(stage) if ENABLED else _NULL
+
+
+def timed(stage):
+    """Decorator form of span(); returns the function unchanged when APP_METRICS=0."""
+    def wrap(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with _Span(stage):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def timed_iter(stage, it):
+    """Yields from ``it``, timing it from start to exhaustion as one span."""
+    if not ENABLED:
+        yield from it
+        return
+    with _Span(stage):
+        yield from it
+
+
+# ---------- Flask hooks ----------
+def _render_started(sender, template, context, **extra):
+    req = _current.get()
+    if req is not None:
+        req.render_t0 = time.perf_counter()
+
+
+def _render_done(sender, template, context, **extra):
+    req = _current.get()
+    if req is not None and req.render_t0 is not None:
+        record("render", time.perf_counter() - req.render_t0)
+        req.render_t0 = None
+
+
+def server_timing(stages, total):
+    parts = [f"{stage};dur={seconds * 1e3:.1f}" for stage, seconds in stages.items()]
+    parts.append(f"total;dur={total * 1e3:.1f}")
+    return ", ".join(parts)
+
+
+def install_metrics(app, name):
+    """Times every request of ``app`` (labelled ``name``) and adds GET /metrics."""
+    global _default_app
+    if not ENABLED:
+        return
+    _default_app = name
+    before_render_template.connect(_render_started, app, weak=False)
+    template_rendered.connect(_render_done, app, weak=False)
+
+    @app.before_request
+    def _start_timings():
+        _current.set(_RequestTimings())
+
+    @app.after_request
+    def _finish_timings(resp):
+        req = _current.get()
+        if req is None:
+            return resp
+        _current.set(None)  # later spans (streamed bodies) are recorded on their own
+        total = time.perf_counter() - req.t0
+        endpoint, method = request.endpoint or "none", request.method
+        with _lock:
+            for stage, seconds in req.stages.items():
+                _hist(_stages, (name, stage)).observe(seconds)
+            key = (name, endpoint, method)
+            _hist(_requests, key).observe(total)
+            key += (resp.status_code,)
+            _responses[key] = _responses.get(key, 0) + 1
+        if SERVER_TIMING:
+            resp.headers["Server-Timing"] = server_timing(req.stages, total)
+        return resp
+
+    @app.teardown_request
+    def _drop_timings(exc=None):
+        _current.set(None)
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(exposition(), mimetype="text/plain; version=0.0.4")
+
+
+# ---------- Exposition ----------
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    return ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+
+def _histogram_lines(metric, label_names, table):
+    out = []
+    for key, hist in sorted(table.items()):
+        labels = _labels(label_names, key)
+        cumulative = 0
+        for bound, n in zip(BUCKETS + ("+Inf",), hist.counts):
+            cumulative += n
+            out.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        out.append(f"{metric}_sum{{{labels}}} {hist.sum:.6f}")
+        out.append(f"{metric}_count{{{labels}}} {hist.count}")
+    return out
+
+
+def exposition():
+    """All metrics in the Prometheus text format (version 0.0.4)."""
+    with _lock:
+        stages = {k: _copy(h) for k, h in _stages.items()}
+        requests_ = {k: _copy(h) for k, h in _requests.items()}
+        responses = dict(_responses)
+    lines = ["# HELP app_stage_seconds Time spent per request in each stage.",
+             "# TYPE app_stage_seconds histogram"]
+    lines += _histogram_lines("app_stage_seconds", ("app", "stage"), stages)
+    lines += ["# HELP app_request_seconds Request latency.",
+              "# TYPE app_request_seconds histogram"]
+    lines += _histogram_lines("app_request_seconds", ("app", "endpoint", "method"), requests_)
+    lines += ["# HELP app_responses_total Responses by status.",
+              "# TYPE app_responses_total counter"]
+    lines += [f"app_responses_total{{{_labels(('app', 'endpoint', 'method', 'status'), key)}}} {n}"
+              for key, n in sorted(responses.items())]
+    return "\n".join(lines) + "\n"
+
+
+def _copy(hist):
+    h = Histogram()
+    h.counts, h.sum, h.count = list(hist.counts), hist.sum, hist.count
+    return h
+
+
+def stats():
+    """{app: {stage: (count, mean ms)}} for /debug."""
+    with _lock:
+        out = {}
+        for (app, stage), hist in _stages.items():
+            out.setdefault(app, {})[stage] = (hist.count, round(hist.sum / hist.count * 1e3, 2))
+        return out
@@ -0,0 +1,156 @@
+# prompt_context.py
+# Token-budgeted LLM context, shared by the ENBD and WHOOP apps.
+#
+# A context is built from sections of lines, each with a priority (0 is kept
+# first). Lines are counted with tiktoken and packed greedily: sections in
+# priority order, lines within a section in the order given, and a section
+# stops at its first line that no longer fits. The kept lines are emitted in
+# the order the sections were added, so the prompt reads the same whatever
+# got cut. The finished text is counted again and trimmed from the lowest
+# priority until it fits, so a context never exceeds the model's budget.
+#
+# tiktoken downloads its BPE files on first use. Where they cannot be loaded
+# (offline), tokens are estimated from tiktoken-style pre-tokenization (words,
+# digit groups of 3, punctuation). The estimate is meant to err high.
+#
+# Config (env): LLM_CONTEXT_TOKENS (default budget, 512),
+#               LLM_CONTEXT_BUDGETS (per model, e.g. "gpt-4o-mini=512,gpt-4o=1024")
+import os, re, math, threading
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to the estimate
+    tiktoken = None
+
+DEFAULT_BUDGET = int(os.environ.get("LLM_CONTEXT_TOKENS", "512"))
+BUDGETS = {model.strip(): int(n) for model, _, n in
+           (item.partition("=") for item in os.environ.get("LLM_CONTEXT_BUDGETS", "").split(",") if "=" in item)}
+
+# Bump whenever packing or trimming changes (part of cache keys for stored contexts).
+CONTEXT_VERSION = "1"
+
+_PIECES = re.compile(r" ?[^\W\d_]+| ?\d{1,3}|\s+|[^\w\s]|_")
+_lock = threading.Lock()
+_encodings = {}  # model -> tiktoken Encoding, or None when unavailable
+_counts = {"contexts": 0, "tokens": 0, "max_tokens": 0, "truncated": 0, "dropped_lines": 0}
+
+
+def budget_for(model):
+    return BUDGETS.get(model, DEFAULT_BUDGET)
+
+
+def context_fingerprint(model="gpt-4o-mini"):
+    """Changes with anything that changes a built context besides its lines: version and budget."""
+    return f"context-{CONTEXT_VERSION}-{budget_for(model)}"
+
+
+def _encoding(model):
+    with _lock:
+        if model in _encodings:
+            return _encodings[model]
+    enc = None
+    if tiktoken is not None:
+        try:
+            try:
+                enc = tiktoken.encoding_for_model(model)
+            except KeyError:
+                enc = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            enc = None  # BPE files not cached and no network; remembered per process
+    with _lock:
+        _encodings[model] = enc
+    return enc
+
+
+def estimate_tokens(text):
+    # Long words are split into ~4-character pieces, like the BPE vocabularies do.
+    return sum(math.ceil(len(p.strip() or p) / 4) for p in _PIECES.findall(text))
+
+
+def count_tokens(text, model="gpt-4o-mini"):
+    enc = _encoding(model)
+    return len(enc.encode(text)) if enc is not None else estimate_tokens(text)
+
+
+def counter_name(model="gpt-4o-mini"):
+    enc = _encoding(model)
+    return f"tiktoken:{enc.name}" if enc is not None else "estimate"
+
+
+def num(x, digits=3):
+    """Compact number: integers as such, others to ``digits`` significant digits (2 dp at most).
+
+    16720.0 -> "16720", 87.466 -> "87.5", 0.04523 -> "0.05", None/NaN -> "n/a".
+    """
+    if x is None or x != x:
+        return "n/a"
+    x = float(x)
+    if x.is_integer() or abs(x) >= 10 ** digits:
+        return str(round(x))
+    return f"{round(x, 2):.{digits}g}"
+
+
+def stats():
+    with _lock:
+        return dict(_counts)
+
+
+class ContextBuilder:
+    """Sections of lines packed into ``budget`` tokens (default: the model's budget).
+
+    After build(), ``tokens`` is the size of the text and ``dropped`` the
+    number of lines that did not fit.
+    """
+
+    def __init__(self, model="gpt-4o-mini", budget=None):
+        self.model = model
+        self.budget = budget_for(model) if budget is None else budget
+        self.sections = []  # [title or None, priority, [lines]]
+        self.tokens, self.dropped = 0, 0
+
+    def add(self, lines, priority=0, title=None):
+        lines = [lines] if isinstance(lines, str) else [line for line in lines if line]
+        if lines:
+            self.sections.append([title, priority, lines])
+        return self
+
+    def _text(self, keep):
+        out = []
+        for i, (title, _, lines) in enumerate(self.sections):
+            if keep[i]:
+                if title:
+                    out.append(title)
+                out.extend(lines[:keep[i]])
+        return "\n".join(out)
+
+    def build(self):
+        keep = [0] * len(self.sections)  # lines kept per section (a prefix)
+        order = sorted(range(len(self.sections)), key=lambda i: self.sections[i][1])
+        used = 0
+        for i in order:
+            title, _, lines = self.sections[i]
+            for line in lines:
+                cost = count_tokens(line + "\n", self.model)
+                if keep[i] == 0 and title:
+                    cost += count_tokens(title + "\n", self.model)
+                if used + cost > self.budget:
+                    break
+                used += cost
+                keep[i] += 1
+        text = self._text(keep)
+        tokens = count_tokens(text, self.model)
+        # Per-line counts are an estimate of the joined text; trim until it fits.
+        while tokens > self.budget and any(keep):
+            i = next(i for i in reversed(order) if keep[i])
+            keep[i] -= 1
+            text = self._text(keep)
+            tokens = count_tokens(text, self.model)
+        self.tokens = tokens
+        self.dropped = sum(len(s[2]) for s in self.sections) - sum(keep)
+        with _lock:
+            _counts["contexts"] += 1
+            _counts["tokens"] += tokens
+            _counts["max_tokens"] = max(_counts["max_tokens"], tokens)
+            _counts["truncated"] += self.dropped > 0
+            _counts["dropped_lines"] += self.dropped
+        return text
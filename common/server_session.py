@@ -0,0 +1,149 @@
+# server_session.py
+# Server-side Flask sessions: the cookie carries only an opaque random id and
+# the session dict lives in a store.
+#
+#   SESSION_BACKEND=memory   in-process LRU (default; one process only)
+#   SESSION_BACKEND=sqlite   local SQLite file, shared by all workers on the host
+#                            (SESSION_SQLITE_PATH, default cache/sessions.sqlite3)
+#   SESSION_BACKEND=cookie   Flask's signed cookie (previous behaviour)
+#
+# Entries expire after PERMANENT_SESSION_LIFETIME (Flask config, 31 days by
+# default) or SESSION_TTL_S when set. SESSION_MAX_ENTRIES bounds the memory LRU.
+import os, re, time, secrets, sqlite3, threading
+from collections import OrderedDict
+from flask.sessions import SessionInterface, SessionMixin
+from flask.json.tag import TaggedJSONSerializer
+from werkzeug.datastructures import CallbackDict
+
+_SID = re.compile(r"^[A-Za-z0-9_-]{43}$")  # secrets.token_urlsafe(32)
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid, self.new, self.modified = sid, new, False
+
+
+# ---------- Stores (sid -> serialized session) ----------
+class MemoryStore:
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # sid -> (expires_at, payload)
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return entry[1]
+
+    def set(self, sid, payload, ttl):
+        with self._lock:
+            self._data[sid] = (time.time() + ttl, payload)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+
+class SQLiteStore:
+    """One row per session; WAL mode so several worker processes can share the file."""
+
+    def __init__(self, path, purge_every=500):
+        self.path, self.purge_every = path, purge_every
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS sessions "
+                       "(sid TEXT PRIMARY KEY, expires REAL NOT NULL, data TEXT NOT NULL)")
+
+    def _conn(self):
+        # sqlite3 connections are per thread.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get(self, sid):
+        row = self._conn().execute("SELECT data FROM sessions WHERE sid = ? AND expires > ?",
+                                   (sid, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, sid, payload, ttl):
+        db = self._conn()
+        db.execute("INSERT OR REPLACE INTO sessions (sid, expires, data) VALUES (?, ?, ?)",
+                   (sid, time.time() + ttl, payload))
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            db.execute("DELETE FROM sessions WHERE expires <= ?", (time.time(),))
+
+    def delete(self, sid):
+        self._conn().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+
+# ---------- Flask integration ----------
+class ServerSideSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()  # same types as the cookie session (tuples, bytes, ...)
+
+    def __init__(self, store, ttl=None):
+        self.store, self.ttl = store, ttl
+
+    def _ttl(self, app):
+        return self.ttl or app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and _SID.match(sid):
+            payload = self.store.get(sid)
+            if payload is not None:
+                return ServerSession(self.serializer.loads(payload), sid=sid)
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain, path = self.get_cookie_domain(app), self.get_cookie_path(app)
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if session.accessed:
+            response.vary.add("Cookie")
+        if session.modified:
+            self.store.set(session.sid, self.serializer.dumps(dict(session)), self._ttl(app))
+        if session.new or (session.modified and self.should_set_cookie(app, session)):
+            response.set_cookie(
+                name, session.sid, expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app),
+            )
+
+
+def install_session_store(app, backend=None):
+    """Switches ``app`` to a server-side session store chosen by SESSION_BACKEND."""
+    backend = backend or os.environ.get("SESSION_BACKEND", "memory")
+    if backend == "cookie":
+        return None
+    if backend == "sqlite":
+        store = SQLiteStore(os.environ.get("SESSION_SQLITE_PATH", os.path.join("cache", "sessions.sqlite3")))
+    elif backend == "memory":
+        store = MemoryStore(int(os.environ.get("SESSION_MAX_ENTRIES", "10000")))
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend!r}")
+    ttl = float(os.environ["SESSION_TTL_S"]) if os.environ.get("SESSION_TTL_S") else None
+    app.session_interface = ServerSideSessionInterface(store, ttl)
+    return store
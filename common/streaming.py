@@ -0,0 +1,85 @@
+# streaming.py
+# Token streaming helpers: Server-Sent Events for the web routes and
+# incremental printing for the CLI chat loops.
+import json, sys
+from flask import Response
+
+# Browser side (STREAM_SCRIPT): the page POSTs as before without JS; with JS
+# the form is intercepted and the answer is streamed from an EventSource.
+# Events:
+#   delta  data = JSON string (next piece of the answer)
+#   done   data = ""
+#   fail   data = JSON string (error message; "error" is EventSource's own)
+
+
+# Expects <form id="ask-form" data-stream="<sse url>"> with a "prompt" field,
+# and #answer-box (hidden until used) containing #answer.
+STREAM_SCRIPT = """
+<script>
+(function () {
+  var form = document.getElementById("ask-form");
+  if (!form || !window.EventSource) return;
+  form.addEventListener("submit", function (ev) {
+    var prompt = form.elements["prompt"].value.trim();
+    if (!prompt) return;
+    ev.preventDefault();
+    var box = document.getElementById("answer-box"), out = document.getElementById("answer");
+    var btn = form.querySelector("button[type=submit]");
+    box.style.display = ""; out.textContent = ""; btn.disabled = true;
+    var es = new EventSource(form.dataset.stream + "?prompt=" + encodeURIComponent(prompt));
+    function finish() { es.close(); btn.disabled = false; }  // no auto-reconnect (would re-ask)
+    es.addEventListener("delta", function (e) { out.textContent += JSON.parse(e.data); });
+    es.addEventListener("fail", function (e) { out.textContent += JSON.parse(e.data); });
+    es.addEventListener("done", finish);
+    es.onerror = finish;
+  });
+})();
+</script>
+"""
+
+
+def sse(event, data=""):
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+def sse_events(deltas):
+    try:
+        for delta in deltas:
+            yield sse("delta", json.dumps(delta))
+    except Exception as e:
+        yield sse("fail", json.dumps(f"[OpenAI error] {e}"))
+    finally:
+        # Client went away mid-answer: stop the upstream stream now, not at GC.
+        close = getattr(deltas, "close", None)
+        if close:
+            close()
+    yield sse("done")
+
+
+def sse_response(events):
+    """Flask response that flushes each event as soon as it is produced."""
+    return Response(events, mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def stream_answer(deltas):
+    return sse_response(sse_events(deltas))
+
+
+def stream_error(message):
+    return sse_response([sse("fail", json.dumps(message)), sse("done")])
+
+
+# ---------- Sync client (CLI) ----------
+def print_stream(deltas, prefix="\nAssistant: ", out=None):
+    """Prints deltas as they arrive; returns the full answer."""
+    out = out or sys.stdout
+    out.write(prefix)
+    out.flush()
+    parts = []
+    for delta in deltas:
+        parts.append(delta)
+        out.write(delta)
+        out.flush()
+    out.write("\n")
+    return "".join(parts)
@@ -0,0 +1,35 @@
+# templates.py
+# Inline page templates, compiled once per app instead of once per request.
+# render_template_string() hands its source to jinja_env.from_string(), which
+# lexes, parses and compiles it to Python on every call; Jinja's template
+# cache only covers templates loaded by name.
+#
+#   install_templates(app, {"report.html": REPORT_TEMPLATE})
+#   ...
+#   return render_template("report.html", ...)
+#
+# install_templates() puts the sources in front of the app's Jinja loader and
+# compiles them right away (so call it after the app's template filters are
+# registered: Jinja checks filter names at compile time). render_template()
+# then takes the compiled template from the environment's cache; context
+# processors, autoescaping (names end in .html) and the template signals that
+# common/metrics.py times as "render" all behave as with render_template_string.
+#
+# Config (env): TEMPLATE_BYTECODE_DIR (default unset: off) - Jinja bytecode
+#               cache directory, so a new process loads the compiled templates
+#               instead of compiling them again
+import os
+from jinja2 import ChoiceLoader, DictLoader, FileSystemBytecodeCache
+
+BYTECODE_DIR = os.environ.get("TEMPLATE_BYTECODE_DIR") or None
+
+
+def install_templates(app, sources, bytecode_dir=BYTECODE_DIR):
+    """Registers ``sources`` ({name: template source}) with ``app`` and compiles them."""
+    env = app.jinja_env
+    if bytecode_dir and env.bytecode_cache is None:
+        os.makedirs(bytecode_dir, exist_ok=True)
+        env.bytecode_cache = FileSystemBytecodeCache(bytecode_dir)
+    env.loader = ChoiceLoader([DictLoader(dict(sources)), env.loader])
+    for name in sources:
+        env.get_template(name)
@@ -0,0 +1,186 @@
+# batch.py
+# Bulk statement analysis: parse_pdf + compute_ratios over a directory of PDFs
+# on all cores, streaming one result per file as soon as it finishes.
+#
+#   python -m enbd.batch <dir> [--out results.jsonl|results.parquet] [--workers N] [--recursive]
+#   python enbd/batch.py <dir> ...
+import os, sys, json, time, argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# The ENBD modules import each other as top-level scripts; make that work
+# under "python -m enbd.batch" too (also needed in spawned workers).
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# statement_analysis, not the Flask app: workers build no app, session store,
+# parse cache or LLM gateway.
+from statement_analysis import (
+    parse_pdf, compute_ratios, metrics_to_context, patterns_dual, patterns_single,
+)
+
+
+def analyze_file(path):
+    t0 = time.perf_counter()
+    try:
+        dual, single = parse_pdf(path)
+        ratios = compute_ratios(dual, single)
+        return {
+            "file": path,
+            "ok": True,
+            "seconds": round(time.perf_counter() - t0, 4),
+            "error": None,
+            "dual": dual,
+            "single": single,
+            "ratios": dict(ratios),
+            "context": metrics_to_context(dual, single, ratios),
+        }
+    except Exception as e:
+        return {
+            "file": path,
+            "ok": False,
+            "seconds": round(time.perf_counter() - t0, 4),
+            "error": f"{type(e).__name__}: {e}",
+            "dual": None, "single": None, "ratios": None, "context": None,
+        }
+
+
+def find_pdfs(root, recursive=False):
+    if os.path.isfile(root):
+        return [root]
+    out = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        out.extend(os.path.join(dirpath, f) for f in filenames if f.lower().endswith(".pdf"))
+        if not recursive:
+            break
+    return sorted(out)
+
+
+# ---------- Sinks ----------
+class JsonlSink:
+    def __init__(self, path):
+        self.fh = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+
+    def write(self, rec):
+        self.fh.write(json.dumps(rec) + "\n")
+        self.fh.flush()
+
+    def close(self):
+        if self.fh is not sys.stdout:
+            self.fh.close()
+
+
+def flatten(rec):
+    # One flat row per statement for columnar output.
+    row = {k: rec[k] for k in ("file", "ok", "seconds", "error")}
+    for label, v in (rec["dual"] or {}).items():
+        row[f"{label} (current)"] = v["current"]
+        row[f"{label} (prior)"] = v["prior"]
+    for label, v in (rec["single"] or {}).items():
+        row[label] = v
+    for name, v in (rec["ratios"] or {}).items():
+        row[f"ratio: {name}"] = v
+    return row
+
+
+class ParquetSink:
+    """Buffers rows and appends them as Parquet row groups (requires pyarrow)."""
+
+    def __init__(self, path, row_group=256):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+        self.pa, self.pq = pa, pq
+        self.path, self.row_group = path, row_group
+        self.rows, self.writer, self.schema = [], None, None
+
+    def _schema(self):
+        # Columns come from the pattern/ratio definitions, not from the first
+        # rows, so a batch that starts with failed files still gets them all.
+        dual = {k: {"current": None, "prior": None} for k in patterns_dual}
+        single = {k: None for k in patterns_single}
+        seed = flatten({"file": "", "ok": True, "seconds": 0.0, "error": None,
+                        "dual": dual, "single": single, "ratios": dict(compute_ratios(dual, single))})
+        pa = self.pa
+        return pa.schema([
+            pa.field(k, pa.string() if k in ("file", "error") else pa.bool_() if k == "ok" else pa.float64())
+            for k in seed
+        ])
+
+    def write(self, rec):
+        self.rows.append(flatten(rec))
+        if len(self.rows) >= self.row_group:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.schema is None:
+            self.schema = self._schema()
+            self.writer = self.pq.ParquetWriter(self.path, self.schema)
+        cols = {f.name: [r.get(f.name) for r in self.rows] for f in self.schema}
+        self.writer.write_table(self.pa.table(cols, schema=self.schema))
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+
+
+def open_sink(path, fmt):
+    fmt = fmt or ("parquet" if path.endswith(".parquet") else "jsonl")
+    return ParquetSink(path) if fmt == "parquet" else JsonlSink(path)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Analyze many ENBD statement PDFs in parallel.")
+    ap.add_argument("path", help="directory of PDFs (or a single PDF)")
+    ap.add_argument("--out", default="-", help="output file (.jsonl or .parquet); '-' = JSONL on stdout")
+    ap.add_argument("--format", choices=["jsonl", "parquet"], default=None)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--recursive", action="store_true")
+    args = ap.parse_args(argv)
+
+    files = find_pdfs(args.path, args.recursive)
+    if not files:
+        print(f"No PDFs found under {args.path}", file=sys.stderr)
+        return 1
+    if args.out == "-" and args.format == "parquet":
+        ap.error("--format parquet needs --out <file>")
+
+    sink = open_sink(args.out, args.format)
+    ok = failed = 0
+    timings = []
+    t0 = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = {pool.submit(analyze_file, f): f for f in files}
+            for fut in as_completed(futures):
+                try:
+                    rec = fut.result()
+                except Exception as e:  # worker died (e.g. a crash inside MuPDF)
+                    rec = {"file": futures[fut], "ok": False, "seconds": 0.0,
+                           "error": f"{type(e).__name__}: {e}",
+                           "dual": None, "single": None, "ratios": None, "context": None}
+                sink.write(rec)
+                timings.append(rec["seconds"])
+                if rec["ok"]:
+                    ok += 1
+                    print(f"[ok]   {rec['seconds']:7.3f}s  {rec['file']}", file=sys.stderr)
+                else:
+                    failed += 1
+                    print(f"[fail] {rec['seconds']:7.3f}s  {rec['file']}: {rec['error']}", file=sys.stderr)
+    finally:
+        sink.close()
+
+    wall = time.perf_counter() - t0
+    timings.sort()
+    print(f"\n{ok} ok, {failed} failed, {len(files)} files in {wall:.2f}s "
+          f"({len(files) / wall:.1f} files/s, {args.workers} workers); "
+          f"per-file p50={timings[len(timings) // 2]:.3f}s max={timings[-1]:.3f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,35 @@
 # app_financials.py
-from flask import Flask, request, render_template_string
-import fitz, tempfile, re, os, sys, json
-from dotenv import load_dotenv
-from openai import OpenAI
-
-# Load API key
-load_dotenv("C:\\EUacademy\\.env")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+from flask import Flask, request, render_template
+import fitz, os, sys, json
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from statement_extractor import StatementExtractor
+from page_locator import PageLocator
+from parse_cache import ParseCache
+from upload_buffer import SpillRequest, upload_buffer
+from ratio_engine import engine as ratio_engine
+from common.metrics import install_metrics, span, timed
+from common.templates import install_templates
+from common.streaming import print_stream
+from common.llm_gateway import gateway, NOT_CONFIGURED
+from common.prompt_context import ContextBuilder, context_fingerprint, num
+from common.answer_cache import AnswerCache
+
+# Shared OpenAI gateway (pooled client, retries, circuit breaker; see
+# common/llm_gateway.py); None without OPENAI_API_KEY.
+llm = gateway()
+# Repeat questions about the same statement are answered from memory (LLM_CACHE_*).
+answer_cache = AnswerCache()
+ANALYST_SYSTEM = "You are a bank financial analyst. Be concise and numeric."
 
 app = Flask(__name__)
+# Uploads are parsed from memory; only files above UPLOAD_SPILL_BYTES touch disk.
+app.request_class = SpillRequest
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("ENBD_MAX_UPLOAD_MB", "50")) * 1024 * 1024
+app.config["UPLOAD_SPILL_BYTES"] = int(os.environ.get("ENBD_UPLOAD_SPILL_MB", "16")) * 1024 * 1024
+# Per-stage timings: Server-Timing header + GET /metrics (APP_METRICS, see common/metrics.py).
+install_metrics(app, "enbd_genai")
 
 # --- helpers ---
-def to_float(s):
-    try: return float(s.replace(",", ""))
-    except: return None
-
-def safe_div(a, b):
-    return round(a / b, 4) if a is not None and b not in (None,0) else None
-
 def fmt_pct(x): return f"{x*100:.2f}%" if x is not None else "N/A"
 
 patterns_dual = {
@@ -37,131 +48,152 @@ patterns_single = {
     "Total Assets": r"Segment Assets[\s\S]*?(\d{1,3}(?:,\d{3})+)\s*\n\s*Segment Liabilities",
 }
 
+extractor = StatementExtractor(patterns_dual, patterns_single)
+
+# Every page is extracted by default. ENBD_TARGETED_PARSE=1 reads only the
+# pages that held the line items in the last PDF with the same layout
+# (remembered per process); it assumes no other page holds an earlier match
+# (see page_locator.py).
+TARGETED_PARSE = os.environ.get("ENBD_TARGETED_PARSE", "0") == "1"
+page_locator = PageLocator(extractor, span=span)
+
+# Parsed results keyed by upload content + everything that shapes the cached
+# payload (extractor, ratio engine, context builder, PAYLOAD_VERSION); a repeat
+# upload of the same PDF (or GET /report/<key>) skips fitz entirely. Each app
+# gets its own directory since the ratio payloads differ.
+PAYLOAD_VERSION = "1"  # bump when analyze_upload() changes what it stores
+parse_cache = ParseCache(
+    os.path.join(os.environ.get("ENBD_PARSE_CACHE_DIR", os.path.join("cache", "enbd_parse")), "financial_flask_genai"),
+    int(os.environ.get("ENBD_PARSE_CACHE_MB", "64")) * 1024 * 1024,
+    extractor.fingerprint, ratio_engine.fingerprint, context_fingerprint(), PAYLOAD_VERSION,
+)
+
 def extract_dual(text):
-    out={}
-    for k,p in patterns_dual.items():
-        m=re.search(p,text,re.I)
-        out[k]={"current":to_float(m.group(1)) if m else None,
-                "prior":to_float(m.group(2)) if m and m.lastindex>=2 else None}
-    return out
+    return extractor.extract_dual(text)
 
 def extract_single(text):
-    out={}
-    for k,p in patterns_single.items():
-        m=re.search(p,text,re.I)
-        out[k]=to_float(m.group(1)) if m else None
-    return out
+    return extractor.extract_single(text)
 
-def parse_pdf(path):
+def parse_document(doc, targeted=TARGETED_PARSE):
+    if targeted:
+        return page_locator.parse(doc)
+    with span("pdf_text"):
+        txt = "\n".join(pg.get_text() for pg in doc)
+    with span("extract"):
+        return extractor.extract(txt)
+
+def parse_pdf(path, targeted=TARGETED_PARSE):
     with fitz.open(path) as doc:
-        txt="\n".join(pg.get_text() for pg in doc)
-    return extract_dual(txt), extract_single(txt)
+        return parse_document(doc, targeted)
 
+@timed("ratios")
 def compute_ratios(dual, single):
-    toi=dual["Total Operating Income"]["current"]
-    ga=dual["General and Administrative Expenses"]["current"]
-    opb=dual["Operating Profit Before Impairment"]["current"]
-    pat=dual["Profit for the Period"]["current"]
-    pbt=dual["Profit Before Tax"]["current"]
-    tax=dual["Taxation Charge"]["current"]
-    eps_c=dual["Earnings Per Share (AED)"]["current"]
-    eps_p=dual["Earnings Per Share (AED)"]["prior"]
-
-    gross=single["Gross Loans"]; ecl=single["ECL"]; npl=single["NPLs"]; assets=single["Total Assets"]
-
-    ratios=[
-        ("Cost-to-Income",        safe_div(ga,toi)),
-        ("Net Profit Margin",     safe_div(pat,toi)),
-        ("Pre-impairment Margin", safe_div(opb,toi)),
-        ("NPL Ratio",             safe_div(npl,gross)),
-        ("Coverage Ratio",        safe_div(ecl,npl)),
-        ("ECL/Gross Loans",       safe_div(ecl,gross)),
-        ("Tax Rate",              safe_div(tax,pbt)),
-        ("ROA",                   safe_div(pat,assets)),
-        ("EPS YoY",               safe_div((eps_c-eps_p) if eps_c and eps_p else None, eps_p)),
-    ]
-    return ratios
-
-def metrics_to_context(dual, single, ratios):
-    # Compact string for LLM context
-    lines = ["Key metrics & ratios:"]
-    for k,v in dual.items():
-        lines.append(f"{k}: current={v['current']}, prior={v['prior']}")
-    for k,v in single.items():
-        lines.append(f"{k}: {v}")
-    lines.append("Ratios:")
-    for name,val in ratios:
-        lines.append(f"{name}: {fmt_pct(val)}")
-    return "\n".join(lines)
+    # Shared declarative spec (ratio_engine); short names as shown in this app.
+    return ratio_engine.ratio_pairs(dual, single)
+
+def metrics_to_context(dual, single, ratios, model="gpt-4o-mini"):
+    # Ratios are kept first, then the income statement, then balances, within
+    # the model's token budget (see common/prompt_context.py).
+    ctx = ContextBuilder(model)
+    ctx.add([f"{k}: {num(v['current'])}/{num(v['prior'])}" for k, v in dual.items()],
+            priority=1, title="Key metrics (current/prior):")
+    ctx.add([f"{k}: {num(v)}" for k, v in single.items()], priority=2)
+    ctx.add([f"{name}: {fmt_pct(val)}" for name, val in ratios], priority=0, title="Ratios:")
+    return ctx.build()
 
 # --- Jinja filter
 @app.template_filter("pct")
 def pct(v): return fmt_pct(v)
 
+TEMPLATE = """
+<h2>Upload ENBD Q1 PDF</h2>
+<form method=post action="{{ url_for('index') }}" enctype=multipart/form-data>
+  <input type=file name=pdf_file required>
+  <br><textarea name=prompt placeholder="Optional: ask a question for OpenAI"></textarea>
+  <br><input type=submit value=Analyze>
+</form>
+{% if ratios %}
+  {% if report_key %}<p><a href="{{ url_for('report', key=report_key) }}">Permalink to this analysis</a></p>{% endif %}
+  <h3>Ratios</h3>
+  <ul>
+    {% for name,val in ratios %}
+      <li>{{name}}: {{val|pct}}</li>
+    {% endfor %}
+  </ul>
+  {% if recs %}
+    <h3>Recommendations</h3>
+    <ul>{% for r in recs %}<li>{{r}}</li>{% endfor %}</ul>
+  {% endif %}
+{% endif %}
+{% if answer %}<h3>OpenAI Answer</h3><div>{{answer}}</div>{% endif %}
+"""
+# Compiled once here, rendered by name (see common/templates.py).
+install_templates(app, {"enbd_genai/index.html": TEMPLATE})
+
+def analyze_upload(buf):
+    with buf.open_pdf() as doc:
+        dual, single = parse_document(doc)
+    ratios = compute_ratios(dual, single)
+    return {"dual":dual, "single":single, "ratios":ratios,
+            "context":metrics_to_context(dual, single, ratios)}
+
+def get_or_parse(f):
+    buf = upload_buffer(f)
+    key = parse_cache.key_for_digest(buf.sha256())
+    result = parse_cache.get(key)
+    if result is None:
+        result = analyze_upload(buf)
+        parse_cache.put(key, result)
+    return key, result
+
+def light_recs(ratios):
+    return ratio_engine.recommendations(ratios, brief=True)
+
 # --------- Flask route (upload + one-off prompt) ----------
 @app.route("/", methods=["GET","POST"])
 def index():
-    dual=single=ratios=recs=None
+    ratios=recs=key=None
     answer=None
     if request.method=="POST" and "pdf_file" in request.files:
         f=request.files["pdf_file"]
         if f.filename:
-            tmp=tempfile.NamedTemporaryFile(delete=False,suffix=".pdf")
-            f.save(tmp.name)
-            dual,single=parse_pdf(tmp.name)
-            os.unlink(tmp.name)
-
-            ratios = compute_ratios(dual, single)
-            recs=[]
+            key, result = get_or_parse(f)
+            ratios = result["ratios"]
             # light heuristics
-            ci = dict(ratios).get("Cost-to-Income")
-            npl = dict(ratios).get("NPL Ratio")
-            if ci is not None and ci>0.50: recs.append("High cost-to-income; review operating expenses.")
-            if npl is not None and npl>0.06: recs.append("NPL ratio elevated; examine credit concentrations.")
+            recs = light_recs(ratios)
 
             # Optional OpenAI one-off
             prompt=request.form.get("prompt","").strip()
-            if prompt and client:
-                context = metrics_to_context(dual, single, ratios)
-                try:
-                    resp=client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=[
-                            {"role":"system","content":"You are a bank financial analyst. Be concise and numeric."},
+            if prompt and llm:
+                context = result["context"]
+                def ask_openai():
+                    return llm.chat(
+                        [
+                            {"role":"system","content":ANALYST_SYSTEM},
                             {"role":"user","content":f"{context}\n\nUser prompt: {prompt}"}
                         ],
+                        model="gpt-4o-mini",
                         temperature=0.2
                     )
-                    answer=resp.choices[0].message.content
+                try:
+                    answer=answer_cache.get_or_call("gpt-4o-mini", ANALYST_SYSTEM, context, prompt, ask_openai)
                 except Exception as e:
                     answer=f"[OpenAI error] {e}"
 
-    return render_template_string("""
-    <h2>Upload ENBD Q1 PDF</h2>
-    <form method=post enctype=multipart/form-data>
-      <input type=file name=pdf_file required>
-      <br><textarea name=prompt placeholder="Optional: ask a question for OpenAI"></textarea>
-      <br><input type=submit value=Analyze>
-    </form>
-    {% if ratios %}
-      <h3>Ratios</h3>
-      <ul>
-        {% for name,val in ratios %}
-          <li>{{name}}: {{val|pct}}</li>
-        {% endfor %}
-      </ul>
-      {% if recs %}
-        <h3>Recommendations</h3>
-        <ul>{% for r in recs %}<li>{{r}}</li>{% endfor %}</ul>
-      {% endif %}
-    {% endif %}
-    {% if answer %}<h3>OpenAI Answer</h3><div>{{answer}}</div>{% endif %}
-    """, ratios=ratios, recs=recs, answer=answer)
+    return render_template("enbd_genai/index.html", ratios=ratios, recs=recs, answer=answer, report_key=key)
+
+@app.route("/report/<key>", methods=["GET"])
+def report(key):
+    result = parse_cache.get(key)
+    if result is None:
+        return "Unknown or expired report.", 404
+    ratios = result["ratios"]
+    return render_template("enbd_genai/index.html", ratios=ratios, recs=light_recs(ratios), answer=None, report_key=key)
 
 # --------- CLI chat mode (loop until 'q') ----------
 def cli_chat():
-    if not client:
-        print("OPENAI_API_KEY not configured in C:\\EUacademy\\.env")
+    if not llm:
+        print(NOT_CONFIGURED)
         return
 
     # Optional: parse a PDF to seed context
@@ -188,15 +220,14 @@ def cli_chat():
             continue
         try:
             msg = (f"{context}\n\nUser prompt: {q}") if context else q
-            resp = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
+            print_stream(llm.stream_chat(
+                [
                     {"role":"system","content":"You are a bank financial analyst. Be concise and numeric."},
                     {"role":"user","content": msg}
                 ],
+                model="gpt-4o-mini",
                 temperature=0.2
-            )
-            print("\nAssistant:", resp.choices[0].message.content.strip())
+            ))
         except Exception as e:
             print(f"[OpenAI error] {e}")
 
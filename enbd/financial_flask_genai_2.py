@@ -1,108 +1,60 @@
 # financial_flask_genai.py
-from flask import Flask, request, render_template_string, session, redirect, url_for
-import fitz, tempfile, re, os, sys
-from dotenv import load_dotenv
-from openai import OpenAI
+from flask import Flask, request, render_template, session, redirect, url_for
+import fitz, os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from statement_analysis import (
+    fmt_pct, patterns_dual, patterns_single, extractor, TARGETED_PARSE, page_locator,
+    extract_dual, extract_single, parse_document, parse_pdf, compute_ratios, metrics_to_context,
+)
+from parse_cache import ParseCache
+from upload_buffer import SpillRequest, upload_buffer
+from ratio_engine import engine as ratio_engine
+from common.metrics import install_metrics, span, timed, stats as metrics_stats
+from common.templates import install_templates
+from common.llm_gateway import gateway, NOT_CONFIGURED
+from common.streaming import STREAM_SCRIPT, stream_answer, stream_error, print_stream
+from common.prompt_context import ContextBuilder, context_fingerprint, num, count_tokens, counter_name, stats as prompt_context_stats
+from common.answer_cache import AnswerCache, SEMANTIC_ENABLED
+from common.server_session import install_session_store
 
 # --- API + Flask setup ---
-load_dotenv("C:\\EUacademy\\.env")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+# All OpenAI calls (web and CLI) go through the shared gateway: one pooled async
+# client with timeouts, a cap on in-flight calls, retries and a circuit breaker
+# (see common/llm_gateway.py). None without OPENAI_API_KEY.
+llm = gateway()
+# Repeat questions about the same statement are answered from memory (LLM_CACHE_*;
+# LLM_CACHE_SEMANTIC=1 also matches near-duplicate prompts via embeddings).
+answer_cache = AnswerCache(embed=llm.embed if llm and SEMANTIC_ENABLED else None)
+ANALYST_SYSTEM = "You are a bank financial analyst. Be concise and numeric."
 
 app = Flask(__name__)
+# Uploads are parsed from memory; only files above UPLOAD_SPILL_BYTES touch disk.
+app.request_class = SpillRequest
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("ENBD_MAX_UPLOAD_MB", "50")) * 1024 * 1024
+app.config["UPLOAD_SPILL_BYTES"] = int(os.environ.get("ENBD_UPLOAD_SPILL_MB", "16")) * 1024 * 1024
+# Per-stage timings: Server-Timing header + GET /metrics (APP_METRICS, see common/metrics.py).
+install_metrics(app, "enbd_genai_2")
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev-secret")
 app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
 app.config["SESSION_COOKIE_SECURE"] = False
+# Statement context/ratios live server-side (SESSION_BACKEND=memory|sqlite|cookie);
+# the cookie only carries an opaque session id.
+install_session_store(app)
 
 # ---------- Helpers ----------
-def to_float(s):
-    try:
-        return float(s.replace(",", ""))
-    except Exception:
-        return None
-
-def safe_div(a, b):
-    return round(a / b, 4) if a is not None and b not in (None, 0) else None
-
-def fmt_pct(x):
-    return f"{x*100:.2f}%" if x is not None else "N/A"
-
-# Regexes for ENBD-style statements (tweak as needed)
-patterns_dual = {
-    "Total Operating Income": r"Total operating income\s+([\d,]+)\s+([\d,]+)",
-    "General and Administrative Expenses": r"General and administrative expenses\s+\(([\d,]+)\)\s+\(([\d,]+)\)",
-    "Operating Profit Before Impairment": r"Operating profit before impairment\s+([\d,]+)\s+([\d,]+)",
-    "Profit Before Tax": r"Profit for the period before taxation\s+([\d,]+)\s+([\d,]+)",
-    "Taxation Charge": r"Taxation charge\s+\(([\d,]+)\)\s+\(([\d,]+)\)",
-    "Profit for the Period": r"Profit for the period\s+([\d,]+)\s+([\d,]+)",
-    "Earnings Per Share (AED)": r"Earnings per share\s*\(AED\)\s+([\d\.]+)\s+([\d\.]+)",
-}
-patterns_single = {
-    "Gross Loans": r"Gross loans and receivables\s+([\d,]+)\s+[\d,]+",
-    "ECL": r"Less:\s*Expected credit losses\s+\(([\d,]+)\)\s+\([\d,]+\)",
-    "NPLs": r"Total of credit impaired loans and receivables\s+([\d,]+)\s+[\d,]+",
-    "Total Assets": r"Segment Assets[\s\S]*?(\d{1,3}(?:,\d{3})+)\s*\n\s*Segment Liabilities",
-}
-
-def extract_dual(text):
-    out = {}
-    for k, p in patterns_dual.items():
-        m = re.search(p, text, re.I)
-        out[k] = {
-            "current": to_float(m.group(1)) if m else None,
-            "prior": to_float(m.group(2)) if (m and m.lastindex and m.lastindex >= 2) else None,
-        }
-    return out
-
-def extract_single(text):
-    out = {}
-    for k, p in patterns_single.items():
-        m = re.search(p, text, re.I)
-        out[k] = to_float(m.group(1)) if m else None
-    return out
-
-def parse_pdf(path):
-    with fitz.open(path) as doc:
-        txt = "\n".join(pg.get_text() for pg in doc)
-    return extract_dual(txt), extract_single(txt)
-
-def compute_ratios(dual, single):
-    toi = dual["Total Operating Income"]["current"]
-    ga  = dual["General and Administrative Expenses"]["current"]
-    opb = dual["Operating Profit Before Impairment"]["current"]
-    pat = dual["Profit for the Period"]["current"]
-    pbt = dual["Profit Before Tax"]["current"]
-    tax = dual["Taxation Charge"]["current"]
-    eps_c = dual["Earnings Per Share (AED)"]["current"]
-    eps_p = dual["Earnings Per Share (AED)"]["prior"]
-
-    gross  = single["Gross Loans"]
-    ecl    = single["ECL"]
-    npl    = single["NPLs"]
-    assets = single["Total Assets"]
-
-    return [
-        ("Cost-to-Income",        safe_div(ga, toi)),
-        ("Net Profit Margin",     safe_div(pat, toi)),
-        ("Pre-impairment Margin", safe_div(opb, toi)),
-        ("NPL Ratio",             safe_div(npl, gross)),
-        ("Coverage Ratio",        safe_div(ecl, npl)),
-        ("ECL/Gross Loans",       safe_div(ecl, gross)),
-        ("Tax Rate",              safe_div(tax, pbt)),
-        ("ROA",                   safe_div(pat, assets)),
-        ("EPS YoY",               safe_div((eps_c - eps_p) if (eps_c is not None and eps_p) else None, eps_p)),
-    ]
-
-def metrics_to_context(dual, single, ratios):
-    lines = ["Key metrics & ratios:"]
-    for k, v in dual.items():
-        lines.append(f"{k}: current={v['current']}, prior={v['prior']}")
-    for k, v in single.items():
-        lines.append(f"{k}: {v}")
-    lines.append("Ratios:")
-    for name, val in ratios:
-        lines.append(f"{name}: {fmt_pct(val)}")
-    return "\n".join(lines)
+# Patterns, parsing, ratios and the LLM context live in statement_analysis.py
+# (shared with batch.py).
+
+# Parsed results keyed by upload content + everything that shapes the cached
+# payload (extractor, ratio engine, context builder, PAYLOAD_VERSION); a repeat
+# upload of the same PDF (or GET /report/<key>) skips fitz entirely. Each app
+# gets its own directory since the ratio payloads differ.
+PAYLOAD_VERSION = "1"  # bump when analyze_upload() changes what it stores
+parse_cache = ParseCache(
+    os.path.join(os.environ.get("ENBD_PARSE_CACHE_DIR", os.path.join("cache", "enbd_parse")), "financial_flask_genai_2"),
+    int(os.environ.get("ENBD_PARSE_CACHE_MB", "64")) * 1024 * 1024,
+    extractor.fingerprint, ratio_engine.fingerprint, context_fingerprint(), PAYLOAD_VERSION,
+)
 
 # --- Jinja filters (fixed) ---
 @app.template_filter("pct")
@@ -148,6 +100,7 @@ TEMPLATE = """
         </div>
       </form>
       {% if upload_error %}<div class="text-danger mt-2">{{ upload_error }}</div>{% endif %}
+      {% if report_key %}<div class="mt-2 small"><a href="{{ url_for('report', key=report_key) }}">Permalink to this analysis</a></div>{% endif %}
     </div>
   </div>
 
@@ -210,22 +163,33 @@ TEMPLATE = """
       {% if not has_context %}
         <div class="text-secondary">Upload a PDF first to give the assistant context. You can still type a question—I'll remind you.</div>
       {% endif %}
-      <form method="post" action="{{ url_for('ask') }}">
+      <form method="post" action="{{ url_for('ask') }}" id="ask-form" data-stream="{{ url_for('ask_stream') }}">
         <textarea class="form-control" name="prompt" rows="5" placeholder="Ask about profitability, cost efficiency, credit quality, etc.">{{ prompt or '' }}</textarea>
         <div class="mt-3">
           <button class="btn btn-primary" type="submit">Ask</button>
         </div>
       </form>
-      {% if answer %}
+      <div id="answer-box" {% if not answer %}style="display:none"{% endif %}>
         <hr>
         <div><b>Assistant:</b></div>
-        <div class="monospace">{{ answer }}</div>
-      {% endif %}
+        <div class="monospace" id="answer">{{ answer or '' }}</div>
+      </div>
       {% if error %}<div class="text-danger mt-2">{{ error }}</div>{% endif %}
     </div>
   </div>
 </div>
-"""
+""" + STREAM_SCRIPT
+# Compiled once here, rendered by name (see common/templates.py).
+install_templates(app, {"enbd_genai_2/index.html": TEMPLATE})
+
+def analyst_messages(context, prompt):
+    return [
+        {"role": "system", "content": ANALYST_SYSTEM},
+        {"role": "user", "content": f"{context}\n\nUser prompt: {prompt}"},
+    ]
+
+def light_recs(ratios):
+    return ratio_engine.recommendations(ratios, brief=True)
 
 # ---------- Routes ----------
 @app.route("/", methods=["GET"])
@@ -234,15 +198,9 @@ def home():
     ratios = session.get("financial_ratios")
     dual = session.get("financial_dual") or {}
     single = session.get("financial_single") or {}
-    recs = []
-    if ratios:
-        d = dict(ratios)
-        if d.get("Cost-to-Income") is not None and d["Cost-to-Income"] > 0.50:
-            recs.append("High cost-to-income; review operating expenses.")
-        if d.get("NPL Ratio") is not None and d["NPL Ratio"] > 0.06:
-            recs.append("NPL ratio elevated; examine credit concentrations.")
-    return render_template_string(
-        TEMPLATE,
+    recs = light_recs(ratios) if ratios else []
+    return render_template(
+        "enbd_genai_2/index.html",
         has_context=has_context,
         ratios=ratios,
         recs=recs,
@@ -251,50 +209,65 @@ def home():
         prompt=None,
         answer=None,
         error=None,
-        upload_error=None
+        upload_error=None,
+        report_key=session.get("financial_report_key")
     )
 
 @app.route("/upload", methods=["POST"])
 def upload():
     f = request.files.get("pdf_file")
     if not f or f.filename == "":
-        return render_template_string(
-            TEMPLATE,
+        return render_template(
+            "enbd_genai_2/index.html",
             has_context=False, ratios=None, recs=None,
             dual={}, single={}, prompt=None, answer=None,
             error=None, upload_error="Please select a PDF."
         )
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    try:
-        f.save(tmp.name)
-        dual, single = parse_pdf(tmp.name)
-    finally:
-        try:
-            tmp.close(); os.unlink(tmp.name)
-        except Exception:
-            pass
-
+    buf = upload_buffer(f)
+    key = parse_cache.key_for_digest(buf.sha256())
+    result = parse_cache.get(key)
+    if result is None:
+        result = analyze_upload(buf)
+        parse_cache.put(key, result)
+    return show_result(key, result)
+
+@app.route("/report/<key>", methods=["GET"])
+def report(key):
+    result = parse_cache.get(key)
+    if result is None:
+        return "Unknown or expired report.", 404
+    return show_result(key, result)
+
+def analyze_upload(buf):
+    with buf.open_pdf() as doc:
+        dual, single = parse_document(doc)
     ratios = compute_ratios(dual, single)
+    return {
+        "dual": dual,
+        "single": single,
+        "ratios": ratios,
+        "context": metrics_to_context(dual, single, ratios),
+    }
+
+def show_result(key, result):
+    dual, single, ratios = result["dual"], result["single"], result["ratios"]
 
     # store everything for re-display + chat
-    session["financial_context"] = metrics_to_context(dual, single, ratios)
+    session["financial_context"] = result["context"]
     session["financial_ratios"]  = ratios
     session["financial_dual"]    = dual
     session["financial_single"]  = single
+    session["financial_report_key"] = key
 
-    recs = []
-    d = dict(ratios)
-    if d.get("Cost-to-Income") is not None and d["Cost-to-Income"] > 0.50:
-        recs.append("High cost-to-income; review operating expenses.")
-    if d.get("NPL Ratio") is not None and d["NPL Ratio"] > 0.06:
-        recs.append("NPL ratio elevated; examine credit concentrations.")
+    recs = light_recs(ratios)
 
-    return render_template_string(
-        TEMPLATE,
+    return render_template(
+        "enbd_genai_2/index.html",
         has_context=True, ratios=ratios, recs=recs,
         dual=dual, single=single,
         prompt=None, answer=None,
-        error=None, upload_error=None
+        error=None, upload_error=None,
+        report_key=key
     )
 
 @app.route("/ask", methods=["POST"])
@@ -306,47 +279,54 @@ def ask():
     single = session.get("financial_single") or {}
 
     if not context or not ratios:
-        return render_template_string(
-            TEMPLATE,
+        return render_template(
+            "enbd_genai_2/index.html",
             has_context=False, ratios=None, recs=None,
             dual={}, single={}, prompt=prompt, answer=None,
             error="Please upload a PDF first.", upload_error=None
         )
 
     answer = None
-    if prompt and client:
+    if prompt and llm:
         try:
-            resp = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a bank financial analyst. Be concise and numeric."},
-                    {"role": "user", "content": f"{context}\n\nUser prompt: {prompt}"},
-                ],
-                temperature=0.2,
+            answer = answer_cache.get_or_call(
+                "gpt-4o-mini", ANALYST_SYSTEM, context, prompt,
+                lambda: llm.chat(analyst_messages(context, prompt), model="gpt-4o-mini", temperature=0.2),
             )
-            answer = resp.choices[0].message.content
         except Exception as e:
             answer = f"[OpenAI error] {e}"
 
     # rebuild recs
-    recs = []
-    d = dict(ratios)
-    if d.get("Cost-to-Income") is not None and d["Cost-to-Income"] > 0.50:
-        recs.append("High cost-to-income; review operating expenses.")
-    if d.get("NPL Ratio") is not None and d["NPL Ratio"] > 0.06:
-        recs.append("NPL ratio elevated; examine credit concentrations.")
-
-    return render_template_string(
-        TEMPLATE,
+    recs = light_recs(ratios)
+
+    return render_template(
+        "enbd_genai_2/index.html",
         has_context=True, ratios=ratios, recs=recs,
         dual=dual, single=single,
         prompt=prompt, answer=answer,
-        error=None, upload_error=None
+        error=None, upload_error=None,
+        report_key=session.get("financial_report_key")
     )
 
+@app.route("/ask/stream", methods=["GET"])
+def ask_stream():
+    # SSE variant of /ask used by the page's script: forwards deltas as they arrive.
+    prompt = (request.args.get("prompt") or "").strip()
+    context = session.get("financial_context")
+    if not context:
+        return stream_error("Please upload a PDF first.")
+    if not llm:
+        return stream_error(NOT_CONFIGURED)
+    if not prompt:
+        return stream_error("Please type a question.")
+    return stream_answer(answer_cache.stream(
+        "gpt-4o-mini", ANALYST_SYSTEM, context, prompt,
+        lambda: llm.stream_chat(analyst_messages(context, prompt), model="gpt-4o-mini", temperature=0.2),
+    ))
+
 @app.route("/clear")
 def clear():
-    for k in ["financial_context", "financial_ratios", "financial_dual", "financial_single"]:
+    for k in ["financial_context", "financial_ratios", "financial_dual", "financial_single", "financial_report_key"]:
         session.pop(k, None)
     return redirect(url_for("home"))
 
@@ -357,12 +337,17 @@ def debug():
         "has_ratios": bool(session.get("financial_ratios")),
         "dual_keys": list((session.get("financial_dual") or {}).keys()),
         "single_keys": list((session.get("financial_single") or {}).keys()),
+        "llm": llm.stats() if llm else None,
+        "answer_cache": answer_cache.stats(),
+        "context_tokens": count_tokens(session.get("financial_context") or ""),
+        "prompt_context": dict(prompt_context_stats(), counter=counter_name()),
+        "stage_ms": metrics_stats(),
     }
 
 # Optional CLI mode
 def cli_chat():
-    if not client:
-        print("OPENAI_API_KEY not configured in C:\\EUacademy\\.env")
+    if not llm:
+        print(NOT_CONFIGURED)
         return
     context = ""
     try:
@@ -387,15 +372,14 @@ def cli_chat():
             continue
         try:
             msg = (f"{context}\n\nUser prompt: {q}") if context else q
-            resp = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
+            print_stream(llm.stream_chat(
+                [
                     {"role": "system", "content": "You are a bank financial analyst. Be concise and numeric."},
                     {"role": "user", "content": msg},
                 ],
+                model="gpt-4o-mini",
                 temperature=0.2,
-            )
-            print("\nAssistant:", resp.choices[0].message.content.strip())
+            ))
         except Exception as e:
             print(f"[OpenAI error] {e}")
 
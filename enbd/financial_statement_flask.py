@@ -1,24 +1,25 @@
-from flask import Flask, request, render_template_string
+from flask import Flask, request, render_template, url_for
 import fitz  # PyMuPDF
-import tempfile
-import re
-import os
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from statement_extractor import StatementExtractor
+from page_locator import PageLocator
+from parse_cache import ParseCache
+from upload_buffer import SpillRequest, upload_buffer
+from ratio_engine import engine as ratio_engine
+from common.metrics import install_metrics, span, timed
+from common.templates import install_templates
+from common.api import etag_for, not_modified, json_response, api_error
 
 app = Flask(__name__)
+# Uploads are parsed from memory; only files above UPLOAD_SPILL_BYTES touch disk.
+app.request_class = SpillRequest
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("ENBD_MAX_UPLOAD_MB", "50")) * 1024 * 1024
+app.config["UPLOAD_SPILL_BYTES"] = int(os.environ.get("ENBD_UPLOAD_SPILL_MB", "16")) * 1024 * 1024
+# Per-stage timings: Server-Timing header + GET /metrics (APP_METRICS, see common/metrics.py).
+install_metrics(app, "enbd_statement")
 
 # -------- Helpers --------
-def to_float(s):
-    try:
-        return float(s.replace(",", ""))
-    except Exception:
-        return None
-
-def safe_div(a, b):
-    try:
-        return round(a / b, 4) if a is not None and b not in (None, 0) else None
-    except Exception:
-        return None
-
 def fmt_pct(x):
     return f"{x*100:.2f}%" if x is not None else "N/A"
 
@@ -54,31 +55,43 @@ patterns_single = {
     "FX & Derivative Income": r"Foreign exchange and derivative income.*?\s+([\d,]+)\s+[\d,]+",
 }
 
+extractor = StatementExtractor(patterns_dual, patterns_single)
+
+# Every page is extracted by default. ENBD_TARGETED_PARSE=1 reads only the
+# pages that held the line items in the last PDF with the same layout
+# (remembered per process); it assumes no other page holds an earlier match
+# (see page_locator.py).
+TARGETED_PARSE = os.environ.get("ENBD_TARGETED_PARSE", "0") == "1"
+page_locator = PageLocator(extractor, span=span)
+
+# Parsed results keyed by upload content + everything that shapes the cached
+# payload (extractor, ratio engine, PAYLOAD_VERSION); a repeat upload of the
+# same PDF (or GET /report/<key>) skips fitz entirely. Each app gets its own
+# directory since the ratio payloads differ.
+PAYLOAD_VERSION = "1"  # bump when analyze_upload() changes what it stores
+parse_cache = ParseCache(
+    os.path.join(os.environ.get("ENBD_PARSE_CACHE_DIR", os.path.join("cache", "enbd_parse")), "financial_statement_flask"),
+    int(os.environ.get("ENBD_PARSE_CACHE_MB", "64")) * 1024 * 1024,
+    extractor.fingerprint, ratio_engine.fingerprint, PAYLOAD_VERSION,
+)
+
 def extract_dual(text):
-    out = {}
-    for label, pat in patterns_dual.items():
-        m = re.search(pat, text, re.IGNORECASE)
-        if m:
-            curr = to_float(m.group(1))
-            prior = to_float(m.group(2)) if m.lastindex and m.lastindex >= 2 else None
-            out[label] = {"current": curr, "prior": prior}
-        else:
-            out[label] = {"current": None, "prior": None}
-    return out
+    return extractor.extract_dual(text)
 
 def extract_single(text):
-    out = {}
-    for label, pat in patterns_single.items():
-        m = re.search(pat, text, re.IGNORECASE)
-        out[label] = to_float(m.group(1)) if m else None
-    return out
+    return extractor.extract_single(text)
 
-def parse_pdf(file_path):
-    with fitz.open(file_path) as doc:
+def parse_document(doc, targeted=TARGETED_PARSE):
+    if targeted:
+        return page_locator.parse(doc)
+    with span("pdf_text"):
         full_text = "\n".join(page.get_text() for page in doc)
-    dual = extract_dual(full_text)
-    single = extract_single(full_text)
-    return dual, single
+    with span("extract"):
+        return extractor.extract(full_text)
+
+def parse_pdf(file_path, targeted=TARGETED_PARSE):
+    with fitz.open(file_path) as doc:
+        return parse_document(doc, targeted)
 
 # Jinja filter for percentages
 @app.template_filter("to_pct")
@@ -100,6 +113,96 @@ def index():
     </html>
     '''
 
+REPORT_TEMPLATE = """
+<html>
+<head>
+    <title>ENBD Q1 2025 Report</title>
+    <style>
+        body { font-family: Arial; background:#f9f9f9; padding:40px; }
+        .box { background:white; padding:30px; max-width:1000px; margin:auto; border-radius:12px; box-shadow:0 0 10px #ccc; }
+        h2 { color:#004080; }
+        table { width:100%; border-collapse:collapse; margin-top:16px; }
+        th, td { padding:10px 12px; border-bottom:1px solid #eee; text-align:left; vertical-align:top; }
+        th { background:#f0f4fa; }
+        code { background:#eef; padding:2px 4px; border-radius:4px; }
+        .muted { color:#666; font-size:12px; }
+    </style>
+</head>
+<body>
+    <div class="box">
+        <h2>📊 Emirates NBD – Q1 2025 Financial Highlights</h2>
+        <div class="muted">Figures parsed from the uploaded Q1-2025 interim financial statements PDF.
+            {% if report_key %}<a href="{{ url_for('report', key=report_key) }}">Permalink</a>{% endif %}</div>
+
+        <h3>Extracted Metrics (Current vs Prior)</h3>
+        <table>
+            <tr><th>Metric</th><th>Q1-2025</th><th>Q1-2024</th></tr>
+            {% for k, curv, prv in metrics %}
+              <tr>
+                <td>{{k}}</td>
+                <td>{{ '{:,.2f}'.format(curv) if curv is not none else 'Not Found' }}</td>
+                <td>{{ '{:,.2f}'.format(prv) if prv is not none else '—' }}</td>
+              </tr>
+            {% endfor %}
+        </table>
+
+        <h3>Key Ratios with Formulas</h3>
+        <table>
+            <tr><th>Ratio</th><th>Formula</th><th>Calculation</th><th>Value</th></tr>
+            {% for r in ratios %}
+              <tr>
+                <td>{{ r.name }}</td>
+                <td><code>{{ r.formula }}</code></td>
+                <td><code>{{ r.calc }}</code></td>
+                <td>{{ r.value|to_pct }}</td>
+              </tr>
+            {% endfor %}
+        </table>
+
+        <h3>🧠 Recommendations</h3>
+        <ul>
+            {% for rec in recommendations %}
+              <li>{{ rec }}</li>
+            {% endfor %}
+        </ul>
+    </div>
+</body>
+</html>
+"""
+# Compiled once here, rendered by name (see common/templates.py).
+install_templates(app, {"enbd_statement/report.html": REPORT_TEMPLATE})
+
+@timed("ratios")
+def compute_ratios(dual, single):
+    # Declarative spec + vectorized evaluation live in ratio_engine (shared with the genai apps).
+    return ratio_engine.ratio_records(dual, single)
+
+def build_recommendations(ratios):
+    return ratio_engine.recommendations({r["name"]: r["value"] for r in ratios})
+
+def analyze_upload(buf):
+    with buf.open_pdf() as doc:
+        dual, single = parse_document(doc)
+    ratios = compute_ratios(dual, single)
+    return {
+        "dual": dual,
+        "single": single,
+        "ratios": ratios,
+        "recommendations": build_recommendations(ratios),
+    }
+
+def render_report(key, result):
+    dual, single = result["dual"], result["single"]
+    metrics_table = []
+    for k, v in dual.items():
+        metrics_table.append((k, v.get("current"), v.get("prior")))
+    for k in ["Gross Loans and Receivables","Expected Credit Losses (Loans)","Net Loans and Receivables",
+              "Credit-Impaired Loans (NPLs)","Total Assets","Fee and Commission Income",
+              "Fee and Commission Expense","FX & Derivative Income"]:
+        metrics_table.append((k, single.get(k), None))
+    return render_template("enbd_statement/report.html", metrics=metrics_table, ratios=result["ratios"],
+                           recommendations=result["recommendations"], report_key=key)
+
 @app.route("/upload", methods=["POST"])
 def upload():
     if "pdf_file" not in request.files:
@@ -108,209 +211,60 @@ def upload():
     if f.filename == "":
         return "Empty filename", 400
 
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
     try:
-        f.save(tmp.name)
-        path = tmp.name
-
-        dual, single = parse_pdf(path)
-
-        def cur(k): return (dual.get(k) or {}).get("current")
-        def prv(k): return (dual.get(k) or {}).get("prior")
-
-        toi_c = cur("Total Operating Income")
-        toi_p = prv("Total Operating Income")
-        ga_c  = cur("General and Administrative Expenses")
-        opb_c = cur("Operating Profit Before Impairment")
-        pbt_c = cur("Profit Before Tax")
-        tax_c = cur("Taxation Charge")
-        pat_c = cur("Profit for the Period")
-        eps_c = cur("Earnings Per Share (AED)")
-        eps_p = prv("Earnings Per Share (AED)")
-
-        nfee_c = cur("Net Fees and Commission")
-        trading_c = cur("Net Gain on Trading Securities")
-        other_c = cur("Other Operating Income")
-        fx_c = single.get("FX & Derivative Income")
-
-        gross_loans = single.get("Gross Loans and Receivables")
-        ecl_loans   = single.get("Expected Credit Losses (Loans)")
-        net_loans   = single.get("Net Loans and Receivables")
-        npls        = single.get("Credit-Impaired Loans (NPLs)")
-
-        total_assets = single.get("Total Assets")
-
-        # -------- Ratios (bank-meaningful) --------
-        ratios = []
-
-        # Profitability & efficiency
-        ratios.append({
-            "name": "Cost-to-Income",
-            "formula": "G&A Expenses / Total Operating Income",
-            "calc": f"{ga_c} / {toi_c}",
-            "value": safe_div(ga_c, toi_c)
-        })
-        ratios.append({
-            "name": "Net Profit Margin",
-            "formula": "Profit for the Period / Total Operating Income",
-            "calc": f"{pat_c} / {toi_c}",
-            "value": safe_div(pat_c, toi_c)
-        })
-        ratios.append({
-            "name": "Pre-Impairment Operating Margin",
-            "formula": "Operating Profit Before Impairment / Total Operating Income",
-            "calc": f"{opb_c} / {toi_c}",
-            "value": safe_div(opb_c, toi_c)
-        })
-
-        # Income mix
-        ratios.append({
-            "name": "Fee Income Mix",
-            "formula": "Net Fee & Commission / Total Operating Income",
-            "calc": f"{nfee_c} / {toi_c}",
-            "value": safe_div(nfee_c, toi_c)
-        })
-        mix_numer = fx_c if fx_c is not None else ((trading_c or 0) + (other_c or 0))
-        ratios.append({
-            "name": "Markets & Other Income Mix",
-            "formula": "(FX & Derivatives OR Trading + Other) / Total Operating Income",
-            "calc": f"{mix_numer} / {toi_c}",
-            "value": safe_div(mix_numer, toi_c)
-        })
-
-        # Credit quality
-        ratios.append({
-            "name": "NPL Ratio",
-            "formula": "Credit-Impaired Loans / Gross Loans",
-            "calc": f"{npls} / {gross_loans}",
-            "value": safe_div(npls, gross_loans)
-        })
-        ratios.append({
-            "name": "Coverage Ratio",
-            "formula": "Loan Loss Provisions (ECL) / NPLs",
-            "calc": f"{ecl_loans} / {npls}",
-            "value": safe_div(ecl_loans, npls)
-        })
-        ratios.append({
-            "name": "ECL / Gross Loans",
-            "formula": "Total ECL (Loans) / Gross Loans",
-            "calc": f"{ecl_loans} / {gross_loans}",
-            "value": safe_div(ecl_loans, gross_loans)
-        })
-
-        # Tax efficiency
-        ratios.append({
-            "name": "Effective Tax Rate",
-            "formula": "Taxation Charge / Profit Before Tax",
-            "calc": f"{tax_c} / {pbt_c}",
-            "value": safe_div(tax_c, pbt_c)
-        })
-
-        # Scale profitability (approx since we only have period-end assets)
-        ratios.append({
-            "name": "ROA (Quarter, Approx.)",
-            "formula": "Profit for the Period / Total Assets",
-            "calc": f"{pat_c} / {total_assets}",
-            "value": safe_div(pat_c, total_assets)
-        })
-
-        # EPS trend
-        eps_yoy = safe_div((eps_c - eps_p) if (eps_c is not None and eps_p is not None) else None, eps_p)
-        ratios.append({
-            "name": "EPS YoY Change",
-            "formula": "(EPS 2025 - EPS 2024) / EPS 2024",
-            "calc": f"{eps_c} - {eps_p} over {eps_p}",
-            "value": eps_yoy
-        })
-
-        # Recommendations (very light-touch)
-        recommendations = []
-        ci = next((r for r in ratios if r["name"]=="Cost-to-Income"), None)
-        if ci and ci["value"] is not None:
-            if ci["value"] > 0.50:
-                recommendations.append("🔴 Cost-to-Income > 50% this quarter; investigate operating expense levers.")
-            elif ci["value"] < 0.35:
-                recommendations.append("🟢 Strong cost efficiency indicated by a low Cost-to-Income ratio.")
-
-        npl = next((r for r in ratios if r["name"]=="NPL Ratio"), None)
-        cov = next((r for r in ratios if r["name"]=="Coverage Ratio"), None)
-        if npl and npl["value"] is not None and npl["value"] > 0.06:
-            recommendations.append("🟠 NPL ratio > 6%; review sectoral concentrations and staging migrations.")
-        if cov and cov["value"] is not None and cov["value"] < 1.0:
-            recommendations.append("🟠 Coverage < 100%; assess collateral, cures and write-off policy.")
-
-        if not recommendations:
-            recommendations.append("🟢 Metrics look balanced across profitability, efficiency and asset quality.")
-
-        metrics_table = []
-        for k, v in dual.items():
-            metrics_table.append((k, v.get("current"), v.get("prior")))
-        for k in ["Gross Loans and Receivables","Expected Credit Losses (Loans)","Net Loans and Receivables",
-                  "Credit-Impaired Loans (NPLs)","Total Assets","Fee and Commission Income",
-                  "Fee and Commission Expense","FX & Derivative Income"]:
-            metrics_table.append((k, single.get(k), None))
-
-        return render_template_string("""
-        <html>
-        <head>
-            <title>ENBD Q1 2025 Report</title>
-            <style>
-                body { font-family: Arial; background:#f9f9f9; padding:40px; }
-                .box { background:white; padding:30px; max-width:1000px; margin:auto; border-radius:12px; box-shadow:0 0 10px #ccc; }
-                h2 { color:#004080; }
-                table { width:100%; border-collapse:collapse; margin-top:16px; }
-                th, td { padding:10px 12px; border-bottom:1px solid #eee; text-align:left; vertical-align:top; }
-                th { background:#f0f4fa; }
-                code { background:#eef; padding:2px 4px; border-radius:4px; }
-                .muted { color:#666; font-size:12px; }
-            </style>
-        </head>
-        <body>
-            <div class="box">
-                <h2>📊 Emirates NBD – Q1 2025 Financial Highlights</h2>
-                <div class="muted">Figures parsed from the uploaded Q1-2025 interim financial statements PDF.</div>
-
-                <h3>Extracted Metrics (Current vs Prior)</h3>
-                <table>
-                    <tr><th>Metric</th><th>Q1-2025</th><th>Q1-2024</th></tr>
-                    {% for k, curv, prv in metrics %}
-                      <tr>
-                        <td>{{k}}</td>
-                        <td>{{ '{:,.2f}'.format(curv) if curv is not none else 'Not Found' }}</td>
-                        <td>{{ '{:,.2f}'.format(prv) if prv is not none else '—' }}</td>
-                      </tr>
-                    {% endfor %}
-                </table>
-
-                <h3>Key Ratios with Formulas</h3>
-                <table>
-                    <tr><th>Ratio</th><th>Formula</th><th>Calculation</th><th>Value</th></tr>
-                    {% for r in ratios %}
-                      <tr>
-                        <td>{{ r.name }}</td>
-                        <td><code>{{ r.formula }}</code></td>
-                        <td><code>{{ r.calc }}</code></td>
-                        <td>{{ r.value|to_pct }}</td>
-                      </tr>
-                    {% endfor %}
-                </table>
-
-                <h3>🧠 Recommendations</h3>
-                <ul>
-                    {% for rec in recommendations %}
-                      <li>{{ rec }}</li>
-                    {% endfor %}
-                </ul>
-            </div>
-        </body>
-        </html>
-        """, metrics=metrics_table, ratios=ratios, recommendations=recommendations)
+        buf = upload_buffer(f)
+        key = parse_cache.key_for_digest(buf.sha256())
+        result = parse_cache.get(key)
+        if result is None:
+            result = analyze_upload(buf)
+            parse_cache.put(key, result)
+        return render_report(key, result)
     except Exception as e:
         return f"Error: {str(e)}", 500
-    finally:
-        tmp.close()
-        if os.path.exists(tmp.name):
-            os.unlink(tmp.name)
+
+@app.route("/report/<key>")
+def report(key):
+    result = parse_cache.get(key)
+    if result is None:
+        return "Unknown or expired report.", 404
+    return render_report(key, result)
+
+# -------- JSON API --------
+# The report as JSON: dual/single line items, ratio records and
+# recommendations. The parse cache key (upload hash + extractor fingerprint)
+# is also the ETag, so a conditional GET is answered without reading the cache.
+def statement_etag(key):
+    return etag_for(key, "statement")
+
+@app.route("/api/v1/statements", methods=["POST"])
+def api_upload():
+    f = request.files.get("pdf_file")
+    if not f or f.filename == "":
+        return api_error("Missing file field 'pdf_file'.", 400)
+    try:
+        buf = upload_buffer(f)
+        key = parse_cache.key_for_digest(buf.sha256())
+        result = parse_cache.get(key)
+        if result is None:
+            result = analyze_upload(buf)
+            parse_cache.put(key, result)
+    except Exception as e:
+        return api_error(f"Error: {e}", 500)
+    return json_response(dict(key=key, **result), statement_etag(key), status=201,
+                         headers={"Location": url_for("api_statement", key=key)})
+
+@app.route("/api/v1/statements/<key>")
+def api_statement(key):
+    if not parse_cache.valid_key(key):
+        return api_error("Unknown or expired report.", 404)
+    etag = statement_etag(key)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    result = parse_cache.get(key)
+    if result is None:
+        return api_error("Unknown or expired report.", 404)
+    return json_response(dict(key=key, **result), etag)
 
 if __name__ == "__main__":
-   app.run(host="127.0.0.1", port=5000, debug=True)
\ No newline at end of file
+   app.run(host="127.0.0.1", port=5000, debug=True)
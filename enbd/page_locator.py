@@ -0,0 +1,132 @@
+# page_locator.py
+# Page-targeted text extraction for ENBD statements: only the pages that carry
+# the income statement / loan note / segment note lines are read with fitz.
+import threading
+from contextlib import nullcontext
+from collections import OrderedDict
+
+# Pages that are not neighbours in the PDF are joined with a NUL line so a
+# pattern's "\s+" / ".*?" cannot stitch a label on one page to numbers on an
+# unrelated page; a match that still crosses one ("[\s\S]*?") is rejected.
+# Consecutive pages keep the plain "\n" join of parse_pdf.
+_GAP = "\n\x00\n"
+
+
+class PageLocator:
+    """Resolves extractor labels from as few PDF pages as possible.
+
+    Cold path (layout not seen before): every page is read and the labels are
+    matched against the whole text, exactly as a full parse does, so matches
+    that run across a page break resolve the same way. The pages each winning
+    match spans (plus the next page when the match runs to the end of its
+    page) are then cached under the document's layout fingerprint, with the
+    page each match started on.
+
+    Warm path (same layout, e.g. the next quarter's statement): only the cached
+    pages are extracted. Layouts learned with any label unresolved never take
+    it, since the missing label may sit on any page of the next document. The
+    result is used only if every label matches, each one leftmost on the page
+    it started on when the layout was learned and without running across a
+    gap between non-adjacent pages; otherwise the document is re-parsed on
+    the cold path and the layout entry is refreshed.
+
+    Pages outside the cached set are not read, so the warm path trusts the
+    layout fingerprint that none of them now holds an earlier match. That
+    cannot be checked cheaply (statement text is CID-encoded; only fitz's
+    text extraction, the cost being saved, reads it), which is why the apps
+    only target pages when ENBD_TARGETED_PARSE=1.
+
+    ``span(stage)``, when given, returns a context manager used to time fitz
+    text extraction ("pdf_text") and label matching ("extract") separately.
+    """
+
+    def __init__(self, extractor, max_layouts=256, span=None):
+        self.extractor = extractor
+        self.max_layouts = max_layouts
+        self.span = span or (lambda stage: nullcontext())
+        self._layouts = OrderedDict()  # key -> (page indices, {label: page its match starts on}, all resolved)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def layout_key(doc):
+        meta = doc.metadata or {}
+        # page_cropbox reads the page tree without loading (parsing) each page
+        sizes = tuple(
+            (round(box.width), round(box.height))
+            for box in (doc.page_cropbox(i) for i in range(doc.page_count))
+        )
+        return (doc.page_count, meta.get("creator", ""), meta.get("producer", ""), sizes)
+
+    def _join(self, pages):
+        # pages: sorted [(index, text)] -> (joined text, [(start offset, index)])
+        parts, offsets, pos, prev = [], [], 0, None
+        for idx, txt in pages:
+            if prev is not None:
+                sep = "\n" if idx == prev + 1 else _GAP
+                parts.append(sep)
+                pos += len(sep)
+            offsets.append((pos, idx))
+            parts.append(txt)
+            pos += len(txt)
+            prev = idx
+        return "".join(parts), offsets
+
+    @staticmethod
+    def _page_at(offsets, pos):
+        page = offsets[0][1]
+        for start, idx in offsets:
+            if start > pos:
+                break
+            page = idx
+        return page
+
+    def _cold(self, doc):
+        with self.span("pdf_text"):
+            texts = [(idx, pg.get_text()) for idx, pg in enumerate(doc)]
+        with self.span("extract"):
+            text, offsets = self._join(texts)
+            found = self.extractor.find(text)
+            pages, starts = set(), {}
+            for key, m in found.items():
+                first = self._page_at(offsets, m.start())
+                last = self._page_at(offsets, max(m.end() - 1, m.start()))
+                starts[key] = first
+                pages.update(range(first, last + 1))
+                # A match that runs to the end of its page may read on into the next one.
+                if last + 1 < len(texts) and not texts[last][1][m.end() - offsets[last][0]:].strip():
+                    pages.add(last + 1)
+        return found, sorted(pages), starts
+
+    def _warm_ok(self, found, offsets, starts):
+        if len(found) != len(self.extractor.literals):
+            return False
+        for key, m in found.items():
+            if self._page_at(offsets, m.start()) != starts[key] or "\x00" in m.group(0):
+                return False
+        return True
+
+    def parse(self, doc):
+        key = self.layout_key(doc)
+        with self._lock:
+            cached = self._layouts.get(key)
+            if cached is not None:
+                self._layouts.move_to_end(key)
+
+        if cached is not None and cached[2]:
+            pages, starts, _ = cached
+            with self.span("pdf_text"):
+                texts = [(i, doc[i].get_text()) for i in pages]
+            with self.span("extract"):
+                text, offsets = self._join(texts)
+                found = self.extractor.find(text)
+                if offsets and self._warm_ok(found, offsets, starts):
+                    return self.extractor.build(found)
+
+        found, pages, starts = self._cold(doc)
+        with self._lock:
+            self._layouts[key] = (pages, starts, len(found) == len(self.extractor.literals))
+            self._layouts.move_to_end(key)
+            while len(self._layouts) > self.max_layouts:
+                self._layouts.popitem(last=False)
+        with self.span("extract"):
+            return self.extractor.build(found)
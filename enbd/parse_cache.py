@@ -0,0 +1,89 @@
+# parse_cache.py
+# Content-addressed on-disk cache of parsed ENBD statements.
+import os, re, json, hashlib, tempfile, threading
+
+_KEY_RE = re.compile(r"^[0-9a-f]{64}-[0-9a-f]{12}$")
+
+
+class ParseCache:
+    """JSON results keyed by sha256(upload bytes) + a payload fingerprint.
+
+    The payload fingerprint hashes every part that shapes a cached result
+    (extractor, ratio engine, context builder, the app's own payload
+    version), so changing any of them starts a fresh set of keys.
+
+    One file per entry under ``root``; the file mtime is the LRU clock
+    (touched on every hit). When the directory grows past ``max_bytes`` the
+    least recently used entries are deleted. Keys double as permalinks, so
+    they are validated before touching the filesystem.
+    """
+
+    def __init__(self, root, max_bytes, *fingerprints):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fingerprint = hashlib.sha256("|".join(fingerprints).encode("utf-8")).hexdigest()[:12]
+        self._lock = threading.Lock()
+
+    def key_for(self, data):
+        return self.key_for_digest(hashlib.sha256(data).hexdigest())
+
+    def key_for_digest(self, sha256_hex):
+        return f"{sha256_hex}-{self.fingerprint}"
+
+    @staticmethod
+    def valid_key(key):
+        return bool(key) and bool(_KEY_RE.match(key))
+
+    def _path(self, key):
+        return os.path.join(self.root, key + ".json")
+
+    def get(self, key):
+        if not self.valid_key(key):
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                payload = json.load(fh)
+            os.utime(path)
+            return payload
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, payload):
+        if not self.valid_key(key):
+            raise ValueError(f"Invalid cache key: {key!r}")
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(payload, fh, separators=(",", ":"))
+            os.replace(tmp, self._path(key))
+        except Exception:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries, total = [], 0
+            for e in os.scandir(self.root):
+                if not e.name.endswith(".json"):
+                    continue
+                try:
+                    st = e.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, e.path))
+                total += st.st_size
+            if total <= self.max_bytes:
+                return
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                    total -= size
+                except OSError:
+                    pass
@@ -0,0 +1,246 @@
+# ratio_engine.py
+# Declarative bank ratios shared by the ENBD apps. The spec is evaluated as
+# NumPy column operations, so screening thousands of statements (e.g. the
+# output of batch.py) costs one pass per ratio rather than a Python loop.
+import json, hashlib, operator
+import numpy as np
+import pandas as pd
+
+# Line-item names used by the spec. The genai apps extract a few balances
+# under short labels; these are mapped onto the canonical names.
+FIELD_ALIASES = {
+    "Gross Loans": "Gross Loans and Receivables",
+    "ECL": "Expected Credit Losses (Loans)",
+    "NPLs": "Credit-Impaired Loans (NPLs)",
+}
+
+# Operand expressions: a field name (current period), "<field> (prior)", or
+#   ("sub", a, b)        a - b, missing if either is missing
+#   ("sum0", a, b, ...)  sum with missing items counted as 0
+#   ("coalesce", a, b)   a where present, else b
+# "short" is the label the genai apps show (ratios without one are only in
+# the full report). Threshold rules fire on the rounded value; "brief" is
+# the wording the genai apps use, rules without it only appear in the full
+# report.
+RATIO_SPEC = [
+    # Profitability & efficiency
+    {"name": "Cost-to-Income", "short": "Cost-to-Income",
+     "formula": "G&A Expenses / Total Operating Income",
+     "numerator": "General and Administrative Expenses", "denominator": "Total Operating Income",
+     "thresholds": [
+         {"op": ">", "value": 0.50,
+          "message": "🔴 Cost-to-Income > 50% this quarter; investigate operating expense levers.",
+          "brief": "High cost-to-income; review operating expenses."},
+         {"op": "<", "value": 0.35,
+          "message": "🟢 Strong cost efficiency indicated by a low Cost-to-Income ratio."},
+     ]},
+    {"name": "Net Profit Margin", "short": "Net Profit Margin",
+     "formula": "Profit for the Period / Total Operating Income",
+     "numerator": "Profit for the Period", "denominator": "Total Operating Income"},
+    {"name": "Pre-Impairment Operating Margin", "short": "Pre-impairment Margin",
+     "formula": "Operating Profit Before Impairment / Total Operating Income",
+     "numerator": "Operating Profit Before Impairment", "denominator": "Total Operating Income"},
+
+    # Income mix
+    {"name": "Fee Income Mix",
+     "formula": "Net Fee & Commission / Total Operating Income",
+     "numerator": "Net Fees and Commission", "denominator": "Total Operating Income"},
+    {"name": "Markets & Other Income Mix",
+     "formula": "(FX & Derivatives OR Trading + Other) / Total Operating Income",
+     "numerator": ("coalesce", "FX & Derivative Income",
+                   ("sum0", "Net Gain on Trading Securities", "Other Operating Income")),
+     "denominator": "Total Operating Income"},
+
+    # Credit quality
+    {"name": "NPL Ratio", "short": "NPL Ratio",
+     "formula": "Credit-Impaired Loans / Gross Loans",
+     "numerator": "Credit-Impaired Loans (NPLs)", "denominator": "Gross Loans and Receivables",
+     "thresholds": [
+         {"op": ">", "value": 0.06,
+          "message": "🟠 NPL ratio > 6%; review sectoral concentrations and staging migrations.",
+          "brief": "NPL ratio elevated; examine credit concentrations."},
+     ]},
+    {"name": "Coverage Ratio", "short": "Coverage Ratio",
+     "formula": "Loan Loss Provisions (ECL) / NPLs",
+     "numerator": "Expected Credit Losses (Loans)", "denominator": "Credit-Impaired Loans (NPLs)",
+     "thresholds": [
+         {"op": "<", "value": 1.0,
+          "message": "🟠 Coverage < 100%; assess collateral, cures and write-off policy."},
+     ]},
+    {"name": "ECL / Gross Loans", "short": "ECL/Gross Loans",
+     "formula": "Total ECL (Loans) / Gross Loans",
+     "numerator": "Expected Credit Losses (Loans)", "denominator": "Gross Loans and Receivables"},
+
+    # Tax efficiency
+    {"name": "Effective Tax Rate", "short": "Tax Rate",
+     "formula": "Taxation Charge / Profit Before Tax",
+     "numerator": "Taxation Charge", "denominator": "Profit Before Tax"},
+
+    # Scale profitability (approx since we only have period-end assets)
+    {"name": "ROA (Quarter, Approx.)", "short": "ROA",
+     "formula": "Profit for the Period / Total Assets",
+     "numerator": "Profit for the Period", "denominator": "Total Assets"},
+
+    # EPS trend
+    {"name": "EPS YoY Change", "short": "EPS YoY",
+     "formula": "(EPS 2025 - EPS 2024) / EPS 2024",
+     "numerator": ("sub", "Earnings Per Share (AED)", "Earnings Per Share (AED) (prior)"),
+     "denominator": "Earnings Per Share (AED) (prior)",
+     "calc": ("{} - {} over {}", ["Earnings Per Share (AED)", "Earnings Per Share (AED) (prior)",
+                                  "Earnings Per Share (AED) (prior)"])},
+]
+
+BALANCED_MESSAGE = "🟢 Metrics look balanced across profitability, efficiency and asset quality."
+
+# Bump whenever evaluation or output shapes change (part of the parse cache key).
+RATIO_ENGINE_VERSION = "1"
+
+_OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+
+def _resolve(cols, n, expr):
+    # cols: {field: float64 array}; missing fields are all-NaN
+    if isinstance(expr, str):
+        col = cols.get(expr)
+        return col if col is not None else np.full(n, np.nan)
+    op, args = expr[0], [_resolve(cols, n, a) for a in expr[1:]]
+    if op == "sub":
+        return args[0] - args[1]
+    if op == "sum0":
+        return sum(np.nan_to_num(a, nan=0.0) for a in args)
+    if op == "coalesce":
+        out = args[0]
+        for a in args[1:]:
+            out = np.where(np.isnan(out), a, out)
+        return out
+    raise ValueError(f"Unknown ratio op: {op!r}")
+
+
+def _scalar(arr):
+    # 1-element array -> float, or None where missing
+    v = float(arr[0])
+    return None if v != v else v
+
+
+def statement_row(dual, single):
+    """Flattens one parsed statement into {field: value}."""
+    row = {}
+    for label, v in (dual or {}).items():
+        row[label] = v.get("current")
+        row[f"{label} (prior)"] = v.get("prior")
+    for label, v in (single or {}).items():
+        row[FIELD_ALIASES.get(label, label)] = v
+    return row
+
+
+def statement_frame(statements):
+    """[(dual, single), ...] -> DataFrame, one row per statement, one float column per field."""
+    return pd.DataFrame.from_records([statement_row(d, s) for d, s in statements]).astype("float64")
+
+
+class RatioEngine:
+    """Evaluates ``spec`` over column arrays: one NumPy op per ratio, whatever the number of statements.
+
+    evaluate()/flags() screen a statement_frame() of any size; the
+    ratio_records()/ratio_pairs()/recommendations() helpers serve a single
+    upload in the shapes the apps already render.
+    """
+
+    def __init__(self, spec=RATIO_SPEC):
+        self.spec = spec
+        self.names = [r["name"] for r in spec]
+        self._by_short = {r["short"]: r["name"] for r in spec if r.get("short")}
+        # Flattened threshold rules, in spec order.
+        self._rules = [(r["name"], _OPS[t["op"]], t["value"], t["message"], t.get("brief"))
+                       for r in spec for t in r.get("thresholds", ())]
+        # Identifies version + spec, e.g. for caching computed ratios.
+        spec_json = json.dumps([RATIO_ENGINE_VERSION, FIELD_ALIASES, spec, BALANCED_MESSAGE])
+        self.fingerprint = hashlib.sha256(spec_json.encode("utf-8")).hexdigest()
+
+    # ----- vectorized (N statements) -----
+    def _columns(self, frame):
+        return {c: frame[c].to_numpy(dtype="float64", na_value=np.nan) for c in frame.columns}
+
+    def _evaluate(self, cols, n, terms=None):
+        # {name: unrounded ratio array}; NaN where missing or divided by zero.
+        # ``terms``, when given, receives {name: (numerator, denominator)}.
+        out = {}
+        for r in self.spec:
+            num = _resolve(cols, n, r["numerator"])
+            den = _resolve(cols, n, r["denominator"])
+            if terms is not None:
+                terms[r["name"]] = (num, den)
+            ok = ~np.isnan(num) & ~np.isnan(den) & (den != 0)
+            out[r["name"]] = np.where(ok, num / np.where(ok, den, 1.0), np.nan)
+        return out
+
+    def evaluate(self, frame, decimals=4):
+        """Ratio table for a statement_frame(); NaN where a ratio is undefined.
+
+        Rounded with NumPy, which can differ from Python's round() in the last
+        digit on exact ties; ratio_records()/ratio_pairs() use round() and
+        match the per-upload values exactly.
+        """
+        out = self._evaluate(self._columns(frame), len(frame))
+        return pd.DataFrame(out, index=frame.index, columns=self.names).round(decimals)
+
+    def flags(self, ratios):
+        """Boolean frame over evaluate() output: one column per threshold rule message."""
+        return pd.DataFrame({msg: op(ratios[name], value).fillna(False)
+                             for name, op, value, msg, _ in self._rules}, index=ratios.index)
+
+    # ----- single statement -----
+    def _single(self, dual, single):
+        # One upload is evaluated as a batch of one, so both paths share the
+        # spec semantics; values are rounded with round() as the apps always did.
+        row = statement_row(dual, single)
+        cols = {k: np.array([np.nan if v is None else v], dtype="float64") for k, v in row.items()}
+        terms = {}
+        ratios = self._evaluate(cols, 1, terms)
+        nums, dens, values = {}, {}, {}
+        for name, (num, den) in terms.items():
+            nums[name], dens[name] = _scalar(num), _scalar(den)
+            v = _scalar(ratios[name])
+            values[name] = None if v is None else round(v, 4)
+        return row, nums, dens, values
+
+    def ratio_records(self, dual, single):
+        """[{"name", "formula", "calc", "value"}, ...] as shown in the full report."""
+        row, nums, dens, values = self._single(dual, single)
+        out = []
+        for r in self.spec:
+            name = r["name"]
+            if "calc" in r:
+                template, fields = r["calc"]
+                calc = template.format(*(row.get(f) for f in fields))
+            else:
+                calc = f"{nums[name]} / {dens[name]}"
+            out.append({"name": name, "formula": r["formula"], "calc": calc, "value": values[name]})
+        return out
+
+    def ratio_pairs(self, dual, single):
+        """[(short name, value), ...] for the ratios the genai apps show."""
+        values = self._single(dual, single)[3]
+        return [(r["short"], values[r["name"]]) for r in self.spec if r.get("short")]
+
+    def recommendations(self, values, brief=False):
+        """Threshold messages for one statement.
+
+        ``values`` maps ratio name (or short name) to value. ``brief`` selects
+        the genai wording and omits rules that have none (and the
+        "balanced" fallback).
+        """
+        values = {self._by_short.get(k, k): v for k, v in dict(values).items()}
+        recs = []
+        for name, op, value, msg, short_msg in self._rules:
+            v = values.get(name)
+            if v is None or (brief and not short_msg):
+                continue
+            if op(v, value):
+                recs.append(short_msg if brief else msg)
+        if not recs and not brief:
+            recs.append(BALANCED_MESSAGE)
+        return recs
+
+
+engine = RatioEngine()
@@ -0,0 +1,76 @@
+# statement_analysis.py
+# ENBD statement analysis without the web app: the line-item regexes, parse_pdf,
+# compute_ratios and metrics_to_context used by financial_flask_genai_2.py and
+# by batch.py workers. Importing it builds no Flask app, session store, parse
+# cache or LLM gateway.
+#
+# Config (env): ENBD_TARGETED_PARSE (default 0)
+import fitz, os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from statement_extractor import StatementExtractor
+from page_locator import PageLocator
+from ratio_engine import engine as ratio_engine
+from common.metrics import span, timed
+from common.prompt_context import ContextBuilder, num
+
+def fmt_pct(x):
+    return f"{x*100:.2f}%" if x is not None else "N/A"
+
+# Regexes for ENBD-style statements (tweak as needed)
+patterns_dual = {
+    "Total Operating Income": r"Total operating income\s+([\d,]+)\s+([\d,]+)",
+    "General and Administrative Expenses": r"General and administrative expenses\s+\(([\d,]+)\)\s+\(([\d,]+)\)",
+    "Operating Profit Before Impairment": r"Operating profit before impairment\s+([\d,]+)\s+([\d,]+)",
+    "Profit Before Tax": r"Profit for the period before taxation\s+([\d,]+)\s+([\d,]+)",
+    "Taxation Charge": r"Taxation charge\s+\(([\d,]+)\)\s+\(([\d,]+)\)",
+    "Profit for the Period": r"Profit for the period\s+([\d,]+)\s+([\d,]+)",
+    "Earnings Per Share (AED)": r"Earnings per share\s*\(AED\)\s+([\d\.]+)\s+([\d\.]+)",
+}
+patterns_single = {
+    "Gross Loans": r"Gross loans and receivables\s+([\d,]+)\s+[\d,]+",
+    "ECL": r"Less:\s*Expected credit losses\s+\(([\d,]+)\)\s+\([\d,]+\)",
+    "NPLs": r"Total of credit impaired loans and receivables\s+([\d,]+)\s+[\d,]+",
+    "Total Assets": r"Segment Assets[\s\S]*?(\d{1,3}(?:,\d{3})+)\s*\n\s*Segment Liabilities",
+}
+
+extractor = StatementExtractor(patterns_dual, patterns_single)
+
+# Every page is extracted by default. ENBD_TARGETED_PARSE=1 reads only the
+# pages that held the line items in the last PDF with the same layout
+# (remembered per process); it assumes no other page holds an earlier match
+# (see page_locator.py).
+TARGETED_PARSE = os.environ.get("ENBD_TARGETED_PARSE", "0") == "1"
+page_locator = PageLocator(extractor, span=span)
+
+def extract_dual(text):
+    return extractor.extract_dual(text)
+
+def extract_single(text):
+    return extractor.extract_single(text)
+
+def parse_document(doc, targeted=TARGETED_PARSE):
+    if targeted:
+        return page_locator.parse(doc)
+    with span("pdf_text"):
+        txt = "\n".join(pg.get_text() for pg in doc)
+    with span("extract"):
+        return extractor.extract(txt)
+
+def parse_pdf(path, targeted=TARGETED_PARSE):
+    with fitz.open(path) as doc:
+        return parse_document(doc, targeted)
+
+@timed("ratios")
+def compute_ratios(dual, single):
+    # Shared declarative spec (ratio_engine); short names as shown in this app.
+    return ratio_engine.ratio_pairs(dual, single)
+
+def metrics_to_context(dual, single, ratios, model="gpt-4o-mini"):
+    # Ratios are kept first, then the income statement, then balances, within
+    # the model's token budget (see common/prompt_context.py).
+    ctx = ContextBuilder(model)
+    ctx.add([f"{k}: {num(v['current'])}/{num(v['prior'])}" for k, v in dual.items()],
+            priority=1, title="Key metrics (current/prior):")
+    ctx.add([f"{k}: {num(v)}" for k, v in single.items()], priority=2)
+    ctx.add([f"{name}: {fmt_pct(val)}" for name, val in ratios], priority=0, title="Ratios:")
+    return ctx.build()
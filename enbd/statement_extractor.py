@@ -0,0 +1,133 @@
+# statement_extractor.py
+# Compiled line-item extraction shared by the ENBD Flask apps.
+import re, json, hashlib
+
+# Bump whenever patterns or matching semantics change (used as a cache key).
+EXTRACTOR_VERSION = "1"
+
+_META = set("\\.^$*+?{}[]|()")
+# Non-ASCII characters that re.IGNORECASE equates with ASCII letters but that
+# str.lower() leaves distinct ("ı", "ſ") or widens ("İ").
+_FOLD_TRAPS = ("\u0130", "\u0131", "\u017f")
+# Gaps that match any text, newlines included.
+_ANY_GAPS = ("[\\s\\S]*", "[\\S\\s]*")
+
+def to_float(s):
+    try:
+        return float(s.replace(",", ""))
+    except Exception:
+        return None
+
+def _plain_head(pattern):
+    out = []
+    for ch in pattern:
+        if ch in _META:
+            break
+        out.append(ch)
+    return "".join(out)
+
+def _literal_prefix(pattern):
+    # Leading plain-text part of a label regex, e.g. "Net interest income"
+    return _plain_head(pattern).rstrip()
+
+def _gap_after_label(pattern):
+    # "Segment Assets[\s\S]*?...": a label directly followed by an unbounded
+    # any-text gap. If such a pattern fails at one occurrence of its label it
+    # fails at every later one too (the gap from the first could have reached
+    # any later match), so it is tried at most once.
+    head = _plain_head(pattern)
+    return head == head.rstrip() and pattern[len(head):].startswith(_ANY_GAPS)
+
+
+class StatementExtractor:
+    """Compiles the label patterns once and resolves them against one lowered copy of the text.
+
+    Every pattern starts with a literal label, so the leftmost match of a
+    pattern can only begin where that label occurs. The text is lower-cased
+    once, then each distinct label gets its own ``str.find`` scan (about 25
+    for the ENBD patterns), and the compiled patterns are only tried at the
+    positions it finds, until they match. Patterns sharing a label share the
+    scan. A pattern whose label is followed by an any-text gap is tried at the
+    first occurrence only (see ``_gap_after_label``).
+
+    One alternation regex over all labels would scan the text once, but it
+    measured 2-3x slower than these C-level ``str.find`` scans on the ENBD
+    statement, and indexing lines by their leading label misses labels that
+    appear mid-line ("13  OTHER OPERATING INCOME"). Results are identical to
+    ``re.search(pattern, text, re.IGNORECASE)`` per label; text where
+    lower-casing and IGNORECASE disagree falls back to exactly that.
+    """
+
+    def __init__(self, patterns_dual, patterns_single):
+        self.patterns_dual = dict(patterns_dual)
+        self.patterns_single = dict(patterns_single)
+
+        # literal label -> [(kind, label, compiled, try_once), ...]
+        self._groups = {}
+        # (kind, label) -> its lower-cased literal label
+        self.literals = {}
+        for kind, patterns in (("dual", self.patterns_dual), ("single", self.patterns_single)):
+            for label, pat in patterns.items():
+                lit = _literal_prefix(pat).lower()
+                if not lit:
+                    raise ValueError(f"Pattern for {label!r} must start with a literal label: {pat!r}")
+                self._groups.setdefault(lit, []).append(
+                    (kind, label, re.compile(pat, re.IGNORECASE), _gap_after_label(pat)))
+                self.literals[(kind, label)] = lit
+        self._ascii_labels = all(lit.isascii() for lit in self._groups)
+
+        # Identifies version + pattern set, e.g. for caching parse results.
+        spec = json.dumps([EXTRACTOR_VERSION, self.patterns_dual, self.patterns_single])
+        self.fingerprint = hashlib.sha256(spec.encode("utf-8")).hexdigest()
+
+    def _search_all(self, text):
+        found = {}
+        for entries in self._groups.values():
+            for kind, label, rx, _ in entries:
+                m = rx.search(text)
+                if m:
+                    found[(kind, label)] = m
+        return found
+
+    def find(self, text):
+        """Leftmost match per label, as ``{(kind, label): re.Match}``; unmatched labels are absent."""
+        if not self._ascii_labels or any(ch in text for ch in _FOLD_TRAPS):
+            return self._search_all(text)
+
+        lowered = text.lower()
+        found = {}
+        for lit, entries in self._groups.items():
+            pending = list(entries)
+            pos = lowered.find(lit)
+            while pending and pos != -1:
+                for entry in list(pending):
+                    m = entry[2].match(text, pos)
+                    if m:
+                        found[(entry[0], entry[1])] = m
+                    if m or entry[3]:
+                        pending.remove(entry)
+                pos = lowered.find(lit, pos + 1)
+        return found
+
+    def build(self, found):
+        dual = {}
+        for label in self.patterns_dual:
+            m = found.get(("dual", label))
+            dual[label] = {
+                "current": to_float(m.group(1)) if m else None,
+                "prior": to_float(m.group(2)) if (m and m.lastindex and m.lastindex >= 2) else None,
+            }
+        single = {}
+        for label in self.patterns_single:
+            m = found.get(("single", label))
+            single[label] = to_float(m.group(1)) if m else None
+        return dual, single
+
+    def extract(self, text):
+        return self.build(self.find(text))
+
+    def extract_dual(self, text):
+        return self.extract(text)[0]
+
+    def extract_single(self, text):
+        return self.extract(text)[1]
@@ -0,0 +1,111 @@
+# upload_buffer.py
+# In-memory upload handling for the ENBD apps: the multipart file part is
+# kept in RAM and handed to fitz as a stream; only uploads above a configurable
+# threshold are spilled to a named temp file (which fitz then opens by path).
+import io, os, hashlib, tempfile
+import fitz
+from flask import Request, current_app
+
+DEFAULT_SPILL_BYTES = 16 * 1024 * 1024
+
+
+class SpillBuffer(io.RawIOBase):
+    """Write-once upload buffer: BytesIO until ``threshold`` bytes, then a named temp file."""
+
+    def __init__(self, threshold):
+        super().__init__()
+        self.threshold = threshold
+        self.path = None
+        self._fh = io.BytesIO()
+
+    @property
+    def spilled(self):
+        return self.path is not None
+
+    def _spill(self):
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+        tmp.write(self._fh.getbuffer())
+        pos = self._fh.tell()
+        self._fh.close()
+        tmp.seek(pos)
+        self._fh, self.path = tmp, tmp.name
+
+    def writable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def write(self, b):
+        if not self.spilled and self._fh.tell() + len(b) > self.threshold:
+            self._spill()
+        return self._fh.write(b)
+
+    def read(self, size=-1):
+        return self._fh.read(size)
+
+    def readinto(self, b):
+        return self._fh.readinto(b)
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        return self._fh.seek(pos, whence)
+
+    def tell(self):
+        return self._fh.tell()
+
+    def sha256(self):
+        if not self.spilled:
+            return hashlib.sha256(self._fh.getbuffer()).hexdigest()
+        h = hashlib.sha256()
+        self._fh.flush()
+        with open(self.path, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def open_pdf(self):
+        if self.spilled:
+            self._fh.flush()
+            return fitz.open(self.path)
+        return fitz.open(stream=self._fh.getbuffer(), filetype="pdf")
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._fh.close()
+        except BufferError:
+            pass  # a fitz Document still holds the memoryview; GC frees it
+        if self.path and os.path.exists(self.path):
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        super().close()
+
+
+class SpillRequest(Request):
+    """Flask request whose uploaded files land in a SpillBuffer.
+
+    Werkzeug's default factory rolls every file part over 500 KB to an
+    anonymous temp file; here the limit is ``UPLOAD_SPILL_BYTES`` and the
+    spill file is named so fitz can open it without another copy. The total
+    upload size is capped by Flask's ``MAX_CONTENT_LENGTH`` (413 above it).
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        threshold = current_app.config.get("UPLOAD_SPILL_BYTES", DEFAULT_SPILL_BYTES)
+        return SpillBuffer(threshold)
+
+
+def upload_buffer(storage):
+    # FileStorage -> SpillBuffer; anything else (e.g. a plain stream) is copied in.
+    if isinstance(storage.stream, SpillBuffer):
+        return storage.stream
+    buf = SpillBuffer(DEFAULT_SPILL_BYTES)
+    for chunk in iter(lambda: storage.stream.read(1024 * 1024), b""):
+        buf.write(chunk)
+    return buf
@@ -0,0 +1,87 @@
+# test_baselines.py
+# Rolling baselines follow each owner's history on its own.
+#
+#   python -m unittest discover tests   (or pytest tests)
+import os, sys, csv, shutil, tempfile, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "whoop"))
+
+from history import History, pq
+from ingest import read_whoop_csv
+from baselines import BaselineEngine, OwnerBaselines
+
+CSV_PATH = os.path.join(ROOT, "whoop", "physiological_cycles_today.csv")
+OWNER_A, OWNER_B = "athlete-a-0000", "athlete-b-0000"
+
+
+def alone(path):
+    # Baselines of one export, computed without any store.
+    engine = BaselineEngine()
+    engine.feed(read_whoop_csv(path))
+    return engine.snapshot()
+
+
+@unittest.skipIf(pq is None, "pyarrow is not installed")
+class OwnerBaselinesTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.history = History(os.path.join(self.root, "history"))
+        self.baselines = OwnerBaselines()
+
+    def export(self, name, rows, hrv=None, skip=0):
+        # ``rows`` cycles of the sample export (newest first) after the newest
+        # ``skip``, optionally with every HRV reading replaced.
+        with open(CSV_PATH, newline="", encoding="utf-8") as fh:
+            lines = list(csv.reader(fh))
+        col = [h.strip() for h in lines[0]].index("Heart_rate_variability_(ms)")
+        path = os.path.join(self.root, name)
+        with open(path, "w", newline="", encoding="utf-8") as fh:
+            out = csv.writer(fh)
+            out.writerow(lines[0])
+            for line in lines[1 + skip:1 + skip + rows]:
+                if hrv is not None:
+                    line = line[:col] + [str(hrv)] + line[col + 1:]
+                out.writerow(line)
+        return path
+
+    def snapshot(self, owner):
+        store = self.history.store(owner)
+        return self.baselines.tracker(owner, store).snapshot()
+
+    def upload(self, owner, path):
+        self.history.store(owner).upsert(path)
+        return self.snapshot(owner)
+
+    def test_two_users_stay_separate(self):
+        a_path = self.export("a.csv", 120)
+        # B's cycles start at the same times as A's newest 40, with other readings.
+        b_path = self.export("b.csv", 40, hrv=999)
+        a = self.upload(OWNER_A, a_path)
+        self.assertEqual(a, alone(a_path))
+        b = self.upload(OWNER_B, b_path)
+        self.assertEqual(b, alone(b_path))
+        self.assertEqual(b["Heart_rate_variability_(ms)"]["latest"], 999)
+        self.assertEqual(self.snapshot(OWNER_A), a)
+        self.assertNotEqual(a["Heart_rate_variability_(ms)"]["latest"], 999)
+
+    def test_trackers_follow_their_own_store(self):
+        self.upload(OWNER_A, self.export("a-old.csv", 60, skip=30))
+        self.upload(OWNER_B, self.export("b.csv", 60, hrv=999))
+        # A's next export adds 30 newer days: appended to A's engine, B's is untouched.
+        a_path = self.export("a-new.csv", 90)
+        self.assertEqual(self.upload(OWNER_A, a_path), alone(a_path))
+        stats = self.baselines.stats()
+        self.assertEqual((stats["owners"], stats["rebuilds"]), (2, 2))
+        self.assertEqual(self.snapshot(OWNER_B)["Heart_rate_variability_(ms)"]["latest"], 999)
+
+    def test_drop_forgets_the_owner(self):
+        self.upload(OWNER_A, self.export("a.csv", 30))
+        tracker = self.baselines.tracker(OWNER_A, self.history.store(OWNER_A))
+        self.baselines.drop(OWNER_A)
+        self.assertIsNot(self.baselines.tracker(OWNER_A, self.history.store(OWNER_A)), tracker)
+
+
+if __name__ == "__main__":
+    unittest.main()
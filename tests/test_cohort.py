@@ -0,0 +1,44 @@
+# test_cohort.py
+# Cohort members are uploads with a label; equal labels never replace each other.
+#
+#   python -m unittest discover tests   (or pytest tests)
+import io, os, sys, shutil, tempfile, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "whoop"))
+
+from cohort import CohortStore
+from upload_store import UploadStore
+
+
+def export(n):
+    return io.BytesIO(b"Cycle_start_time,Recovery_score_\n" + b"".join(
+        b"2025-01-%02d 22:00:00,%d\n" % (day, 40 + day) for day in range(1, n + 1)))
+
+
+class CohortStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.uploads = UploadStore(os.path.join(self.root, "uploads"))
+
+    def test_same_label_adds_an_athlete(self):
+        cohort = CohortStore(self.uploads, os.path.join(self.root, "cohort"))
+        first = cohort.add("athlete", export(3))
+        second = cohort.add("athlete", export(5))
+        files = cohort.files()
+        self.assertEqual(list(files), ["athlete", "athlete (2)"])
+        self.assertEqual(files["athlete"], self.uploads.path(first))
+        self.assertEqual(files["athlete (2)"], self.uploads.path(second))
+
+    def test_oldest_member_is_released_past_the_limit(self):
+        cohort = CohortStore(self.uploads, os.path.join(self.root, "cohort"), max_users=2)
+        oldest = cohort.add("a", export(1))
+        cohort.add("b", export(2))
+        cohort.add("c", export(3))
+        self.assertEqual(list(cohort.files()), ["b", "c"])
+        self.assertEqual(self.uploads.refcount(oldest), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
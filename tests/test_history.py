@@ -0,0 +1,64 @@
+# test_history.py
+# Each owner's uploads stay in a history of their own.
+#
+#   python -m unittest discover tests   (or pytest tests)
+import os, sys, csv, shutil, tempfile, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "whoop"))
+
+from history import History, pq
+
+CSV_PATH = os.path.join(ROOT, "whoop", "physiological_cycles_today.csv")
+OWNER_A, OWNER_B = "athlete-a-0000", "athlete-b-0000"
+
+
+@unittest.skipIf(pq is None, "pyarrow is not installed")
+class HistoryOwnerTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.history = History(os.path.join(self.root, "history"))
+
+    def export(self, rows, recovery=None):
+        # The first ``rows`` cycles of the sample export, optionally with every
+        # recovery score replaced.
+        with open(CSV_PATH, newline="", encoding="utf-8") as fh:
+            lines = list(csv.reader(fh))
+        col = [h.strip() for h in lines[0]].index("Recovery_score_")
+        path = os.path.join(self.root, f"export-{rows}-{recovery}.csv")
+        with open(path, "w", newline="", encoding="utf-8") as fh:
+            out = csv.writer(fh)
+            out.writerow(lines[0])
+            for line in lines[1:rows + 1]:
+                if recovery is not None:
+                    line = line[:col] + [str(recovery)] + line[col + 1:]
+                out.writerow(line)
+        return path
+
+    def test_owners_do_not_share_cycles(self):
+        self.history.store(OWNER_A).upsert(self.export(40))
+        before = self.history.store(OWNER_A).frame()
+        # B's cycles start at the same times as A's newest ten.
+        result = self.history.store(OWNER_B).upsert(self.export(10, recovery=10))
+        self.assertEqual(result["inserted"], 10)
+        self.assertEqual(len(self.history.store(OWNER_B).frame()), 10)
+        after = self.history.store(OWNER_A).frame()
+        self.assertTrue(after.equals(before))
+        self.assertFalse((after["Recovery_score_"] == 10).all())
+
+    def test_drop_removes_only_that_owner(self):
+        self.history.store(OWNER_A).upsert(self.export(5))
+        self.history.store(OWNER_B).upsert(self.export(5))
+        self.history.drop(OWNER_B)
+        self.assertEqual(len(self.history.store(OWNER_A).frame()), 5)
+        self.assertEqual(len(self.history.store(OWNER_B).frame()), 0)
+
+    def test_owner_must_be_a_plain_name(self):
+        for owner in ("../escape-0000", "", None, "a/b/c/d/e/f"):
+            with self.assertRaises(ValueError):
+                self.history.store(owner)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+# test_page_locator.py
+# Page-targeted parsing must return what a full-text parse of the same PDF
+# returns, cold or warm.
+#
+#   python -m unittest discover tests   (or pytest tests)
+import os, sys, unittest
+import fitz
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "enbd"))
+
+from statement_extractor import StatementExtractor
+from page_locator import PageLocator
+
+PATTERNS_DUAL = {
+    "Net Interest Income": r"Net interest income\s+([\d,]+)\s+([\d,]+)",
+}
+PATTERNS_SINGLE = {
+    "Total Assets": r"Segment Assets[\s\S]*?(\d{1,3}(?:,\d{3})+)\s*\n\s*Segment Liabilities",
+}
+
+
+def make_pdf(pages):
+    doc = fitz.open()
+    for lines in pages:
+        page = doc.new_page()
+        for i, line in enumerate(lines):
+            page.insert_text((72, 72 + 14 * i), line)
+    return doc
+
+
+def full_parse(extractor, doc):
+    return extractor.extract("\n".join(page.get_text() for page in doc))
+
+
+class PageLocatorTest(unittest.TestCase):
+    def setUp(self):
+        self.extractor = StatementExtractor(PATTERNS_DUAL, PATTERNS_SINGLE)
+
+    def check(self, locator, pages):
+        with make_pdf(pages) as doc:
+            expected = full_parse(self.extractor, doc)
+            self.assertEqual(locator.parse(doc), expected)
+        return expected
+
+    def test_match_across_page_break(self):
+        pages = [["Net interest income 3,000 2,500", "Segment Assets", "Retail"],
+                 ["1,234,567", "Segment Liabilities"]]
+        locator = PageLocator(self.extractor)
+        dual, single = self.check(locator, pages)  # cold
+        self.assertEqual(single["Total Assets"], 1234567.0)
+        self.assertEqual(dual["Net Interest Income"], {"current": 3000.0, "prior": 2500.0})
+        self.check(locator, pages)  # warm
+
+    def test_warm_uses_new_values(self):
+        locator = PageLocator(self.extractor)
+        self.check(locator, [["Intro"], ["Net interest income 3,000 2,500"], ["Segment Assets", "1,000,000",
+                                                                              "Segment Liabilities"]])
+        dual, single = self.check(locator, [["Intro"], ["Net interest income 4,000 3,000"],
+                                            ["Segment Assets", "2,000,000", "Segment Liabilities"]])
+        self.assertEqual(single["Total Assets"], 2000000.0)
+
+    def test_warm_falls_back_when_match_moves_page(self):
+        locator = PageLocator(self.extractor)
+        self.check(locator, [["Intro"], ["Net interest income 3,000 2,500"], ["Notes"], ["Notes"]])
+        # Same layout, but the leftmost match now starts on the next (cached) page.
+        dual, _ = self.check(locator, [["Intro"], ["Net interest income (see note 4)"],
+                                       ["Net interest income 1,000 900"], ["Notes"]])
+        self.assertEqual(dual["Net Interest Income"]["current"], 1000.0)
+        (pages, starts, _), = locator._layouts.values()
+        self.assertEqual(starts, {("dual", "Net Interest Income"): 2})  # relearned cold
+
+    def test_warm_rejects_match_across_skipped_pages(self):
+        locator = PageLocator(self.extractor)
+        learned = [["Segment Assets", "1,000,000", "Segment Liabilities"], ["Notes"], ["Notes"], ["Notes"]]
+        self.check(locator, learned)
+        # The number moved two pages on: only a full read finds it.
+        _, single = self.check(locator, [["Segment Assets"], ["Notes"], ["Notes"],
+                                         ["5,000,000", "Segment Liabilities"]])
+        self.assertEqual(single["Total Assets"], 5000000.0)
+
+    def test_label_unresolved_when_learned_is_looked_for_everywhere(self):
+        locator = PageLocator(self.extractor)
+        self.check(locator, [["Net interest income 3,000 2,500"], ["Notes"], ["Notes"]])
+        # Same layout; Total Assets now exists, on a page the layout never cached.
+        _, single = self.check(locator, [["Net interest income 4,000 3,000"], ["Notes"],
+                                         ["Segment Assets", "7,000,000", "Segment Liabilities"]])
+        self.assertEqual(single["Total Assets"], 7000000.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+# test_parse_cache.py
+# Parse cache keys must change with anything that shapes the cached payload.
+#
+#   python -m unittest discover tests   (or pytest tests)
+import os, sys, copy, shutil, tempfile, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "enbd"))
+sys.path.insert(0, ROOT)
+
+from parse_cache import ParseCache
+from ratio_engine import RatioEngine, RATIO_SPEC
+from common.prompt_context import context_fingerprint
+
+DIGEST = "ab" * 32
+
+
+class ParseCacheKeyTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def key(self, *fingerprints):
+        return ParseCache(self.root, 1 << 20, *fingerprints).key_for_digest(DIGEST)
+
+    def test_every_part_changes_the_key(self):
+        spec = copy.deepcopy(RATIO_SPEC)
+        spec[0]["thresholds"][0]["value"] = 0.55
+        base = ("extractor", RatioEngine().fingerprint, context_fingerprint(), "1")
+        keys = {self.key(*base),
+                self.key("extractor2", *base[1:]),
+                self.key(base[0], RatioEngine(spec).fingerprint, *base[2:]),
+                self.key(*base[:2], "context-2-1024", base[3]),
+                self.key(*base[:3], "2")}
+        self.assertEqual(len(keys), 5)
+        self.assertEqual(self.key(*base), self.key(*base))
+
+    def test_round_trip(self):
+        cache = ParseCache(self.root, 1 << 20, "extractor", RatioEngine().fingerprint, "1")
+        key = cache.key_for(b"%PDF-1.7 ...")
+        self.assertTrue(cache.valid_key(key))
+        self.assertIsNone(cache.get(key))
+        cache.put(key, {"ratios": [["NPL Ratio", 0.03]]})
+        self.assertEqual(cache.get(key), {"ratios": [["NPL Ratio", 0.03]]})
+
+
+if __name__ == "__main__":
+    unittest.main()
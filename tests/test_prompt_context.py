@@ -0,0 +1,133 @@
+# test_prompt_context.py
+# Token-budgeted contexts: trimming, section order, pinned sections, and the
+# offline token estimate.
+#
+#   python -m unittest discover tests   (or pytest tests)
+import os, sys, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from common import prompt_context
+from common.prompt_context import ContextBuilder, count_tokens, counter_name, estimate_tokens
+
+MODEL = "gpt-4o-mini"
+OFFLINE = "offline-test"  # a model whose encoding could not be loaded
+
+# Lines like the ones the apps put in their contexts.
+SAMPLE = [
+    "Summary of parsed financial statements (AED):",
+    "Net Interest Income: 16720 (prev 15000, +11.5%)",
+    "Total Assets: 1078512.4 | Total Liabilities: 941209.7",
+    "Cost to Income Ratio: 0.28 -> Efficient cost structure.",
+    "Recovery_score_: mean 58.4, min 1, max 99, std 21.7",
+    "Heart_rate_variability_(ms): mean 45.2, min 20, max 80",
+    "Baseline HRV (ms): latest 45 | 7d 50.1 | 30d 56.3 | 90d 55.0 | vs 30d -20.1%",
+    "Recovery distribution: Low 173, Medium 98, High 55",
+    "Sleep debt percentiles: p10 12, p25 30, p50 55, p75 88, p90 131",
+    "2025-09-14 22:31:05: recovery 34, strain 15.2, sleep debt 141 min",
+]
+
+
+def lines(tag, n):
+    return [f"{tag} line {i}: value {i * 37.5} units" for i in range(n)]
+
+
+class OfflineMixin:
+    def setUp(self):
+        saved = dict(prompt_context._encodings)
+        self.addCleanup(lambda: (prompt_context._encodings.clear(), prompt_context._encodings.update(saved)))
+        prompt_context._encodings[OFFLINE] = None
+
+
+class ContextBuilderTest(OfflineMixin, unittest.TestCase):
+    def build(self, budget, *sections):
+        ctx = ContextBuilder(OFFLINE, budget=budget)
+        for section in sections:
+            ctx.add(*section[:2], **section[2] if len(section) > 2 else {})
+        return ctx, ctx.build()
+
+    def test_everything_fits(self):
+        ctx, text = self.build(10_000, (lines("a", 3), 0), (lines("b", 3), 1))
+        self.assertEqual(text, "\n".join(lines("a", 3) + lines("b", 3)))
+        self.assertEqual((ctx.dropped, ctx.tokens), (0, count_tokens(text, OFFLINE)))
+
+    def test_trimmed_to_budget_lowest_priority_first(self):
+        for budget in (40, 80, 120, 200, 300):
+            ctx, text = self.build(budget, (lines("low", 20), 2), (lines("pinned", 3), 0), (lines("mid", 20), 1))
+            self.assertLessEqual(count_tokens(text, OFFLINE), budget)
+            self.assertEqual(ctx.tokens, count_tokens(text, OFFLINE))
+            kept = text.split("\n")
+            self.assertEqual(ctx.dropped, 43 - len(kept))
+            self.assertTrue(set(lines("pinned", 3)) <= set(kept), budget)
+            if any(line.startswith("low") for line in kept):
+                self.assertTrue(set(lines("mid", 20)) <= set(kept), budget)
+
+    def test_pinned_section_kept_when_nothing_else_fits(self):
+        pinned = lines("pinned", 2)
+        budget = count_tokens("\n".join(pinned), OFFLINE) + 2
+        ctx, text = self.build(budget, (lines("other", 5), 1), (pinned, 0))
+        self.assertEqual(text, "\n".join(pinned))
+        self.assertEqual(ctx.dropped, 5)
+
+    def test_sections_keep_the_order_they_were_added(self):
+        _, text = self.build(10_000, (["second priority"], 1), (["first priority"], 0), (["third"], 2))
+        self.assertEqual(text.split("\n"), ["second priority", "first priority", "third"])
+
+    def test_section_is_a_prefix(self):
+        # A line that does not fit ends its section; shorter later lines are not packed in.
+        long_line = "x " * 200
+        _, text = self.build(60, (["short one", long_line, "short two"], 0), (["next section"], 1))
+        self.assertEqual(text.split("\n"), ["short one", "next section"])
+
+    def test_title_only_with_its_lines(self):
+        _, text = self.build(10_000, (["a"], 0, {"title": "Section A:"}), ([], 0, {"title": "Empty:"}))
+        self.assertEqual(text, "Section A:\na")
+        pinned = lines("pinned", 1)
+        budget = count_tokens(pinned[0] + "\n", OFFLINE)
+        _, text = self.build(budget, (pinned, 0), (lines("b", 3), 1, {"title": "Section B:"}))
+        self.assertEqual(text, pinned[0])
+
+
+class OfflineEstimateTest(OfflineMixin, unittest.TestCase):
+    def test_falls_back_to_the_estimate(self):
+        self.assertEqual(counter_name(OFFLINE), "estimate")
+        for line in SAMPLE:
+            self.assertEqual(count_tokens(line, OFFLINE), estimate_tokens(line))
+
+    def test_estimate_counts_every_piece(self):
+        # Every word, digit group of up to 3 and punctuation mark is at least one token.
+        # "Net" | " Income" (2 pieces of <= 4) | ":" | " 167" | "20"
+        self.assertEqual(estimate_tokens("Net Income: 16720"), 6)
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertGreaterEqual(estimate_tokens("Heart_rate_variability_(ms)"), 8)
+
+
+def _tiktoken_encoding():
+    if prompt_context.tiktoken is None:
+        return None
+    try:
+        return prompt_context.tiktoken.encoding_for_model(MODEL)
+    except Exception:
+        return None
+
+
+ENCODING = _tiktoken_encoding()
+
+
+@unittest.skipUnless(ENCODING, "tiktoken or its BPE files are not available")
+class EstimateAgainstTiktokenTest(unittest.TestCase):
+    def test_estimate_does_not_undercount(self):
+        for line in SAMPLE:
+            self.assertGreaterEqual(estimate_tokens(line), len(ENCODING.encode(line)), line)
+        text = "\n".join(SAMPLE)
+        self.assertGreaterEqual(estimate_tokens(text), len(ENCODING.encode(text)))
+
+    def test_budget_holds_with_tiktoken(self):
+        ctx = ContextBuilder(MODEL, budget=60).add(SAMPLE[:4], 0).add(SAMPLE[4:], 1)
+        text = ctx.build()
+        self.assertLessEqual(len(ENCODING.encode(text)), 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
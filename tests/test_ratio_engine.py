@@ -0,0 +1,32 @@
+# test_ratio_engine.py
+# Ratios of a single upload: only a zero or missing denominator gives None.
+#
+#   python -m unittest discover tests   (or pytest tests)
+import os, sys, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "enbd"))
+
+from ratio_engine import engine
+
+EPS = "Earnings Per Share (AED)"
+
+
+def eps_change(current, prior):
+    return dict(engine.ratio_pairs({EPS: {"current": current, "prior": prior}}, {}))["EPS YoY"]
+
+
+class EpsChangeTest(unittest.TestCase):
+    def test_current_zero_is_a_full_drop(self):
+        self.assertEqual(eps_change(0.0, 0.5), -1.0)
+
+    def test_prior_zero_is_missing(self):
+        self.assertIsNone(eps_change(0.5, 0.0))
+        self.assertIsNone(eps_change(0.5, None))
+
+    def test_change(self):
+        self.assertEqual(eps_change(0.6, 0.5), 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+# test_statement_extractor.py
+# StatementExtractor must return what re.search(pattern, text, IGNORECASE) does.
+#
+#   python -m unittest discover tests   (or pytest tests)
+import os, re, sys, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "enbd"))
+
+from statement_extractor import StatementExtractor
+
+PATTERNS_DUAL = {
+    "Fee Income": r"Fee and commission income\s+([\d,]+)\s+([\d,]+)",
+    "Net Fee Income": r"Net fee and commission income\s+([\d,]+)\s+([\d,]+)",
+    "Profit": r"Profit for the period\s+([\d,]+)\s+([\d,]+)",
+    "Profit Before Tax": r"Profit for the period before taxation\s+([\d,]+)\s+([\d,]+)",
+    "Other Operating Income": r"Other operating income.*?\s+([\d,]+)\s+([\d,]+)",
+}
+PATTERNS_SINGLE = {
+    "Total Assets": r"Segment Assets[\s\S]*?(\d{1,3}(?:,\d{3})+)\s*\n\s*Segment Liabilities",
+}
+
+
+def reference(text):
+    out = {}
+    for kind, patterns in (("dual", PATTERNS_DUAL), ("single", PATTERNS_SINGLE)):
+        for label, pat in patterns.items():
+            m = re.search(pat, text, re.IGNORECASE)
+            if m:
+                out[(kind, label)] = m.span()
+    return out
+
+
+class StatementExtractorTest(unittest.TestCase):
+    def setUp(self):
+        self.extractor = StatementExtractor(PATTERNS_DUAL, PATTERNS_SINGLE)
+
+    def check(self, text):
+        found = {k: m.span() for k, m in self.extractor.find(text).items()}
+        self.assertEqual(found, reference(text))
+        return found
+
+    def test_overlapping_and_mid_line_labels(self):
+        found = self.check("Net fee and commission income 1,200 1,100\n"
+                           "Profit for the period before taxation 900 800\n"
+                           "Profit for the period 700 600\n"
+                           "13    OTHER OPERATING INCOME ....... 50 40\n")
+        # "Fee and commission income" matches inside the "Net fee ..." line.
+        self.assertEqual(found[("dual", "Fee Income")][0], 4)
+
+    def test_gap_pattern_takes_leftmost_occurrence(self):
+        self.check("Segment Assets\nnotes\nSegment Assets 5\n1,234,567\nSegment Liabilities\n")
+
+    def test_gap_pattern_without_closing_label(self):
+        found = self.check("Segment Assets 1,234\n" * 50 + "Segment totals 9,999\n")
+        self.assertNotIn(("single", "Total Assets"), found)
+
+    def test_unmatched_first_occurrence(self):
+        self.check("Fee and commission income see note 4\nFee and commission income 300 200\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,262 @@
+# baselines.py
+# Rolling 7/30/90-day baselines for HRV, resting HR and sleep debt.
+#
+# The newest cycle is compared with the earlier cycles that started within the
+# N calendar days before it ("HRV 20% below 30-day mean"). Each window keeps a running sum and count
+# plus monotonic deques for min/max, so adding a day costs O(1) amortized and
+# nothing is recomputed over the whole history. The newest cycle stays outside
+# the windows: WHOOP rewrites it until it closes, and it is committed when a
+# newer one arrives.
+#
+# BaselineTracker follows a history.HistoryStore between requests. New cycles
+# are appended, and the windows are rebuilt only when the store reports an
+# edit to older history. Without a store the windows are built from the
+# uploaded frame on each call. OwnerBaselines keeps one tracker per history
+# owner (history.History), so each athlete's windows only ever see that
+# athlete's cycles. RecentCycles keeps only the last 90 days of a streamed
+# export, which is all the windows need.
+import threading
+from collections import deque, OrderedDict
+import numpy as np
+import pandas as pd
+
+WINDOWS = (7, 30, 90)
+METRICS = {
+    "Heart_rate_variability_(ms)": "HRV (ms)",
+    "Resting_heart_rate_(bpm)": "Rest HR (bpm)",
+    "Sleep_debt_(min)": "Sleep Debt (min)",
+}
+BASELINE_COLUMNS = ["Cycle_start_time"] + list(METRICS)
+DEVIATION_WINDOW = 30  # the "vs baseline" column and context line
+
+
+class RollingWindow:
+    """Sum, count, min and max of the values pushed for days ``>= day - days``."""
+
+    def __init__(self, days):
+        self.days = days
+        self.total, self.count = 0.0, 0
+        self._items = deque()  # (day, value), oldest first
+        self._min = deque()    # (day, value), values increasing
+        self._max = deque()    # (day, value), values decreasing
+
+    def advance(self, day):
+        """Drop values from before ``day - days``."""
+        cutoff = day - self.days
+        while self._items and self._items[0][0] < cutoff:
+            self.total -= self._items.popleft()[1]
+            self.count -= 1
+        for dq in (self._min, self._max):
+            while dq and dq[0][0] < cutoff:
+                dq.popleft()
+
+    def push(self, day, value):
+        self.advance(day)
+        if value != value:  # NaN: no reading that day
+            return
+        self._items.append((day, value))
+        self.total += value
+        self.count += 1
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((day, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((day, value))
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def low(self):
+        return self._min[0][1] if self._min else None
+
+    def high(self):
+        return self._max[0][1] if self._max else None
+
+
+class BaselineEngine:
+    """Rolling windows per metric, fed cycles in start-time order."""
+
+    def __init__(self, metrics=METRICS, windows=WINDOWS):
+        self.metrics, self.windows = dict(metrics), tuple(windows)
+        self._windows = {m: [RollingWindow(n) for n in self.windows] for m in self.metrics}
+        self.tail = None  # (start, {metric: value}) of the newest cycle, not yet in the windows
+
+    def append(self, start, values):
+        """Add a cycle; ``start`` equal to the newest one's replaces it."""
+        if self.tail is not None and start < self.tail[0]:
+            raise ValueError("cycles must be appended in start-time order")
+        if self.tail is not None and start > self.tail[0]:
+            day = _day(self.tail[0])
+            for m, wins in self._windows.items():
+                for w in wins:
+                    w.push(day, self.tail[1][m])
+        self.tail = (start, values)
+
+    def feed(self, df):
+        """Append the rows of ``df`` from the current newest cycle on. An
+        empty engine takes any order; later calls expect the store's
+        newest-first frame, where those rows are a prefix."""
+        starts = df["Cycle_start_time"].to_numpy("datetime64[s]")
+        if self.tail is None:
+            order = np.argsort(starts, kind="stable")
+            order = order[~np.isnat(starts[order])]
+        else:
+            n = len(starts) - np.searchsorted(starts[::-1], self.tail[0], side="left")
+            order = np.arange(n - 1, -1, -1)
+        cols = {m: df[m].to_numpy("float64", na_value=np.nan) if m in df.columns else np.full(len(df), np.nan)
+                for m in self.metrics}
+        for i in order:
+            self.append(starts[i], {m: float(cols[m][i]) for m in self.metrics})
+
+    def snapshot(self):
+        """{metric: {"label", "latest", "windows": {days: {"mean", "min", "max", "days", "delta_pct"}}}}."""
+        if self.tail is None:
+            return {}
+        day = _day(self.tail[0])
+        out = {}
+        for m, wins in self._windows.items():
+            latest = self.tail[1][m]
+            latest = None if latest != latest else latest
+            rows = {}
+            for w in wins:
+                w.advance(day)  # later cycles are never older than the tail, so this is final
+                mean = w.mean()
+                delta = (latest - mean) / mean * 100 if latest is not None and mean else None
+                rows[w.days] = {"mean": _round(mean), "min": _round(w.low()), "max": _round(w.high()),
+                                "days": w.count, "delta_pct": _round(delta)}
+            out[m] = {"label": self.metrics[m], "latest": _round(latest), "windows": rows}
+        return out
+
+
+def _day(start):
+    return int(np.datetime64(start, "D").astype("int64"))
+
+
+def _round(x):
+    return None if x is None else round(float(x), 1)
+
+
+class BaselineTracker:
+    """Snapshots of an engine kept in step with ``store`` (a HistoryStore, or None)."""
+
+    def __init__(self, store=None, metrics=METRICS, windows=WINDOWS):
+        self.store, self.metrics, self.windows = store, metrics, windows
+        self._lock = threading.Lock()
+        self._engine, self._built, self._generation = None, None, None
+        self.counts = {"appends": 0, "rebuilds": 0}
+
+    def snapshot(self, df=None):
+        """Baselines for the store's history, or for ``df`` when there is no store."""
+        if self.store is None:
+            engine = BaselineEngine(self.metrics, self.windows)
+            engine.feed(df)
+            return engine.snapshot()
+        with self._lock:
+            df, generation, edited = self.store.view(BASELINE_COLUMNS)
+            if self._engine is None or edited > self._built:
+                self._engine, self._built = BaselineEngine(self.metrics, self.windows), generation
+                self._generation = None
+                self.counts["rebuilds"] += 1
+            if generation != self._generation:
+                self._engine.feed(df)
+                self._generation = generation
+                self.counts["appends"] += 1
+            return self._engine.snapshot()
+
+
+class OwnerBaselines:
+    """BaselineTrackers per history owner, least recently used dropped first."""
+
+    def __init__(self, max_owners=64, metrics=METRICS, windows=WINDOWS):
+        self.max_owners, self.metrics, self.windows = max_owners, metrics, windows
+        self._lock = threading.Lock()
+        self._trackers = OrderedDict()  # owner -> BaselineTracker
+
+    def tracker(self, owner, store):
+        """The owner's tracker, following ``store`` (that owner's HistoryStore)."""
+        with self._lock:
+            tracker = self._trackers.get(owner)
+            if tracker is None or tracker.store is not store:
+                # New owner, or its store was reopened: the engine starts over.
+                tracker = self._trackers[owner] = BaselineTracker(store, self.metrics, self.windows)
+                while len(self._trackers) > self.max_owners:
+                    self._trackers.popitem(last=False)
+            self._trackers.move_to_end(owner)
+            return tracker
+
+    def drop(self, owner):
+        with self._lock:
+            self._trackers.pop(owner, None)
+
+    def stats(self):
+        with self._lock:
+            trackers = list(self._trackers.values())
+        return {"owners": len(trackers),
+                "appends": sum(t.counts["appends"] for t in trackers),
+                "rebuilds": sum(t.counts["rebuilds"] for t in trackers)}
+
+
+class RecentCycles:
+    """The cycles within the longest window of the newest one, collected from
+    chunks of a streamed export (stats_stream.summarize_csv) in any order."""
+
+    def __init__(self, metrics=METRICS, windows=WINDOWS):
+        self.metrics, self.windows = metrics, windows
+        self.columns = ["Cycle_start_time"] + list(metrics)
+        self.clear()
+
+    def clear(self):
+        self.frame = None
+
+    def update(self, chunk):
+        if "Cycle_start_time" not in chunk.columns:
+            return
+        part = chunk[[c for c in self.columns if c in chunk.columns]]
+        df = part if self.frame is None else pd.concat([self.frame, part], ignore_index=True)
+        starts = df["Cycle_start_time"].to_numpy("datetime64[s]")
+        if np.isnat(starts).all():
+            self.frame = df.iloc[:0]
+            return
+        # Windows hold days >= newest day - N; older cycles can never count.
+        cutoff = np.datetime64(starts[~np.isnat(starts)].max(), "D") - np.timedelta64(max(self.windows), "D")
+        self.frame = df[starts >= cutoff]
+
+    def snapshot(self):
+        if self.frame is None:
+            return {}
+        engine = BaselineEngine(self.metrics, self.windows)
+        engine.feed(self.frame)
+        return engine.snapshot()
+
+
+def baseline_rows(snapshot):
+    """Display rows for the dashboards' baseline table."""
+    rows = []
+    for b in snapshot.values():
+        dev = b["windows"].get(DEVIATION_WINDOW, {}).get("delta_pct")
+        rows.append({
+            "label": b["label"],
+            "latest": _fmt(b["latest"]),
+            "windows": [f"{_fmt(w['mean'])} ({_fmt(w['min'])}–{_fmt(w['max'])}, n={w['days']})"
+                        for w in b["windows"].values()],
+            "deviation": "–" if dev is None else f"{dev:+.1f}%",
+        })
+    return rows
+
+
+def baseline_lines(snapshot):
+    """Context lines for the coach prompt, e.g.
+    ``HRV (ms): latest 45 | 7d 50.1 | 30d 56.3 | 90d 55.0 | vs 30d -20.1%``."""
+    lines = []
+    for b in snapshot.values():
+        parts = [f"latest {_fmt(b['latest'])}"] + [f"{n}d {_fmt(w['mean'])}" for n, w in b["windows"].items()]
+        dev = b["windows"].get(DEVIATION_WINDOW, {}).get("delta_pct")
+        if dev is not None:
+            parts.append(f"vs {DEVIATION_WINDOW}d {dev:+.1f}%")
+        lines.append(f"Baseline {b['label']}: " + " | ".join(parts))
+    return lines
+
+
+def _fmt(x):
+    return "–" if x is None else f"{x:g}"
@@ -0,0 +1,136 @@
+# charts.py
+# Chart rendering for the WHOOP dashboards.
+#
+# Figures are built with matplotlib's object-oriented API on the Agg canvas
+# (no pyplot global state, so request threads can render concurrently) and the
+# base64 PNGs are cached by a hash of the chart kind, data and parameters.
+#
+# Config (env): CHART_CACHE_MB (default 32, 0 disables the cache),
+# CHART_PROCESSES (default 0 = render in the calling thread; N > 0 renders a
+# page's missing charts in parallel on an N-process pool).
+import os, io, json, base64, hashlib, threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+CACHE_MAX_BYTES = int(float(os.environ.get("CHART_CACHE_MB", "32")) * 1024 * 1024)
+PROCESSES = int(os.environ.get("CHART_PROCESSES", "0"))
+# Bump when the drawing code changes so cached PNGs are not reused.
+STYLE_VERSION = "1"
+
+
+# ---------- Specs (plain, hashable, picklable) ----------
+def bar_spec(averages, colors=None, title="Average Key Metrics", ylabel="Average Value"):
+    return ("bar", {"labels": [str(k) for k in averages], "values": [float(v) for v in averages.values()],
+                    "colors": list(colors) if colors else None, "title": title, "ylabel": ylabel,
+                    "figsize": [7, 3]})
+
+
+def pie_spec(labels, sizes, title, colors=None, size=4):
+    return ("pie", {"labels": list(labels), "sizes": [float(s) for s in sizes],
+                    "colors": list(colors) if colors else None, "title": title, "figsize": [size, size]})
+
+
+def spec_key(spec):
+    raw = json.dumps([STYLE_VERSION, matplotlib.__version__, spec[0], spec[1]], sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ---------- Rendering ----------
+def render_png(spec):
+    kind, p = spec
+    fig = Figure(figsize=p["figsize"])
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    if kind == "bar":
+        ax.bar(p["labels"], p["values"], color=p["colors"])
+        ax.set_ylabel(p["ylabel"])
+        ax.tick_params(axis="x", labelrotation=20)
+    elif kind == "pie":
+        ax.pie(p["sizes"], labels=p["labels"], autopct='%1.1f%%', colors=p["colors"], startangle=90)
+    else:
+        raise ValueError(f"Unknown chart kind: {kind!r}")
+    ax.set_title(p["title"])
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches='tight')
+    return buf.getvalue()
+
+
+def _render_b64(spec):
+    return base64.b64encode(render_png(spec)).decode("ascii")
+
+
+class ChartCache:
+    """LRU of base64 PNGs by spec_key, bounded by total string size."""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.counts = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            img = self._entries.get(key)
+            if img is None:
+                self.counts["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counts["hits"] += 1
+            return img
+
+    def put(self, key, img):
+        if len(img) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            self._bytes += len(img) - (len(old) if old else 0)
+            self._entries[key] = img
+            while self._bytes > self.max_bytes:
+                _, dropped = self._entries.popitem(last=False)
+                self._bytes -= len(dropped)
+                self.counts["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, entries=len(self._entries), bytes=self._bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+cache = ChartCache()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(processes):
+    # One pool per process, sized by the first caller.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=processes)
+        return _pool
+
+
+def render_charts(specs, processes=None):
+    """Base64 PNGs for ``specs`` (same order). Cache misses are rendered in the
+    process pool when ``processes`` (default CHART_PROCESSES) > 0 and more than
+    one chart is missing, else in this thread."""
+    processes = PROCESSES if processes is None else processes
+    keys = [spec_key(s) for s in specs]
+    images = [cache.get(k) for k in keys]
+    missing = [i for i, img in enumerate(images) if img is None]
+    if processes > 0 and len(missing) > 1:
+        rendered = list(_get_pool(processes).map(_render_b64, [specs[i] for i in missing]))
+    else:
+        rendered = [_render_b64(specs[i]) for i in missing]
+    for i, img in zip(missing, rendered):
+        images[i] = img
+        cache.put(keys[i], img)
+    return images
@@ -0,0 +1,229 @@
+# cohort.py
+# Cohort mode: many athletes' WHOOP exports compared side by side.
+#
+# The app's cohort is a CohortStore: each athlete's export is an upload in the
+# app's upload_store.UploadStore (one reference per athlete, so blobs are
+# deduplicated and count against its quota), and the athlete's label is kept
+# next to it in <WHOOP_COHORT_DIR>/members.json. Two athletes whose files have
+# the same name are two members, shown as "name" and "name (2)". Past
+# WHOOP_COHORT_MAX_USERS the oldest member is released. cohort_files() reads
+# a plain directory instead: every *.csv is one user, named after the file.
+#
+# The exports are read and summarized in a process pool, one task per file, with the regular
+# single-user path (read_whoop_csv + stats_kernel.summarize). Workers send back
+# their describe() figures and the typed frame. The parent tags the rows by
+# user and computes the comparisons over the combined frame with groupby, with
+# no Python loop over rows:
+#   - recovery distribution over stats_kernel.BUCKETS (Low/Medium/High)
+#   - sleep debt percentiles
+#   - low-recovery streaks: the longest and the current run of consecutive
+#     scored cycles with recovery < 50 (unscored cycles are skipped)
+# The cohort row runs the same summary over all users' cycles together.
+#
+# Config (env): WHOOP_COHORT_DIR (default uploads/cohort),
+#               WHOOP_COHORT_MAX_USERS (default 500),
+#               WHOOP_COHORT_WORKERS (default: CPU count; 1 reads in-process)
+import os, json, threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from ingest import read_whoop_csv
+from stats_kernel import summarize, BUCKETS
+
+COHORT_DIR = os.environ.get("WHOOP_COHORT_DIR", os.path.join("uploads", "cohort"))
+MAX_USERS = int(os.environ.get("WHOOP_COHORT_MAX_USERS", "500"))
+WORKERS = int(os.environ.get("WHOOP_COHORT_WORKERS", "0")) or os.cpu_count() or 1
+
+METRICS = ["Recovery_score_", "Resting_heart_rate_(bpm)", "Heart_rate_variability_(ms)", "Sleep_performance_",
+           "Sleep_debt_(min)"]
+COLUMNS = ["Cycle_start_time"] + METRICS
+REQUIRED = ["Cycle_start_time", "Recovery_score_"]
+PERCENTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+LOW_RECOVERY = 50
+
+
+# ---------- Loading ----------
+def cohort_files(directory):
+    """{user: path} for the exports in ``directory``, sorted by user."""
+    if not os.path.isdir(directory):
+        return {}
+    names = sorted(n for n in os.listdir(directory) if n.lower().endswith(".csv"))
+    return {n[:-4]: os.path.join(directory, n) for n in names}
+
+
+class CohortStore:
+    """Cohort members: an athlete label plus that athlete's upload in ``uploads``."""
+
+    def __init__(self, uploads, root=COHORT_DIR, max_users=MAX_USERS):
+        self.uploads, self.max_users = uploads, max_users
+        self.manifest_path = os.path.join(root, "members.json")
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return []
+
+    def _save(self, members):
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(members, fh, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    def add(self, label, stream):
+        """Store one athlete's export as a new member; returns its digest."""
+        holder = self.uploads.new_holder()
+        digest = self.uploads.put(stream, holder)
+        with self._lock:
+            members = self._load()
+            members.append({"id": holder, "label": label, "digest": digest})
+            for old in members[:-self.max_users]:
+                self.uploads.release(old["id"])
+            self._save(members[-self.max_users:])
+        return digest
+
+    def files(self):
+        """{user: path} in the order added; members whose upload expired are skipped."""
+        out, seen = {}, {}
+        for m in self._load():
+            path = self.uploads.path(m["digest"], m["id"])
+            if path is None:
+                continue
+            seen[m["label"]] = n = seen.get(m["label"], 0) + 1
+            out[m["label"] if n == 1 else f"{m['label']} ({n})"] = path
+        return out
+
+
+def _load_user(path):
+    # One pool task: the single-user read + summary. Errors come back as text
+    # so one bad export does not sink the cohort.
+    try:
+        df = read_whoop_csv(path, columns=COLUMNS)
+        missing = [c for c in REQUIRED if c not in df.columns]
+        if missing:
+            raise ValueError(f"not a WHOOP export, missing {', '.join(missing)}")
+        st = summarize(df, METRICS)
+        return df, {c: st.describe(c) for c in st.columns}, None
+    except Exception as e:
+        return None, None, str(e)
+
+
+def load_cohort(files, workers=None):
+    """(frame tagged with a categorical ``user`` column, {user: describe}, {user: error})."""
+    workers = min(workers or WORKERS, len(files))
+    paths = list(files.values())
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_load_user, paths))
+    else:
+        results = [_load_user(p) for p in paths]
+    frames, described, errors = [], {}, {}
+    for user, (df, stats, error) in zip(files, results):
+        if error:
+            errors[user] = error
+            continue
+        frames.append(df)
+        described[user] = stats
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    codes = np.repeat(np.arange(len(frames)), [len(df) for df in frames])
+    frame["user"] = pd.Categorical.from_codes(codes, list(described))
+    return frame, described, errors
+
+
+# ---------- Group statistics ----------
+def recovery_distribution(df):
+    """Cycles per user in each recovery bucket (rows: users, columns: Low/Medium/High)."""
+    edges, labels = BUCKETS["Recovery_score_"]
+    scored = df[df["Recovery_score_"].notna()]
+    bucket = pd.Categorical.from_codes(np.digitize(scored["Recovery_score_"], edges), labels)
+    return scored.groupby(["user", bucket], observed=False).size().unstack(fill_value=0)
+
+
+def sleep_debt_percentiles(df):
+    """Sleep debt percentiles per user (linear, like describe())."""
+    if "Sleep_debt_(min)" not in df.columns:
+        return pd.DataFrame(index=df["user"].cat.categories, columns=list(PERCENTILES), dtype="float64")
+    debt = df["Sleep_debt_(min)"].astype("float64")
+    return debt.groupby(df["user"], observed=False).quantile(list(PERCENTILES)).unstack()
+
+
+def low_recovery_streaks(df, threshold=LOW_RECOVERY):
+    """Longest and current run of consecutive scored cycles below ``threshold`` per user."""
+    scored = df[df["Recovery_score_"].notna()].sort_values(["user", "Cycle_start_time"], kind="stable")
+    user = scored["user"].cat.codes.to_numpy()
+    low = (scored["Recovery_score_"] < threshold).to_numpy()
+    # A run starts at a low cycle whose predecessor is not a low cycle of the same user.
+    continues = np.zeros(len(low), dtype=bool)
+    continues[1:] = low[:-1] & (user[1:] == user[:-1])
+    start = low & ~continues
+    run = np.cumsum(start)
+    length = np.bincount(run, weights=low).astype(np.int64)  # run id -> cycles in it
+    users = scored["user"].cat.categories
+    longest = pd.Series(length[run[start]]).groupby(user[start]).max()
+    last = np.flatnonzero(np.r_[user[1:] != user[:-1], True]) if len(user) else np.array([], dtype=np.intp)
+    current = pd.Series(np.where(low[last], length[run[last]], 0), index=user[last])
+    return pd.DataFrame({
+        "longest": longest.reindex(range(len(users)), fill_value=0).to_numpy(),
+        "current": current.reindex(range(len(users)), fill_value=0).to_numpy(),
+    }, index=users)
+
+
+# ---------- Report ----------
+def cohort_report(files, workers=None):
+    """JSON-ready comparison of every user in ``files`` ({user: path}) plus the cohort as a whole."""
+    frame, described, errors = load_cohort(files, workers)
+    dist = recovery_distribution(frame) if len(frame) else None
+    debt = sleep_debt_percentiles(frame) if len(frame) else None
+    streaks = low_recovery_streaks(frame) if len(frame) else None
+    days = frame.groupby("user", observed=False).size()
+    users = []
+    for user, stats in described.items():
+        users.append(_row(user, days[user], stats, dist.loc[user], debt.loc[user], streaks.loc[user]))
+    cohort = None
+    if users:
+        st = summarize(frame, METRICS)
+        everyone = frame.assign(user=pd.Categorical(["cohort"] * len(frame)))
+        cohort = _row("cohort", st.rows, {c: st.describe(c) for c in st.columns},
+                      recovery_distribution(everyone).loc["cohort"], sleep_debt_percentiles(everyone).loc["cohort"],
+                      streaks.max())
+        cohort.update(users=len(users), in_low_streak=int((streaks["current"] > 0).sum()))
+    return {"users": users, "cohort": cohort, "errors": errors}
+
+
+def _row(user, days, stats, dist, debt, streaks):
+    recovery = {label: int(dist.get(label, 0)) for label in BUCKETS["Recovery_score_"][1]}
+    scored = sum(recovery.values())
+    return {
+        "user": user,
+        "days": int(days),
+        "means": {c: _num(s["mean"]) for c, s in stats.items()},
+        "recovery_dist": recovery,
+        "low_recovery_pct": _num(recovery["Low"] / scored * 100 if scored else None),
+        "sleep_debt_pct": {f"p{round(q * 100)}": _num(debt.get(q)) for q in PERCENTILES},
+        "low_streak": {"longest": int(streaks["longest"]), "current": int(streaks["current"])},
+    }
+
+
+def _num(x):
+    # JSON has no NaN; round like the dashboards.
+    return None if x is None or x != x else round(float(x), 2)
+
+
+_lock = threading.Lock()
+_report = (None, None)  # (signature, report) of the last cohort
+
+
+def cached_report(files):
+    """cohort_report() memoized on the (user, path, mtime, size) of every export."""
+    global _report
+    signature = tuple((u, p, os.stat(p).st_mtime_ns, os.stat(p).st_size) for u, p in files.items())
+    with _lock:
+        if _report[0] == signature:
+            return _report[1]
+    report = cohort_report(files)
+    with _lock:
+        _report = (signature, report)
+    return report
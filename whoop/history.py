@@ -0,0 +1,299 @@
+# history.py
+# Local, deduplicated history of WHOOP cycles across uploads, one per owner.
+#
+# Each upload is merged into its owner's store instead of being analyzed on
+# its own. The owner is an opaque id chosen by the app (the v3 app uses the
+# session's upload holder), and every owner gets a partition of its own, so
+# rows are keyed by owner + (Cycle_start_time, Cycle_timezone) and one
+# athlete's upload never reads or replaces another's cycles. Within a
+# partition a re-exported cycle with different values replaces the stored one
+# (the open cycle at the top of every export changes until it ends). Storage
+# is one Parquet file per calendar month of Cycle_start_time:
+#
+#   <WHOOP_HISTORY_DIR>/<owner>/2025-09.parquet ...
+#   <WHOOP_HISTORY_DIR>/<owner>/manifest.json   per month: row count + content digest
+#
+# The manifest also records the newest cycle and the last generation that
+# changed anything older than it ("edited"). Appending days or rewriting the
+# open cycle is not an edit, so derived state such as baselines.py can follow
+# the store incrementally and rebuild only after real edits.
+#
+# The digest is an XOR of per-row content hashes, so the months an upload
+# covers are compared against the manifest in memory. Months that match are
+# never read or written, so re-uploading a grown 5-year export rewrites the
+# current month and adds the new ones. The upload itself is still parsed once.
+#
+# An owner's partition is deleted by History.drop() (the v3 app's /clear), or
+# once it has not been written for WHOOP_HISTORY_TTL_DAYS.
+#
+# Config (env): WHOOP_HISTORY = 1 (default) | 0,
+#               WHOOP_HISTORY_DIR (default cache/whoop_history),
+#               WHOOP_HISTORY_TTL_DAYS (default 31, Flask's session lifetime)
+# Needs pyarrow; without it open_history() returns None and uploads are read
+# one file at a time as before.
+import os, re, json, time, shutil, threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from ingest import read_whoop_csv, DATETIME_COLUMNS, CATEGORY_COLUMNS, NUMERIC_DTYPES
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+HISTORY_ENABLED = os.environ.get("WHOOP_HISTORY", "1") != "0"
+HISTORY_DIR = os.environ.get("WHOOP_HISTORY_DIR", os.path.join("cache", "whoop_history"))
+HISTORY_TTL_S = float(os.environ.get("WHOOP_HISTORY_TTL_DAYS", "31")) * 24 * 3600
+OPEN_STORES = 64            # owner stores kept open (each caches its frame)
+PRUNE_INTERVAL_S = 3600.0
+# Owner ids become directory names: no separators or dots.
+OWNER_RE = re.compile(r"[A-Za-z0-9_-]{8,64}")
+
+KEY = ["Cycle_start_time", "Cycle_timezone"]  # within an owner's partition
+# Stored schema: every column ingest.py knows, in export order. Unknown
+# columns in an upload are dropped; missing ones are stored as empty.
+STORE_COLUMNS = [
+    "Cycle_start_time", "Cycle_end_time", "Cycle_timezone", "Recovery_score_", "Resting_heart_rate_(bpm)",
+    "Heart_rate_variability_(ms)", "Skin_temp_(celsius)", "Blood_oxygen_", "Day_Strain", "Energy_burned_(cal)",
+    "Max_HR_(bpm)", "Average_HR_(bpm)", "Sleep_onset", "Wake_onset", "Sleep_performance_",
+    "Respiratory_rate_(rpm)", "Asleep_duration_(min)", "In_bed_duration_(min)", "Light_sleep_duration_(min)",
+    "Deep_(SWS)_duration_(min)", "REM_duration_(min)", "Awake_duration_(min)", "Sleep_need_(min)",
+    "Sleep_debt_(min)", "Sleep_efficiency_", "Sleep_consistency_",
+]
+
+
+def _canonical(df):
+    # Fixed columns and dtypes, so equal cycles hash equally whichever engine
+    # or file produced them.
+    out = {}
+    for c in STORE_COLUMNS:
+        col = df[c] if c in df.columns else pd.Series(np.nan, index=df.index)
+        if c in DATETIME_COLUMNS:
+            col = col.astype("datetime64[s]")
+        elif c in CATEGORY_COLUMNS:
+            col = col.astype("category")
+        else:
+            col = col.astype(NUMERIC_DTYPES[c])
+        out[c] = col
+    return pd.DataFrame(out, index=df.index)
+
+
+def _hashes(df, columns):
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+
+def _newest_first(df):
+    # Export order: latest cycle on top.
+    order = np.lexsort((df["Cycle_timezone"].astype(str).to_numpy(), -df["Cycle_start_time"].to_numpy("int64")))
+    return df.iloc[order].reset_index(drop=True)
+
+
+class HistoryStore:
+    """Month-partitioned Parquet store of WHOOP cycles with upsert by key."""
+
+    def __init__(self, root=HISTORY_DIR):
+        self.root = root
+        self.manifest_path = os.path.join(root, "manifest.json")
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._manifest, self._manifest_mtime = None, None
+        self._digests = {}  # month -> digest of the partition held in _frame
+        self._written = {}  # month -> (digest, frame) written here since the last refresh
+        self._frame, self._frame_generation = None, None
+
+    # ---------- Manifest ----------
+    def _load_manifest(self):
+        # Re-read when another process has written it since.
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return {"generation": 0, "edited": 0, "newest": None, "months": {}}
+        if mtime != self._manifest_mtime:
+            with open(self.manifest_path, encoding="utf-8") as fh:
+                self._manifest, self._manifest_mtime = json.load(fh), mtime
+        return self._manifest
+
+    def _save_manifest(self, manifest):
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, indent=1, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+        self._manifest, self._manifest_mtime = manifest, os.stat(self.manifest_path).st_mtime_ns
+
+    # ---------- Partitions ----------
+    def _month_path(self, month):
+        return os.path.join(self.root, f"{month}.parquet")
+
+    def _read_month(self, month):
+        df = pd.read_parquet(self._month_path(month))
+        # Parquet has no second-resolution timestamps; they come back as ms.
+        return df.astype({c: "datetime64[s]" for c in DATETIME_COLUMNS})
+
+    def _write_month(self, month, df):
+        tmp = self._month_path(month) + ".tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, self._month_path(month))
+
+    # ---------- Public API ----------
+    def upsert(self, csv_path):
+        """Merge a WHOOP export into the store; returns row counts for the upload."""
+        new = _canonical(read_whoop_csv(csv_path))
+        new = new[new["Cycle_start_time"].notna()]
+        new = new.drop_duplicates(KEY, keep="first")  # newest export row wins
+        new = new.assign(_key=_hashes(new, KEY), _row=_hashes(new, STORE_COLUMNS))
+        months = new["Cycle_start_time"].to_numpy("datetime64[M]").astype(str)
+        result = {"rows": len(new), "inserted": 0, "updated": 0, "unchanged": 0, "months_written": 0}
+
+        with self._lock:
+            manifest = self._load_manifest()
+            entries = dict(manifest["months"])
+            newest = np.datetime64(manifest["newest"]) if manifest.get("newest") else None
+            edited = False
+            order = np.argsort(months, kind="stable")
+            names, starts = np.unique(months[order], return_index=True)
+            digests = np.bitwise_xor.reduceat(new["_row"].to_numpy()[order], starts) if len(order) else []
+            bounds = list(starts[1:]) + [len(order)]
+            for month, lo, hi, digest in zip(names, starts, bounds, digests):
+                entry = entries.get(month)
+                if entry and entry["rows"] == hi - lo and entry["digest"] == format(digest, "016x"):
+                    result["unchanged"] += int(hi - lo)
+                    continue
+                part = new.iloc[order[lo:hi]]
+                if entry:
+                    old = self._read_month(month)
+                    # The row hash covers the key, so an equal hash is an unchanged cycle.
+                    fresh = ~part["_key"].isin(old["_key"]).to_numpy()
+                    same = part["_row"].isin(old["_row"]).to_numpy()
+                    result["inserted"] += int(fresh.sum())
+                    result["updated"] += int((~fresh & ~same).sum())
+                    result["unchanged"] += int(same.sum())
+                    if same.all():
+                        continue
+                    changed = part["Cycle_start_time"].to_numpy()[~same]
+                    part = pd.concat([old[~old["_key"].isin(part["_key"])], part])
+                else:
+                    result["inserted"] += len(part)
+                    changed = part["Cycle_start_time"].to_numpy()
+                edited = edited or (newest is not None and bool((changed < newest).any()))
+                part = _newest_first(part)
+                self._write_month(month, part)
+                entries[month] = {"rows": len(part),
+                                  "digest": format(np.bitwise_xor.reduce(part["_row"].to_numpy()), "016x")}
+                self._written[month] = (entries[month]["digest"], part.drop(columns=["_key", "_row"]))
+                result["months_written"] += 1
+            if result["months_written"]:
+                generation = manifest["generation"] + 1
+                latest = new["Cycle_start_time"].max()
+                if newest is None or latest > newest:
+                    newest = latest.to_datetime64()
+                self._save_manifest({"generation": generation, "months": entries, "newest": str(newest),
+                                     "edited": generation if edited else manifest.get("edited", 0)})
+        return result
+
+    def frame(self, columns=None):
+        """All stored cycles, newest first (``columns``: normalized names, missing skipped)."""
+        return self.view(columns)[0]
+
+    def view(self, columns=None):
+        """``(frame(columns), generation, edited)`` read consistently."""
+        with self._lock:
+            manifest = self._load_manifest()
+            if self._frame_generation != manifest["generation"]:
+                self._frame = self._refresh(manifest["months"])
+                self._frame_generation = manifest["generation"]
+            df, generation, edited = self._frame, manifest["generation"], manifest.get("edited", 0)
+        if columns is not None:
+            df = df[[c for c in dict.fromkeys(columns) if c in df.columns]]
+        return df, generation, edited
+
+    def _refresh(self, months):
+        # Splice changed partitions into the cached frame: only months whose
+        # digest moved since the last read are loaded (or taken from upsert).
+        stale = sorted(m for m, e in months.items() if self._digests.get(m) != e["digest"])
+        dropped = sorted(set(self._digests) - set(months))
+        written, self._written = self._written, {}
+        parts = [written[m][1] if m in written and written[m][0] == months[m]["digest"]
+                 else self._read_month(m).drop(columns=["_key", "_row"]) for m in stale]
+        if self._frame is not None and len(self._frame):
+            month = self._frame["Cycle_start_time"].to_numpy("datetime64[M]")
+            keep = ~np.isin(month, np.array(stale + dropped, dtype="datetime64[M]"))
+            parts.append(self._frame[keep])
+        self._digests = {m: e["digest"] for m, e in months.items()}
+        if not parts:
+            return _canonical(pd.DataFrame(columns=STORE_COLUMNS))
+        df = pd.concat(parts, ignore_index=True)
+        # Per-month category sets differ; concat falls back to object.
+        df["Cycle_timezone"] = df["Cycle_timezone"].astype("category")
+        # Partitions are stored newest first; a stable sort on the month keeps that order.
+        order = np.argsort(-df["Cycle_start_time"].to_numpy("datetime64[M]").astype("int64"), kind="stable")
+        return df.iloc[order].reset_index(drop=True)
+
+    def stats(self):
+        manifest = self._load_manifest()
+        return {"generation": manifest["generation"], "edited": manifest.get("edited", 0),
+                "months": len(manifest["months"]), "rows": sum(e["rows"] for e in manifest["months"].values())}
+
+
+class History:
+    """One HistoryStore per owner under ``root``."""
+
+    def __init__(self, root=HISTORY_DIR, ttl=HISTORY_TTL_S, max_open=OPEN_STORES):
+        self.root, self.ttl, self.max_open = root, ttl, max_open
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stores = OrderedDict()  # owner -> HistoryStore, least recently used first
+        self._pruned = 0.0
+
+    def _dir(self, owner):
+        if not isinstance(owner, str) or not OWNER_RE.fullmatch(owner):
+            raise ValueError(f"invalid history owner: {owner!r}")
+        return os.path.join(self.root, owner)
+
+    def store(self, owner):
+        """The owner's store, created empty on first use."""
+        path = self._dir(owner)
+        with self._lock:
+            store = self._stores.get(owner)
+            if store is None:
+                store = self._stores[owner] = HistoryStore(path)
+                while len(self._stores) > self.max_open:
+                    self._stores.popitem(last=False)
+                if time.time() - self._pruned > PRUNE_INTERVAL_S:
+                    self._prune()
+            self._stores.move_to_end(owner)
+            return store
+
+    def drop(self, owner):
+        """Deletes the owner's partition."""
+        path = self._dir(owner)
+        with self._lock:
+            self._stores.pop(owner, None)
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _prune(self):
+        # Partitions whose manifest was last written more than ttl ago; open
+        # stores are skipped.
+        self._pruned = now = time.time()
+        for entry in os.scandir(self.root):
+            if not entry.is_dir() or entry.name in self._stores or not OWNER_RE.fullmatch(entry.name):
+                continue
+            manifest = os.path.join(entry.path, "manifest.json")
+            try:
+                mtime = os.stat(manifest if os.path.exists(manifest) else entry.path).st_mtime
+            except FileNotFoundError:
+                continue
+            if now - mtime > self.ttl:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            return {"open": len(self._stores),
+                    "owners": sum(1 for e in os.scandir(self.root) if e.is_dir())}
+
+
+def open_history(root=None):
+    """Per-owner stores, or None when disabled (WHOOP_HISTORY=0) or pyarrow is missing."""
+    if not HISTORY_ENABLED or pq is None:
+        return None
+    return History(root or HISTORY_DIR)
@@ -0,0 +1,197 @@
+# ingest.py
+# Typed reader for WHOOP physiological_cycles exports.
+#
+# Headers in the export are padded ("Recovery_score_  "); they are stripped
+# once here. Only the requested columns are parsed, with an explicit schema:
+#   - dates as datetime64 from "dd/mm/yyyy HH:MM"
+#   - the timezone as a category
+#   - whole-unit measures (scores, bpm, ms, minutes, calories) as float32,
+#     which holds them exactly and still allows NaN for missing days
+#   - decimal measures as float64
+# Columns outside the schema keep pandas' inference.
+#
+# Config (env): WHOOP_CSV_ENGINE = auto (pyarrow when installed, default) | pyarrow | c
+import os, csv
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # the pandas C parser is used instead
+    pa = pa_csv = None
+
+ENGINE = os.environ.get("WHOOP_CSV_ENGINE", "auto")
+DATE_FORMAT = "%d/%m/%Y %H:%M"
+
+DATETIME_COLUMNS = ["Cycle_start_time", "Cycle_end_time", "Sleep_onset", "Wake_onset"]
+CATEGORY_COLUMNS = ["Cycle_timezone"]
+DECIMAL_COLUMNS = ["Skin_temp_(celsius)", "Blood_oxygen_", "Day_Strain", "Respiratory_rate_(rpm)"]
+WHOLE_COLUMNS = [
+    "Recovery_score_", "Resting_heart_rate_(bpm)", "Heart_rate_variability_(ms)", "Energy_burned_(cal)",
+    "Max_HR_(bpm)", "Average_HR_(bpm)", "Sleep_performance_", "Asleep_duration_(min)",
+    "In_bed_duration_(min)", "Light_sleep_duration_(min)", "Deep_(SWS)_duration_(min)",
+    "REM_duration_(min)", "Awake_duration_(min)", "Sleep_need_(min)", "Sleep_debt_(min)",
+    "Sleep_efficiency_", "Sleep_consistency_",
+]
+NUMERIC_DTYPES = dict([(c, "float32") for c in WHOLE_COLUMNS] + [(c, "float64") for c in DECIMAL_COLUMNS])
+
+
+def read_header(path):
+    """Raw (unstripped) column names of the CSV at ``path``."""
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        return next(csv.reader(fh), [])
+
+
+def _plan(path, columns):
+    # normalized name -> raw header, restricted to the requested columns
+    raw = {name.strip(): name for name in read_header(path)}
+    wanted = list(raw) if columns is None else [c for c in dict.fromkeys(columns) if c in raw]
+    return {c: raw[c] for c in wanted}
+
+
+def _arrow_options(plan):
+    types = {}
+    for name, raw in plan.items():
+        if name in DATETIME_COLUMNS:
+            types[raw] = pa.timestamp("s")
+        elif name in CATEGORY_COLUMNS:
+            types[raw] = pa.dictionary(pa.int32(), pa.string())
+        elif name in NUMERIC_DTYPES:
+            types[raw] = pa.float32() if NUMERIC_DTYPES[name] == "float32" else pa.float64()
+    return pa_csv.ConvertOptions(include_columns=list(plan.values()), column_types=types,
+                                 timestamp_parsers=[DATE_FORMAT])
+
+
+def _read_arrow(path, plan):
+    return pa_csv.read_csv(path, convert_options=_arrow_options(plan)).to_pandas()
+
+
+def _pandas_dtypes(plan):
+    dtype = {raw: NUMERIC_DTYPES.get(name, "category" if name in CATEGORY_COLUMNS else None)
+             for name, raw in plan.items()}
+    return {raw: t for raw, t in dtype.items() if t}
+
+
+def _finish_pandas(df, plan, coerce=False):
+    for name, raw in plan.items():
+        if coerce and name in NUMERIC_DTYPES:
+            df[raw] = pd.to_numeric(df[raw], errors="coerce").astype(NUMERIC_DTYPES[name])
+        elif name in DATETIME_COLUMNS:
+            df[raw] = parse_export_time(df[raw])
+    return df
+
+
+def _read_pandas(path, plan):
+    try:
+        df = pd.read_csv(path, usecols=list(plan.values()), dtype=_pandas_dtypes(plan))
+    except ValueError:
+        # A stray non-numeric cell: parse as text, then coerce it to NaN.
+        return _finish_pandas(pd.read_csv(path, usecols=list(plan.values())), plan, coerce=True)
+    return _finish_pandas(df, plan)
+
+
+def parse_export_time(values):
+    """``dd/mm/yyyy H:MM`` or ``dd/mm/yyyy HH:MM`` text -> datetime64[s].
+
+    Digits are decoded from fixed positions with array arithmetic; only cells
+    that do not fit that layout go through pd.to_datetime (bad ones -> NaT).
+    """
+    text = np.asarray(values.astype(object).where(values.notna(), ""), dtype="U17")
+    out = np.full(len(text), np.datetime64("NaT", "s"), dtype="datetime64[s]")
+    if not len(text):
+        return pd.Series(out, index=values.index)
+    c = text.view(np.uint32).reshape(len(text), 17).astype(np.int32)
+    d = c - 48
+    digit = (d >= 0) & (d <= 9)
+    short = c[:, 12] == 58  # "H:MM"
+    ok = (digit[:, [0, 1, 3, 4, 6, 7, 8, 9, 11]].all(axis=1)
+          & (c[:, 2] == 47) & (c[:, 5] == 47) & (c[:, 10] == 32)
+          & np.where(short, digit[:, 13] & digit[:, 14] & (c[:, 15] == 0),
+                     digit[:, 12] & (c[:, 13] == 58) & digit[:, 14] & digit[:, 15] & (c[:, 16] == 0)))
+    day, month = d[:, 0] * 10 + d[:, 1], d[:, 3] * 10 + d[:, 4]
+    year = d[:, 6] * 1000 + d[:, 7] * 100 + d[:, 8] * 10 + d[:, 9]
+    hour = np.where(short, d[:, 11], d[:, 11] * 10 + d[:, 12])
+    minute = np.where(short, d[:, 13] * 10 + d[:, 14], d[:, 14] * 10 + d[:, 15])
+    ok &= (month >= 1) & (month <= 12) & (day >= 1) & (hour < 24) & (minute < 60)
+
+    y, m, dd = year[ok], month[ok], day[ok]
+    first = (y - 1970).astype("datetime64[Y]").astype("datetime64[M]") + (m - 1).astype("timedelta64[M]")
+    date = first.astype("datetime64[D]") + (dd - 1).astype("timedelta64[D]")
+    real = date.astype("datetime64[M]") == first  # rejects 31/02 etc.
+    idx = np.flatnonzero(ok)
+    out[idx[real]] = (date[real].astype("datetime64[s]")
+                      + (hour[ok][real] * 3600 + minute[ok][real] * 60).astype("timedelta64[s]"))
+    ok[idx[~real]] = False
+
+    rest = np.flatnonzero(~ok & (text != ""))
+    if len(rest):
+        out[rest] = pd.to_datetime(values.iloc[rest], format=DATE_FORMAT, errors="coerce").to_numpy("datetime64[s]")
+    return pd.Series(out, index=values.index)
+
+
+def read_whoop_csv(path, columns=None, engine=None):
+    """DataFrame of ``columns`` (normalized names; all when None, missing ones
+    skipped) from a WHOOP export, typed per the schema above."""
+    engine = engine or ENGINE
+    plan = _plan(path, columns)
+    df = None
+    if engine in ("auto", "pyarrow") and pa is not None:
+        try:
+            df = _read_arrow(path, plan)
+        except pa.ArrowInvalid:
+            df = None  # malformed cells: the pandas path coerces them to NaN/NaT
+    elif engine == "pyarrow":
+        raise RuntimeError("WHOOP_CSV_ENGINE=pyarrow needs pyarrow: pip install pyarrow")
+    if df is None:
+        df = _read_pandas(path, plan)
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def iter_whoop_csv(path, columns=None, chunk_rows=100_000, engine=None, strict=True):
+    """Typed chunks of about ``chunk_rows`` rows, same schema as read_whoop_csv.
+
+    Malformed cells can only be detected mid-file here, so a strict reader
+    raises ValueError (pa.ArrowInvalid is one) instead of switching
+    engines; ``strict=False`` coerces them to NaN with the slower pandas
+    text path.
+    """
+    engine = engine or ENGINE
+    plan = _plan(path, columns)
+    if not strict:
+        chunks = (_finish_pandas(df, plan, coerce=True)
+                  for df in pd.read_csv(path, usecols=list(plan.values()), chunksize=chunk_rows))
+    elif engine in ("auto", "pyarrow") and pa is not None:
+        reader = pa_csv.open_csv(path, read_options=pa_csv.ReadOptions(block_size=1 << 20),
+                                 convert_options=_arrow_options(plan))
+        chunks = _regroup(reader, chunk_rows)
+    elif engine == "pyarrow":
+        raise RuntimeError("WHOOP_CSV_ENGINE=pyarrow needs pyarrow: pip install pyarrow")
+    else:
+        chunks = (_finish_pandas(df, plan) for df in pd.read_csv(
+            path, usecols=list(plan.values()), dtype=_pandas_dtypes(plan), chunksize=chunk_rows))
+    for df in chunks:
+        df.columns = df.columns.str.strip()
+        yield df
+
+
+def _regroup(reader, chunk_rows):
+    # Arrow reads several blocks ahead, so its blocks stay small (1 MiB) and
+    # their record batches are joined into frames of at least chunk_rows.
+    batches, rows = [], 0
+    for batch in reader:
+        batches.append(batch)
+        rows += batch.num_rows
+        if rows >= chunk_rows:
+            yield pa.Table.from_batches(batches).to_pandas()
+            batches, rows = [], 0
+    if batches:
+        yield pa.Table.from_batches(batches).to_pandas()
+
+
+def format_export_time(values):
+    """Datetimes back in the export's own form ("04/09/2025 4:50"); NaT stays NaN."""
+    hours = values.dt.hour.astype("Int64").astype(str)
+    text = values.dt.strftime("%d/%m/%Y ") + hours + values.dt.strftime(":%M")
+    return text.where(values.notna(), np.nan)
@@ -0,0 +1,75 @@
+# page_cache.py
+# In-process memo of computed WHOOP dashboard models (stats, distributions,
+# highlight tables, chart images), keyed by the CSV's identity on disk.
+import os, sys, threading
+from collections import OrderedDict
+
+
+def _approx_size(value):
+    # Charts (base64) and HTML tables dominate; containers are walked shallowly.
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_approx_size(v) for v in value.values()) + 64 * len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(_approx_size(v) for v in value) + 8 * len(value)
+    return sys.getsizeof(value)
+
+
+class PageModelCache:
+    """LRU of ``build(path)`` results keyed by (abspath, mtime_ns, size).
+
+    Re-uploading a file under the same name changes its mtime/size, so a stale
+    model is never served. Bounded by ``max_entries`` and an approximate
+    ``max_bytes`` budget; ``max_entries=0`` disables caching.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=32):
+        self.max_bytes, self.max_entries = max_bytes, max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (size, model)
+        self._bytes = 0
+        self.counts = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def key_for(path):
+        st = os.stat(path)
+        return os.path.abspath(path), st.st_mtime_ns, st.st_size
+
+    def get_or_build(self, path, build):
+        key = self.key_for(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.counts["hits"] += 1
+                return entry[1]
+            self.counts["misses"] += 1
+        model = build(path)
+        if self.max_entries > 0:
+            self._put(key, model)
+        return model
+
+    def _put(self, key, model):
+        size = _approx_size(model)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # Older versions of the same file can never be hit again.
+            for old in [k for k in self._entries if k[0] == key[0]]:
+                self._bytes -= self._entries.pop(old)[0]
+            self._entries[key] = (size, model)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (old_size, _) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self.counts["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, entries=len(self._entries), bytes=self._bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
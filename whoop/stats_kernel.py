@@ -0,0 +1,137 @@
+# stats_kernel.py
+# One-shot NumPy summary of a WHOOP export, shared by the WHOOP apps.
+#
+# The metric columns are copied once into a column-major float64 matrix and
+# every statistic the dashboards show comes from that matrix: describe()
+# fields (count/mean/std/min/quartiles/max), bucket counts, threshold counts
+# and top/bottom-k rows. Numerics follow pandas (NaN-skipping sums per column,
+# ddof=1 std, linear-interpolated quantiles, nlargest/nsmallest keep="first"
+# order), so the rendered numbers are identical to the per-column pandas code.
+import numpy as np
+import pandas as pd
+from ingest import format_export_time
+
+DESCRIBE_KEYS = ("count", "mean", "std", "min", "25%", "50%", "75%", "max")
+
+# column -> (bucket edges, labels); left-closed like `lo <= x < hi`
+BUCKETS = {
+    "Recovery_score_": ((50, 80), ("Low", "Medium", "High")),
+    "Sleep_debt_(min)": ((30, 100), ("Low", "Moderate", "High")),
+}
+# (column, op, value) conditions the dashboards count and quote rows for;
+# the streaming summary (stats_stream.py) tracks exactly these.
+THRESHOLDS = (("Recovery_score_", "<", 50), ("Sleep_debt_(min)", ">", 100))
+
+
+class Summary:
+    """Result of :func:`summarize`; keeps the matrix so extra lookups are cheap."""
+
+    def __init__(self, columns, rows, stats, X, valid, frame=None):
+        self.columns, self.rows, self.stats = columns, rows, stats
+        self._X, self._valid, self._frame = X, valid, frame
+        self._col = {c: i for i, c in enumerate(columns)}
+
+    def __contains__(self, column):
+        return column in self._col
+
+    def mean(self, column):
+        """Rounded like ``round(df[column].mean(), 2)``."""
+        return np.round(np.float64(self.stats[column]["mean"]), 2)
+
+    def describe(self, column):
+        """Rounded like ``df[column].describe().round(2).to_dict()``."""
+        return {k: float(np.round(v, 2)) for k, v in self.stats[column].items()}
+
+    def _values(self, column):
+        j = self._col[column]
+        return self._X[:, j], self._valid[:, j]
+
+    def buckets(self, column):
+        edges, labels = BUCKETS[column]
+        x, ok = self._values(column)
+        counts = np.bincount(np.digitize(x[ok], edges), minlength=len(labels))
+        return {label: int(n) for label, n in zip(labels, counts)}
+
+    def where(self, column, op, value):
+        """Row positions (file order) where ``column <op> value``; NaN never matches."""
+        x, ok = self._values(column)
+        with np.errstate(invalid="ignore"):
+            hit = {"<": x < value, ">": x > value, "<=": x <= value, ">=": x >= value}[op]
+        return np.flatnonzero(hit & ok)
+
+    def top(self, column, k=3, largest=True):
+        """Row positions in ``df.nlargest(k, column)`` / ``nsmallest`` order."""
+        x, ok = self._values(column)
+        pos = np.flatnonzero(ok)
+        v = x[pos] if largest else -x[pos]
+        if len(pos) > k:
+            # Everything tied with the k-th value stays a candidate; the
+            # stable sort below then keeps the earliest rows, as pandas does.
+            kth = np.partition(v, len(v) - k)[len(v) - k]
+            keep = v >= kth
+            pos, v = pos[keep], v[keep]
+        order = np.lexsort((pos, -v))[:k]
+        if len(order) < k:
+            # pandas pads a short result with NaN rows in file order.
+            return np.concatenate([pos[order], np.flatnonzero(~ok)[:k - len(order)]])
+        return pos[order]
+
+    def count(self, column, op, value):
+        return len(self.where(column, op, value))
+
+    def first_rows(self, column, op, value, k=3):
+        """highlight_rows() for the first ``k`` rows (file order) matching the condition."""
+        return highlight_rows(self._frame, self.where(column, op, value)[:k], column)
+
+    def highlights(self, column, k=3, largest=True):
+        """highlight_rows() for the ``k`` largest/smallest rows of ``column``."""
+        return highlight_rows(self._frame, self.top(column, k, largest), column)
+
+
+_QUANTILES = np.array([0, 25, 50, 75, 100]) / 100
+
+
+def _sorted_quantiles(s, q):
+    # np.percentile(s, q * 100) (method="linear") on an already sorted 1-D
+    # array, with numpy's index and interpolation arithmetic.
+    n = len(s)
+    virtual = n * q + (1 - q) - 1  # alpha = beta = 1
+    prev = np.floor(virtual)
+    lo = prev.astype(np.intp)
+    hi = np.minimum(lo + 1, n - 1)
+    lo[virtual >= n - 1] = n - 1
+    a, b = s[lo], s[hi]
+    t = virtual - prev
+    diff = b - a
+    return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+
+
+def summarize(df, columns):
+    """Summary over the ``columns`` present in ``df`` (missing ones are skipped)."""
+    columns = [c for c in dict.fromkeys(columns) if c in df.columns]
+    X = np.asfortranarray(df[columns].to_numpy(dtype="float64", na_value=np.nan))
+    valid = ~np.isnan(X)
+    count = valid.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(valid, X, 0.0).sum(axis=0) / count
+        dev = np.where(valid, X - mean, 0.0)
+        std = np.sqrt((dev * dev).sum(axis=0) / (count - 1))
+    std[count < 2] = np.nan
+
+    # One column-wise sort (NaNs last) serves min, quartiles and max.
+    S = np.sort(X, axis=0)
+    stats = {}
+    for j, c in enumerate(columns):
+        q = _sorted_quantiles(S[:count[j], j], _QUANTILES) if count[j] else [np.nan] * 5
+        stats[c] = dict(zip(DESCRIBE_KEYS, (float(count[j]), float(mean[j]), float(std[j]),
+                                            float(q[0]), float(q[1]), float(q[2]), float(q[3]), float(q[4]))))
+    return Summary(columns, len(df), stats, X, valid, frame=df)
+
+
+def highlight_rows(df, positions, column):
+    """``df`` rows at ``positions`` with the date (when present) and ``column``."""
+    cols = ["Cycle_start_time", column] if "Cycle_start_time" in df.columns else [column]
+    rows = df.iloc[positions][cols]
+    if "Cycle_start_time" in cols and pd.api.types.is_datetime64_any_dtype(rows["Cycle_start_time"]):
+        rows = rows.assign(Cycle_start_time=format_export_time(rows["Cycle_start_time"]))
+    return rows
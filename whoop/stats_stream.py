@@ -0,0 +1,320 @@
+# stats_stream.py
+# Constant-memory summary of a WHOOP export that is read in chunks.
+#
+# Uploads above WHOOP_STREAM_MB are never loaded whole. Each chunk from
+# ingest.iter_whoop_csv is folded into mergeable accumulators:
+#   - count/mean/std: per-chunk moments merged with Chan's parallel Welford update
+#   - min/25%/50%/75%/max: a centroid digest. It holds exact (value, count)
+#     pairs while a column has at most WHOOP_STREAM_CENTROIDS distinct
+#     values. Beyond that, neighbours are merged t-digest style, with small
+#     clusters at the tails (k1 scale).
+#   - top/bottom-3 rows per column: bounded candidate lists kept in pandas'
+#     nlargest/nsmallest order (ties -> earliest row, NaN rows pad short results)
+#   - counters for stats_kernel.BUCKETS and THRESHOLDS, plus the first 3
+#     matching rows of each threshold
+# The result is a stats_kernel.Summary, so the dashboards use one code path.
+#
+# Tolerance against the in-memory path (stats_kernel.summarize):
+#   - counts, buckets, thresholds, min/max and highlighted rows: exact
+#   - mean/std: equal up to float summation order (relative error ~1e-15; a
+#     file that fits in one chunk gives identical values). The 2-decimal page
+#     figures can differ by 0.01 only when the value sits on a rounding tie.
+#   - quartiles: exact while the digest is exact, which covers WHOOP metrics
+#     (whole units or one decimal). On continuous data the error is a rank
+#     error of about 0.01% of the rows (bench_whoop_stream.py measures it).
+#
+# Config (env): WHOOP_STREAM_MB (default 64; 0 streams every upload),
+#               WHOOP_STREAM_CHUNK_ROWS (default 100000),
+#               WHOOP_STREAM_CENTROIDS (default 2000)
+import os
+import numpy as np
+import pandas as pd
+from ingest import iter_whoop_csv, read_header, format_export_time
+from stats_kernel import Summary, DESCRIBE_KEYS, BUCKETS, THRESHOLDS, _QUANTILES, _sorted_quantiles
+
+STREAM_MB = float(os.environ.get("WHOOP_STREAM_MB", "64"))
+CHUNK_ROWS = int(os.environ.get("WHOOP_STREAM_CHUNK_ROWS", "100000"))
+CENTROIDS = int(os.environ.get("WHOOP_STREAM_CENTROIDS", "2000"))
+
+_OPS = {"<": np.less, ">": np.greater, "<=": np.less_equal, ">=": np.greater_equal}
+
+
+def should_stream(path):
+    return os.path.getsize(path) > STREAM_MB * 1024 * 1024
+
+
+# ---------- Accumulators ----------
+class Moments:
+    """Count, mean, sum of squared deviations, min and max per column."""
+
+    def __init__(self, width):
+        self.n = np.zeros(width)
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+        self.min = np.full(width, np.nan)
+        self.max = np.full(width, np.nan)
+
+    def update(self, X, valid):
+        n = valid.sum(axis=0).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # Same two-pass arithmetic as stats_kernel.summarize within the chunk.
+            mean = np.where(valid, X, 0.0).sum(axis=0) / n
+            dev = np.where(valid, X - mean, 0.0)
+            m2 = (dev * dev).sum(axis=0)
+        other = Moments(len(n))
+        other.n, other.mean, other.m2 = n, np.where(n > 0, mean, 0.0), m2
+        other.min, other.max = np.fmin.reduce(X, axis=0), np.fmax.reduce(X, axis=0)
+        self.merge(other)
+
+    def merge(self, other):
+        total = self.n + other.n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            share = np.where(total > 0, other.n / total, 0.0)
+        delta = other.mean - self.mean
+        # A side with no values yet takes the other side's figures as they are.
+        self.mean = np.where(self.n == 0, other.mean, np.where(other.n == 0, self.mean, self.mean + delta * share))
+        self.m2 = np.where(self.n == 0, other.m2, np.where(other.n == 0, self.m2,
+                                                             self.m2 + other.m2 + delta * delta * self.n * share))
+        self.n = total
+        self.min, self.max = np.fmin(self.min, other.min), np.fmax(self.max, other.max)
+
+    def std(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.n >= 2, np.sqrt(self.m2 / (self.n - 1)), np.nan)
+
+
+class Digest:
+    """Sorted (value, weight) centroids; exact until ``max_centroids`` distinct values."""
+
+    def __init__(self, max_centroids=CENTROIDS):
+        self.max_centroids = max_centroids
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.exact = True
+
+    def update(self, values):
+        means, counts = np.unique(values, return_counts=True)
+        self._add(means, counts.astype(np.float64))
+
+    def merge(self, other):
+        self.exact = self.exact and other.exact
+        self._add(other.means, other.weights)
+
+    def _add(self, means, weights):
+        means, inverse = np.unique(np.concatenate([self.means, means]), return_inverse=True)
+        weights = np.bincount(inverse, weights=np.concatenate([self.weights, weights]))
+        if len(means) > self.max_centroids:
+            means, weights = _compress(means, weights, self.max_centroids // 2)
+            self.exact = False
+        self.means, self.weights = means, weights
+
+    def quantiles(self, q, lo, hi):
+        """np.percentile(method="linear") of the values; ``lo``/``hi`` are the exact min/max."""
+        cum = np.cumsum(self.weights)
+        n = int(cum[-1])
+        if self.exact:
+            return _sorted_quantiles(_Ranked(self.means, cum, n), q)
+        # Centroid i covers ranks cum[i] - w[i] .. cum[i] - 1; interpolate between their centres.
+        ranks = np.concatenate([[0], cum - (self.weights + 1) / 2, [n - 1]])
+        values = np.concatenate([[lo], self.means, [hi]])
+        return np.interp(q * (n - 1), ranks, values)
+
+
+class _Ranked:
+    # The sorted multiset behind an exact digest, indexable by rank.
+    def __init__(self, means, cum, n):
+        self.means, self.cum, self.n = means, cum, n
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, rank):
+        return self.means[np.searchsorted(self.cum, rank, side="right")]
+
+
+def _compress(means, weights, delta):
+    # Merge neighbours whose left edge falls in the same unit of the k1 scale
+    # k(q) = delta * (asin(2q - 1) / pi + 1/2): many small clusters near the
+    # tails, larger ones in the middle; at most delta + 1 clusters.
+    q = (np.cumsum(weights) - weights) / weights.sum()
+    k = np.floor(delta * (np.arcsin(2 * q - 1) / np.pi + 0.5))
+    starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+    w = np.add.reduceat(weights, starts)
+    return np.add.reduceat(means * weights, starts) / w, w
+
+
+class RowPicks:
+    """Up to ``k`` rows, kept by (-key, row) order, with their date and value."""
+
+    def __init__(self, k):
+        self.k = k
+        self.key = np.empty(0)
+        self.row = np.empty(0, dtype=np.int64)
+        self.date = np.empty(0, dtype="datetime64[s]")
+        self.value = np.empty(0)
+
+    def offer(self, key, row, date, value):
+        if len(key) > self.k:
+            # Everything tied with the k-th key stays a candidate (see Summary.top).
+            kth = np.partition(key, len(key) - self.k)[len(key) - self.k]
+            keep = key >= kth
+            key, row, date, value = key[keep], row[keep], date[keep], value[keep]
+        key = np.concatenate([self.key, key])
+        row = np.concatenate([self.row, row])
+        date = np.concatenate([self.date, date])
+        value = np.concatenate([self.value, value])
+        order = np.lexsort((row, -key))[:self.k]
+        self.key, self.row, self.date, self.value = key[order], row[order], date[order], value[order]
+
+    def merge(self, other, shift=0, by_row=False):
+        """Offer ``other``'s rows, renumbered by ``shift``; ``by_row`` keys them by file order."""
+        row = other.row + shift
+        self.offer(-row.astype(np.float64) if by_row else other.key, row, other.date, other.value)
+
+
+class SummaryAccumulator:
+    """Folds chunks of a WHOOP export into the figures of a stats_kernel.Summary."""
+
+    def __init__(self, columns, has_dates=True, k=3, max_centroids=CENTROIDS):
+        self.columns, self.has_dates, self.k = list(columns), has_dates, k
+        self.rows = 0
+        self.dtypes = {}
+        self.moments = Moments(len(self.columns))
+        self.digests = [Digest(max_centroids) for _ in self.columns]
+        self.largest = [RowPicks(k) for _ in self.columns]
+        self.smallest = [RowPicks(k) for _ in self.columns]
+        self.missing = [RowPicks(k) for _ in self.columns]  # first NaN rows, pad short top-k lists
+        self.buckets = {c: np.zeros(len(BUCKETS[c][1]), dtype=np.int64) for c in self.columns if c in BUCKETS}
+        self.thresholds = {t: [0, RowPicks(k)] for t in THRESHOLDS if t[0] in self.columns}
+
+    def update(self, chunk):
+        n = len(chunk)
+        if not n:
+            return
+        for c in self.columns:
+            self.dtypes.setdefault(c, chunk[c].dtype)
+        X = chunk[self.columns].to_numpy(dtype="float64", na_value=np.nan)
+        valid = ~np.isnan(X)
+        rows = np.arange(self.rows, self.rows + n, dtype=np.int64)
+        dates = (chunk["Cycle_start_time"].to_numpy("datetime64[s]") if self.has_dates
+                 else np.full(n, np.datetime64("NaT", "s"), dtype="datetime64[s]"))
+        earliest = -rows.astype(np.float64)  # key that keeps file order in RowPicks
+        self.moments.update(X, valid)
+        for j, c in enumerate(self.columns):
+            x, ok = X[:, j], valid[:, j]
+            pos = np.flatnonzero(ok)
+            self.digests[j].update(x[pos])
+            self.largest[j].offer(x[pos], rows[pos], dates[pos], x[pos])
+            self.smallest[j].offer(-x[pos], rows[pos], dates[pos], x[pos])
+            gap = np.flatnonzero(~ok)[:self.k]
+            self.missing[j].offer(earliest[gap], rows[gap], dates[gap], x[gap])
+            if c in self.buckets:
+                edges = BUCKETS[c][0]
+                self.buckets[c] += np.bincount(np.digitize(x[pos], edges), minlength=len(edges) + 1)
+        for (c, op, value), hit in self.thresholds.items():
+            j = self.columns.index(c)
+            with np.errstate(invalid="ignore"):
+                pos = np.flatnonzero(_OPS[op](X[:, j], value) & valid[:, j])
+            hit[0] += len(pos)
+            pos = pos[:self.k]
+            hit[1].offer(earliest[pos], rows[pos], dates[pos], X[pos, j])
+        self.rows += n
+
+    def merge(self, other):
+        """Fold in an accumulator over later rows (its row numbers are shifted after ours)."""
+        shift = self.rows
+        for c, dtype in other.dtypes.items():
+            self.dtypes.setdefault(c, dtype)
+        self.moments.merge(other.moments)
+        for j in range(len(self.columns)):
+            self.digests[j].merge(other.digests[j])
+            self.largest[j].merge(other.largest[j], shift)
+            self.smallest[j].merge(other.smallest[j], shift)
+            self.missing[j].merge(other.missing[j], shift, by_row=True)
+        for c in self.buckets:
+            self.buckets[c] += other.buckets[c]
+        for t, hit in self.thresholds.items():
+            hit[0] += other.thresholds[t][0]
+            hit[1].merge(other.thresholds[t][1], shift, by_row=True)
+        self.rows += other.rows
+
+    def result(self):
+        m, std = self.moments, self.moments.std()
+        stats = {}
+        for j, c in enumerate(self.columns):
+            if m.n[j]:
+                q = self.digests[j].quantiles(_QUANTILES, m.min[j], m.max[j])
+                q[0], q[-1] = m.min[j], m.max[j]
+            else:
+                q = [np.nan] * 5
+            stats[c] = dict(zip(DESCRIBE_KEYS, (float(m.n[j]), float(m.mean[j]) if m.n[j] else np.nan, float(std[j]),
+                                                float(q[0]), float(q[1]), float(q[2]), float(q[3]), float(q[4]))))
+        return StreamSummary(self, stats)
+
+
+# ---------- Result ----------
+class StreamSummary(Summary):
+    """Summary answered from accumulators; only the tracked BUCKETS and
+    THRESHOLDS can be counted, and per-row lookups (where/top) are unavailable."""
+
+    def __init__(self, acc, stats):
+        super().__init__(acc.columns, acc.rows, stats, None, None)
+        self._acc = acc
+
+    def buckets(self, column):
+        return {label: int(n) for label, n in zip(BUCKETS[column][1], self._acc.buckets[column])}
+
+    def count(self, column, op, value):
+        return self._acc.thresholds[(column, op, value)][0]
+
+    def first_rows(self, column, op, value, k=3):
+        picks = self._acc.thresholds[(column, op, value)][1]
+        return self._rows(column, picks.date[:k], picks.value[:k])
+
+    def highlights(self, column, k=3, largest=True):
+        j = self._col[column]
+        picks = (self._acc.largest if largest else self._acc.smallest)[j]
+        date, value = picks.date[:k], picks.value[:k]
+        if len(value) < k:
+            pad = self._acc.missing[j]
+            date = np.concatenate([date, pad.date[:k - len(value)]])
+            value = np.concatenate([value, pad.value[:k - len(value)]])
+        return self._rows(column, date, value)
+
+    def _rows(self, column, date, value):
+        # Same frame as stats_kernel.highlight_rows: export-style date + the column.
+        out = {}
+        if self._acc.has_dates:
+            out["Cycle_start_time"] = format_export_time(pd.Series(date, dtype="datetime64[s]"))
+        out[column] = pd.Series(value).astype(self._acc.dtypes.get(column, "float64"))
+        return pd.DataFrame(out)
+
+    def where(self, column, op, value):
+        raise NotImplementedError("row positions are not kept in streaming mode")
+
+    def top(self, column, k=3, largest=True):
+        raise NotImplementedError("row positions are not kept in streaming mode")
+
+
+def summarize_csv(path, columns, chunk_rows=None, sinks=()):
+    """Streaming counterpart of ``summarize(read_whoop_csv(path), columns)``.
+    ``sinks`` (``.columns``, ``.clear()``, ``.update(chunk)``) see the same chunks."""
+    header = {h.strip() for h in read_header(path)}
+    columns = [c for c in dict.fromkeys(columns) if c in header]
+    has_dates = "Cycle_start_time" in header
+    wanted = (["Cycle_start_time"] if has_dates else []) + columns
+    wanted += [c for sink in sinks for c in sink.columns if c in header and c not in wanted]
+    for strict in (True, False):
+        acc = SummaryAccumulator(columns, has_dates=has_dates)
+        for sink in sinks:
+            sink.clear()
+        try:
+            for chunk in iter_whoop_csv(path, wanted, chunk_rows or CHUNK_ROWS, strict=strict):
+                acc.update(chunk)
+                for sink in sinks:
+                    sink.update(chunk)
+            return acc.result()
+        except ValueError:
+            if not strict:
+                raise
+            # A malformed cell mid-file: start over on the lenient reader.
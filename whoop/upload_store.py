@@ -0,0 +1,187 @@
+# upload_store.py
+# Content-addressed storage for WHOOP uploads.
+#
+# An upload is stored once per content, under its SHA-256:
+#
+#   <root>/blobs/3f/3fa2...c9.csv
+#   <root>/uploads.sqlite3   blobs (digest, size, last use) + refs (holder -> digest)
+#
+# Nothing is addressed by the client's file name any more, so two people
+# uploading physiological_cycles_today.csv no longer overwrite each other, and
+# a re-uploaded identical file is not stored twice. Re-uploads also keep the
+# same path, so the page cache keyed on it still hits.
+#
+# A holder (a session, or a single request) references one blob at a time.
+# Blobs nobody references are kept as a cache and evicted least recently used
+# first once the store exceeds WHOOP_UPLOAD_QUOTA_MB. Referenced blobs are
+# never evicted. References of holders not seen for WHOOP_UPLOAD_REF_TTL_S
+# (sessions that simply expired) are dropped at eviction time.
+#
+# Config (env): WHOOP_UPLOAD_QUOTA_MB (default 1024),
+#               WHOOP_UPLOAD_REF_TTL_S (default 31 days, Flask's session lifetime)
+import os, time, hashlib, secrets, sqlite3, threading
+
+QUOTA_MB = float(os.environ.get("WHOOP_UPLOAD_QUOTA_MB", "1024"))
+REF_TTL_S = float(os.environ.get("WHOOP_UPLOAD_REF_TTL_S", str(31 * 24 * 3600)))
+_CHUNK = 1 << 20
+
+
+class UploadStore:
+    """Deduplicated, reference-counted upload blobs with an LRU-evicted quota."""
+
+    def __init__(self, root, quota_bytes=None, ref_ttl=None):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        self.quota_bytes = QUOTA_MB * 1024 * 1024 if quota_bytes is None else quota_bytes
+        self.ref_ttl = REF_TTL_S if ref_ttl is None else ref_ttl
+        self.db_path = os.path.join(root, "uploads.sqlite3")
+        self._local = threading.local()
+        self.counts = {"puts": 0, "deduplicated": 0, "evictions": 0, "evicted_bytes": 0}
+        os.makedirs(self.blob_dir, exist_ok=True)
+        db = self._conn()
+        db.execute("CREATE TABLE IF NOT EXISTS blobs "
+                   "(digest TEXT PRIMARY KEY, size INTEGER NOT NULL, used REAL NOT NULL)")
+        db.execute("CREATE TABLE IF NOT EXISTS refs "
+                   "(holder TEXT PRIMARY KEY, digest TEXT NOT NULL, touched REAL NOT NULL)")
+        db.execute("CREATE INDEX IF NOT EXISTS refs_digest ON refs (digest)")
+
+    def _conn(self):
+        # sqlite3 connections are per thread.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest + ".csv")
+
+    @staticmethod
+    def new_holder():
+        return secrets.token_urlsafe(16)
+
+    # ---------- Writing ----------
+    def put(self, stream, holder=None):
+        """Store the bytes of ``stream`` and return their digest; ``holder`` now references it."""
+        if stream.seekable():
+            # Werkzeug keeps uploads in memory or a temp file: hash them first,
+            # and a file already in the store is never written again.
+            start = stream.tell()
+            sha = hashlib.sha256()
+            for chunk in iter(lambda: stream.read(_CHUNK), b""):
+                sha.update(chunk)
+            digest = sha.hexdigest()
+            if self._reuse(digest, holder):
+                return digest
+            stream.seek(start)
+        # Hash while spooling into the store's own directory, so the final
+        # move is a same-filesystem rename.
+        sha, size = hashlib.sha256(), 0
+        tmp = os.path.join(self.blob_dir, f".{secrets.token_hex(8)}.tmp")
+        try:
+            with open(tmp, "wb") as fh:
+                for chunk in iter(lambda: stream.read(_CHUNK), b""):
+                    sha.update(chunk)
+                    fh.write(chunk)
+                    size += len(chunk)
+            digest = sha.hexdigest()
+            path = self._blob_path(digest)
+            db = self._conn()
+            now = time.time()
+            # File moves happen inside the write transaction so a concurrent
+            # eviction can never unlink a blob this call just registered.
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                known = db.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone()
+                if known and os.path.exists(path):
+                    self.counts["deduplicated"] += 1
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp, path)
+                db.execute("INSERT OR REPLACE INTO blobs (digest, size, used) VALUES (?, ?, ?)", (digest, size, now))
+                if holder is not None:
+                    db.execute("INSERT OR REPLACE INTO refs (holder, digest, touched) VALUES (?, ?, ?)",
+                               (holder, digest, now))
+                self._evict(db, now)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            self.counts["puts"] += 1
+            return digest
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _reuse(self, digest, holder):
+        # put() of content already stored: only the bookkeeping changes.
+        db = self._conn()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if not db.execute("UPDATE blobs SET used = ? WHERE digest = ?", (now, digest)).rowcount \
+                    or not os.path.exists(self._blob_path(digest)):
+                db.execute("ROLLBACK")
+                return False
+            if holder is not None:
+                db.execute("INSERT OR REPLACE INTO refs (holder, digest, touched) VALUES (?, ?, ?)",
+                           (holder, digest, now))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self.counts["puts"] += 1
+        self.counts["deduplicated"] += 1
+        return True
+
+    def _evict(self, db, now):
+        # Inside put()'s transaction: expire stale references, then drop
+        # unreferenced blobs, oldest use first, until the store fits the quota.
+        db.execute("DELETE FROM refs WHERE touched < ?", (now - self.ref_ttl,))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.quota_bytes:
+            return
+        victims = db.execute("SELECT digest, size FROM blobs WHERE digest NOT IN (SELECT digest FROM refs) "
+                             "ORDER BY used").fetchall()
+        for digest, size in victims:
+            if total <= self.quota_bytes:
+                break
+            db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            try:
+                os.remove(self._blob_path(digest))
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.counts["evictions"] += 1
+            self.counts["evicted_bytes"] += size
+
+    # ---------- Reading ----------
+    def path(self, digest, holder=None):
+        """Path of the blob ``digest`` (None once evicted); marks it, and ``holder``'s reference, as used."""
+        if not digest:
+            return None
+        path = self._blob_path(digest)
+        now = time.time()
+        db = self._conn()
+        if not db.execute("UPDATE blobs SET used = ? WHERE digest = ?", (now, digest)).rowcount:
+            return None
+        if holder is not None:
+            db.execute("UPDATE refs SET touched = ? WHERE holder = ? AND digest = ?", (now, holder, digest))
+        return path if os.path.exists(path) else None
+
+    def release(self, holder):
+        """Drop ``holder``'s reference; its blob stays cached until evicted."""
+        if holder is not None:
+            self._conn().execute("DELETE FROM refs WHERE holder = ?", (holder,))
+
+    def refcount(self, digest):
+        return self._conn().execute("SELECT COUNT(*) FROM refs WHERE digest = ?", (digest,)).fetchone()[0]
+
+    def stats(self):
+        db = self._conn()
+        blobs, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        refs, referenced = db.execute("SELECT COUNT(*), COUNT(DISTINCT digest) FROM refs").fetchone()
+        return dict(self.counts, blobs=blobs, bytes=size, quota_bytes=int(self.quota_bytes), refs=refs,
+                    referenced_blobs=referenced)
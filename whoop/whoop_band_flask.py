@@ -1,14 +1,37 @@
-from flask import Flask, render_template_string, request
-import pandas as pd
-import os
-import matplotlib.pyplot as plt
-import io
-import base64
-from werkzeug.utils import secure_filename
+from flask import Flask, render_template, request
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.metrics import install_metrics, span
+from common.templates import install_templates
+from charts import bar_spec, pie_spec, render_charts
+from stats_kernel import summarize
+from stats_stream import should_stream, summarize_csv
+from ingest import read_whoop_csv
+from baselines import BaselineTracker, RecentCycles, baseline_rows
+from upload_store import UploadStore
+
+# Each upload is analyzed on its own: this app has no session to tell whose
+# export it is, so there is no history to merge it into (history.py keeps one
+# per owner; see whoop_flassk_genai_3.py).
+# Rolling 7/30/90-day baselines over the upload (see baselines.py).
+baselines = BaselineTracker()
+# Exports above WHOOP_STREAM_MB are summarized in chunks instead (see
+# stats_stream.py); their baselines come from the export's last 90 days.
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Uploads are stored by content hash with a size quota (see upload_store.py).
+uploads = UploadStore(app.config['UPLOAD_FOLDER'])
+# Per-stage timings: Server-Timing header + GET /metrics (APP_METRICS, see common/metrics.py).
+install_metrics(app, "whoop_band")
+
+SUMMARY_COLUMNS = [
+    "Recovery_score_", "Resting_heart_rate_(bpm)", "Heart_rate_variability_(ms)", "Sleep_performance_",
+    "Asleep_duration_(min)", "Sleep_efficiency_", "Sleep_consistency_", "Day_Strain", "Energy_burned_(cal)",
+]
+VIEW_COLUMNS = ["Cycle_start_time"] + SUMMARY_COLUMNS + ["Sleep_debt_(min)"]
 
 HTML_FORM = """
 <!doctype html>
@@ -49,6 +72,31 @@ img { margin-bottom: 30px; border: 1px solid #ccc; border-radius: 6px; }
   </ul>
 </div>
 
+<h3>Rolling Baselines</h3>
+{% if baselines %}
+<p>Latest cycle vs the cycles of the previous 7 / 30 / 90 days: mean (min&ndash;max, n readings).</p>
+<table>
+  <tr>
+    <th>Metric</th>
+    <th>Latest</th>
+    <th>7-day</th>
+    <th>30-day</th>
+    <th>90-day</th>
+    <th>vs 30-day mean</th>
+  </tr>
+  {% for b in baselines %}
+  <tr>
+    <td>{{ b.label }}</td>
+    <td>{{ b.latest }}</td>
+    {% for w in b.windows %}<td>{{ w }}</td>{% endfor %}
+    <td>{{ b.deviation }}</td>
+  </tr>
+  {% endfor %}
+</table>
+{% else %}
+<p><i>Not available</i></p>
+{% endif %}
+
 <h3>Overall Metrics (Bar Chart)</h3>
 <img src="data:image/png;base64,{{ bar_chart }}" alt="Average Metrics">
 
@@ -114,28 +162,8 @@ img { margin-bottom: 30px; border: 1px solid #ccc; border-radius: 6px; }
 <br>
 <a href="{{ url_for('upload_file') }}">Analyze another file</a>
 """
-
-def plot_to_base64(fig):
-    buf = io.BytesIO()
-    fig.savefig(buf, format="png", bbox_inches='tight')
-    buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close(fig)
-    return img_base64
-
-def make_bar_chart(averages):
-    fig, ax = plt.subplots(figsize=(7, 3))
-    ax.bar(averages.keys(), averages.values(), color=['#3498db', '#e67e22', '#27ae60', '#c0392b', '#8e44ad'])
-    ax.set_ylabel('Average Value')
-    ax.set_title('Average Key Metrics')
-    plt.xticks(rotation=20)
-    return plot_to_base64(fig)
-
-def make_pie_chart(labels, sizes, colors, title):
-    fig, ax = plt.subplots(figsize=(4, 4))
-    ax.pie(sizes, labels=labels, autopct='%1.1f%%', colors=colors, startangle=90)
-    ax.set_title(title)
-    return plot_to_base64(fig)
+# Compiled once here, rendered by name (see common/templates.py).
+install_templates(app, {"whoop_band/form.html": HTML_FORM, "whoop_band/result.html": HTML_RESULT})
 
 @app.route('/', methods=['GET', 'POST'])
 def upload_file():
@@ -143,91 +171,78 @@ def upload_file():
     if request.method == 'POST':
         if 'file' not in request.files:
             error = "No file part"
-            return render_template_string(HTML_FORM, error=error)
+            return render_template("whoop_band/form.html", error=error)
         file = request.files['file']
         if file.filename == '':
             error = "No selected file"
-            return render_template_string(HTML_FORM, error=error)
+            return render_template("whoop_band/form.html", error=error)
         if file and file.filename.endswith('.csv'):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            # Referenced for this request only; afterwards the blob is cache.
+            holder = uploads.new_holder()
+            filepath = uploads.path(uploads.put(file.stream, holder))
             try:
-                df = pd.read_csv(filepath)
-                df.columns = df.columns.str.strip()
-                # Compute summaries
-                summary = {
-                    "Recovery_score_": df["Recovery_score_"].describe(),
-                    "Resting_heart_rate_(bpm)": df["Resting_heart_rate_(bpm)"].describe(),
-                    "Heart_rate_variability_(ms)": df["Heart_rate_variability_(ms)"].describe(),
-                    "Sleep_performance_": df["Sleep_performance_"].describe(),
-                    "Asleep_duration_(min)": df["Asleep_duration_(min)"].describe(),
-                    "Sleep_efficiency_": df["Sleep_efficiency_"].describe(),
-                    "Sleep_consistency_": df["Sleep_consistency_"].describe(),
-                    "Day_Strain": df["Day_Strain"].describe(),
-                    "Energy_burned_(cal)": df["Energy_burned_(cal)"].describe(),
-                }
-                summary_stats = {k: v.round(2).to_dict() for k, v in summary.items()}
-                avg_sleep_debt = round(df["Sleep_debt_(min)"].mean(), 2) if "Sleep_debt_(min)" in df else "N/A"
+                with span("pandas"):
+                    if should_stream(filepath):
+                        df, recent = None, RecentCycles()
+                        st = summarize_csv(filepath, SUMMARY_COLUMNS + ["Sleep_debt_(min)"], sinks=[recent])
+                    else:
+                        df = read_whoop_csv(filepath, columns=VIEW_COLUMNS)
+                        # Compute summaries (one kernel pass, see stats_kernel.py)
+                        st = summarize(df, SUMMARY_COLUMNS + ["Sleep_debt_(min)"])
+                summary_stats = {c: st.describe(c) for c in SUMMARY_COLUMNS}
+                avg_sleep_debt = st.mean("Sleep_debt_(min)") if "Sleep_debt_(min)" in st else "N/A"
                 # Low recovery and high sleep debt
-                low_recovery = df[df["Recovery_score_"] < 50][["Cycle_start_time", "Recovery_score_"]]
-                high_sleep_debt = df[df["Sleep_debt_(min)"] > 100][["Cycle_start_time", "Sleep_debt_(min)"]]
-                low_recovery_count = len(low_recovery)
-                high_sleep_debt_count = len(high_sleep_debt)
-                total_days = len(df)
+                low_recovery_count = st.count("Recovery_score_", "<", 50)
+                high_sleep_debt_count = st.count("Sleep_debt_(min)", ">", 100)
+                total_days = st.rows
+                baseline_table = baseline_rows(baselines.snapshot(df) if df is not None else recent.snapshot())
                 # Bar chart for averages
                 averages = {
-                    "Recovery": round(df["Recovery_score_"].mean(), 2),
-                    "Rest HR": round(df["Resting_heart_rate_(bpm)"].mean(), 2),
-                    "HRV": round(df["Heart_rate_variability_(ms)"].mean(), 2),
-                    "Sleep Perf": round(df["Sleep_performance_"].mean(), 2),
-                    "Sleep Debt": round(df["Sleep_debt_(min)"].mean(), 2) if "Sleep_debt_(min)" in df else 0,
+                    "Recovery": st.mean("Recovery_score_"),
+                    "Rest HR": st.mean("Resting_heart_rate_(bpm)"),
+                    "HRV": st.mean("Heart_rate_variability_(ms)"),
+                    "Sleep Perf": st.mean("Sleep_performance_"),
+                    "Sleep Debt": st.mean("Sleep_debt_(min)") if "Sleep_debt_(min)" in st else 0,
                 }
-                bar_chart = make_bar_chart(averages)
-                # Pie chart for low recovery
-                pie_low_recovery = make_pie_chart(
-                    ["Low Recovery (<50)", "Normal/High"],
-                    [low_recovery_count, total_days - low_recovery_count],
-                    ["#c0392b", "#27ae60"],
-                    "Low Recovery Days"
-                )
-                # Pie chart for high sleep debt
-                pie_high_sleep_debt = make_pie_chart(
-                    ["High Sleep Debt (>100)", "Normal/Low"],
-                    [high_sleep_debt_count, total_days - high_sleep_debt_count],
-                    ["#e67e22", "#3498db"],
-                    "High Sleep Debt Days"
-                )
+                # Bar chart + low recovery / high sleep debt pies (cached, see charts.py)
+                with span("charts"):
+                    bar_chart, pie_low_recovery, pie_high_sleep_debt = render_charts([
+                        bar_spec(averages, colors=['#3498db', '#e67e22', '#27ae60', '#c0392b', '#8e44ad']),
+                        pie_spec(
+                            ["Low Recovery (<50)", "Normal/High"],
+                            [low_recovery_count, total_days - low_recovery_count],
+                            "Low Recovery Days",
+                            colors=["#c0392b", "#27ae60"]
+                        ),
+                        pie_spec(
+                            ["High Sleep Debt (>100)", "Normal/Low"],
+                            [high_sleep_debt_count, total_days - high_sleep_debt_count],
+                            "High Sleep Debt Days",
+                            colors=["#e67e22", "#3498db"]
+                        ),
+                    ])
                 # Recovery score distribution
-                recovery_dist = {
-                    "Low": int((df["Recovery_score_"] < 50).sum()),
-                    "Medium": int(((df["Recovery_score_"] >= 50) & (df["Recovery_score_"] < 80)).sum()),
-                    "High": int((df["Recovery_score_"] >= 80).sum())
-                }
+                recovery_dist = st.buckets("Recovery_score_")
                 # Sleep debt distribution
-                if "Sleep_debt_(min)" in df:
-                    sleep_debt_dist = {
-                        "Low": int((df["Sleep_debt_(min)"] < 30).sum()),
-                        "Moderate": int(((df["Sleep_debt_(min)"] >= 30) & (df["Sleep_debt_(min)"] < 100)).sum()),
-                        "High": int((df["Sleep_debt_(min)"] >= 100).sum())
-                    }
+                if "Sleep_debt_(min)" in st:
+                    sleep_debt_dist = st.buckets("Sleep_debt_(min)")
                 else:
                     sleep_debt_dist = {"Low": 0, "Moderate": 0, "High": 0}
                 # Highlights
-                best_recovery = df.nlargest(3, "Recovery_score_")[["Cycle_start_time", "Recovery_score_"]]
-                worst_recovery = df.nsmallest(3, "Recovery_score_")[["Cycle_start_time", "Recovery_score_"]]
+                best_recovery = st.highlights("Recovery_score_")
+                worst_recovery = st.highlights("Recovery_score_", largest=False)
                 best_recovery_html = best_recovery.to_html(index=False) if not best_recovery.empty else "<i>None</i>"
                 worst_recovery_html = worst_recovery.to_html(index=False) if not worst_recovery.empty else "<i>None</i>"
-                if "Sleep_debt_(min)" in df:
-                    highest_sleep_debt = df.nlargest(3, "Sleep_debt_(min)")[["Cycle_start_time", "Sleep_debt_(min)"]]
-                    lowest_sleep_debt = df.nsmallest(3, "Sleep_debt_(min)")[["Cycle_start_time", "Sleep_debt_(min)"]]
+                if "Sleep_debt_(min)" in st:
+                    highest_sleep_debt = st.highlights("Sleep_debt_(min)")
+                    lowest_sleep_debt = st.highlights("Sleep_debt_(min)", largest=False)
                     highest_sleep_debt_html = highest_sleep_debt.to_html(index=False) if not highest_sleep_debt.empty else "<i>None</i>"
                     lowest_sleep_debt_html = lowest_sleep_debt.to_html(index=False) if not lowest_sleep_debt.empty else "<i>None</i>"
                 else:
                     highest_sleep_debt_html = "<i>Not available</i>"
                     lowest_sleep_debt_html = "<i>Not available</i>"
-                return render_template_string(
-                    HTML_RESULT,
+                return render_template(
+                    "whoop_band/result.html",
                     summary_stats=summary_stats,
                     avg_sleep_debt=avg_sleep_debt,
                     low_recovery_count=low_recovery_count,
@@ -240,14 +255,17 @@ def upload_file():
                     highest_sleep_debt_html=highest_sleep_debt_html,
                     lowest_sleep_debt_html=lowest_sleep_debt_html,
                     recovery_dist=recovery_dist,
-                    sleep_debt_dist=sleep_debt_dist
+                    sleep_debt_dist=sleep_debt_dist,
+                    baselines=baseline_table
                 )
             except Exception as e:
                 error = f"Error processing file: {e}"
-                return render_template_string(HTML_FORM, error=error)
+                return render_template("whoop_band/form.html", error=error)
+            finally:
+                uploads.release(holder)
         else:
             error = "Please upload a CSV file."
-    return render_template_string(HTML_FORM, error=error)
+    return render_template("whoop_band/form.html", error=error)
 
 if __name__ == '__main__':
     app.run(host="127.0.0.1", port=5050, debug=True) 
\ No newline at end of file
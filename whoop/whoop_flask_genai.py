@@ -1,23 +1,48 @@
 # app_whoop.py
-from flask import Flask, render_template_string, request, url_for
+from flask import Flask, render_template, request, url_for
 import pandas as pd
 import os
-import matplotlib.pyplot as plt
-import io
-import base64
-from werkzeug.utils import secure_filename
-from dotenv import load_dotenv
-from openai import OpenAI
 import sys
 
-# --- Load OpenAI API key from .env ---
-load_dotenv("C:\\EUacademy\\.env")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.streaming import print_stream
+from common.llm_gateway import gateway, NOT_CONFIGURED
+from common.answer_cache import AnswerCache
+from common.prompt_context import ContextBuilder, num
+from common.metrics import install_metrics, span
+from common.templates import install_templates
+from charts import bar_spec, pie_spec, render_charts
+from stats_kernel import summarize
+from stats_stream import should_stream, summarize_csv
+from ingest import read_whoop_csv
+from baselines import BaselineTracker, RecentCycles, baseline_rows, baseline_lines
+from upload_store import UploadStore
+
+# --- OpenAI via the shared gateway (see common/llm_gateway.py); None without a key ---
+llm = gateway()
+# Repeat questions about the same CSV summary are answered from memory (LLM_CACHE_*).
+answer_cache = AnswerCache()
+COACH_SYSTEM = "You are a health & sleep coach. Be concise, numeric, and actionable."
+
+# Each upload is analyzed on its own: this app has no session to tell whose
+# export it is, so there is no history to merge it into (history.py keeps one
+# per owner; see whoop_flassk_genai_3.py).
+# Rolling 7/30/90-day baselines over the upload (see baselines.py).
+baselines = BaselineTracker()
+# Exports above WHOOP_STREAM_MB are summarized in chunks instead (see
+# stats_stream.py); their baselines come from the export's last 90 days.
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Uploads are stored by content hash with a size quota (see upload_store.py).
+uploads = UploadStore(app.config['UPLOAD_FOLDER'])
+# Per-stage timings: Server-Timing header + GET /metrics (APP_METRICS, see common/metrics.py).
+install_metrics(app, "whoop_genai")
+
+SUMMARY_COLUMNS = ["Recovery_score_", "Resting_heart_rate_(bpm)", "Heart_rate_variability_(ms)", "Sleep_performance_"]
+OPTIONAL_COLUMNS = ["Asleep_duration_(min)", "Sleep_efficiency_", "Sleep_consistency_", "Day_Strain", "Energy_burned_(cal)"]
+VIEW_COLUMNS = ["Cycle_start_time"] + SUMMARY_COLUMNS + OPTIONAL_COLUMNS + ["Sleep_debt_(min)"]
 
 HTML_FORM = """
 <!doctype html>
@@ -74,6 +99,31 @@ button { background: #0b4f8a; color:#fff; padding:8px 14px; border:none; border-
   </ul>
 </div>
 
+<h3>Rolling Baselines</h3>
+{% if baselines %}
+<p>Latest cycle vs the cycles of the previous 7 / 30 / 90 days: mean (min&ndash;max, n readings).</p>
+<table>
+  <tr>
+    <th>Metric</th>
+    <th>Latest</th>
+    <th>7-day</th>
+    <th>30-day</th>
+    <th>90-day</th>
+    <th>vs 30-day mean</th>
+  </tr>
+  {% for b in baselines %}
+  <tr>
+    <td>{{ b.label }}</td>
+    <td>{{ b.latest }}</td>
+    {% for w in b.windows %}<td>{{ w }}</td>{% endfor %}
+    <td>{{ b.deviation }}</td>
+  </tr>
+  {% endfor %}
+</table>
+{% else %}
+<p><i>Not available</i></p>
+{% endif %}
+
 <h3>Overall Metrics (Bar Chart)</h3>
 <img src="data:image/png;base64,{{ bar_chart }}" alt="Average Metrics">
 
@@ -147,50 +197,39 @@ button { background: #0b4f8a; color:#fff; padding:8px 14px; border:none; border-
 <br>
 <a href="{{ url_for('upload_file') }}">Analyze another file</a>
 """
-
-def plot_to_base64(fig):
-    buf = io.BytesIO()
-    fig.savefig(buf, format="png", bbox_inches='tight')
-    buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close(fig)
-    return img_base64
-
-def make_bar_chart(averages):
-    fig, ax = plt.subplots(figsize=(7, 3))
-    # Use default matplotlib colors (no explicit color set)
-    ax.bar(list(averages.keys()), list(averages.values()))
-    ax.set_ylabel('Average Value')
-    ax.set_title('Average Key Metrics')
-    plt.xticks(rotation=20)
-    return plot_to_base64(fig)
-
-def make_pie_chart(labels, sizes, title):
-    fig, ax = plt.subplots(figsize=(4, 4))
-    ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90)
-    ax.set_title(title)
-    return plot_to_base64(fig)
-
-def df_to_summary_context(df, summary_stats, recovery_dist, sleep_debt_dist, low_recovery, high_sleep_debt):
-    lines = []
-    lines.append(f"Rows (days): {len(df)}")
-    lines.append(f"Avg Recovery: {summary_stats['Recovery_score_']['mean']}")
-    lines.append(f"Avg Rest HR (bpm): {summary_stats['Resting_heart_rate_(bpm)']['mean']}")
-    lines.append(f"Avg HRV (ms): {summary_stats['Heart_rate_variability_(ms)']['mean']}")
-    lines.append(f"Avg Sleep Perf: {summary_stats['Sleep_performance_']['mean']}")
-    if "Sleep_debt_(min)" in df.columns:
-        lines.append(f"Avg Sleep Debt (min): {round(df['Sleep_debt_(min)'].mean(),2)}")
-        lines.append(f"High Sleep Debt Days (>100): {len(high_sleep_debt)}")
-    lines.append(f"Recovery Dist Low/Med/High: {recovery_dist}")
+# Compiled once here, rendered by name (see common/templates.py).
+install_templates(app, {"whoop_genai/form.html": HTML_FORM, "whoop_genai/result.html": HTML_RESULT})
+
+def df_to_summary_context(st, summary_stats, recovery_dist, sleep_debt_dist, low_recovery, high_sleep_debt, baselines=None,
+                          model="gpt-4o-mini"):
+    # Averages are kept first, then baselines, distributions and example days,
+    # within the model's token budget (see common/prompt_context.py).
+    ctx = ContextBuilder(model)
+    averages = [
+        f"Rows (days): {st.rows}",
+        f"Avg Recovery: {num(summary_stats['Recovery_score_']['mean'])}",
+        f"Avg Rest HR (bpm): {num(summary_stats['Resting_heart_rate_(bpm)']['mean'])}",
+        f"Avg HRV (ms): {num(summary_stats['Heart_rate_variability_(ms)']['mean'])}",
+        f"Avg Sleep Perf: {num(summary_stats['Sleep_performance_']['mean'])}",
+    ]
+    if "Sleep_debt_(min)" in st:
+        averages.append(f"Avg Sleep Debt (min): {num(st.mean('Sleep_debt_(min)'))}")
+        averages.append(f"High Sleep Debt Days (>100): {st.count('Sleep_debt_(min)', '>', 100)}")
+    ctx.add(averages, priority=0)
+    dists = [f"Recovery Days Low/Med/High: {'/'.join(map(str, recovery_dist.values()))}"]
     if sleep_debt_dist:
-        lines.append(f"Sleep Debt Dist Low/Moderate/High: {sleep_debt_dist}")
-    # top/bottom days (compact)
-    if "Cycle_start_time" in df.columns:
-        lows = low_recovery.head(3).to_dict(orient="records")
-        highs = high_sleep_debt.head(3).to_dict(orient="records") if "Sleep_debt_(min)" in df.columns else []
-        lines.append(f"Lowest recovery examples: {lows}")
-        lines.append(f"Highest sleep debt examples: {highs}")
-    return "\n".join(lines)
+        dists.append(f"Sleep Debt Days Low/Moderate/High: {'/'.join(map(str, sleep_debt_dist.values()))}")
+    ctx.add(dists, priority=2)
+    ctx.add(baseline_lines(baselines) if baselines else [], priority=1)
+    # top/bottom days: date and value only
+    if "Cycle_start_time" in low_recovery.columns:
+        examples = [("Lowest recovery", low_recovery, "Recovery_score_")]
+        if "Sleep_debt_(min)" in st:
+            examples.append(("Highest sleep debt", high_sleep_debt, "Sleep_debt_(min)"))
+        ctx.add([f"{label} examples: " + "; ".join(f"{t} ({num(v)})" for t, v in
+                                                   zip(rows["Cycle_start_time"].head(3), rows[col].head(3)))
+                 for label, rows, col in examples if len(rows)], priority=3)
+    return ctx.build()
 
 @app.route('/', methods=['GET', 'POST'])
 def upload_file():
@@ -201,97 +240,81 @@ def upload_file():
     if request.method == 'POST' and 'file' not in request.files:
         # This is an OpenAI-only submit after results page
         error = "Please upload a CSV first, then ask a question."
-        return render_template_string(HTML_FORM, error=error)
+        return render_template("whoop_genai/form.html", error=error)
 
     if request.method == 'POST' and 'file' in request.files:
         file = request.files['file']
         if file.filename == '':
             error = "No selected file"
-            return render_template_string(HTML_FORM, error=error)
+            return render_template("whoop_genai/form.html", error=error)
         if file and file.filename.endswith('.csv'):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            # Referenced for this request only; afterwards the blob is cache.
+            holder = uploads.new_holder()
+            filepath = uploads.path(uploads.put(file.stream, holder))
             try:
-                df = pd.read_csv(filepath)
-                df.columns = df.columns.str.strip()
-                # Compute summaries (from your original app) :contentReference[oaicite:1]{index=1}
-                summary = {
-                    "Recovery_score_": df["Recovery_score_"].describe(),
-                    "Resting_heart_rate_(bpm)": df["Resting_heart_rate_(bpm)"].describe(),
-                    "Heart_rate_variability_(ms)": df["Heart_rate_variability_(ms)"].describe(),
-                    "Sleep_performance_": df["Sleep_performance_"].describe(),
-                }
+                with span("pandas"):
+                    if should_stream(filepath):
+                        df, recent = None, RecentCycles()
+                        st = summarize_csv(filepath, SUMMARY_COLUMNS + OPTIONAL_COLUMNS + ["Sleep_debt_(min)"], sinks=[recent])
+                    else:
+                        df = read_whoop_csv(filepath, columns=VIEW_COLUMNS)
+                        # Compute summaries (one kernel pass, see stats_kernel.py)
+                        st = summarize(df, SUMMARY_COLUMNS + OPTIONAL_COLUMNS + ["Sleep_debt_(min)"])
+                summary_stats = {c: st.describe(c) for c in SUMMARY_COLUMNS}
                 # Optional fields
-                for opt in ["Asleep_duration_(min)", "Sleep_efficiency_", "Sleep_consistency_", "Day_Strain", "Energy_burned_(cal)"]:
-                    if opt in df.columns:
-                        summary[opt] = df[opt].describe()
-
-                summary_stats = {k: v.round(2).to_dict() for k, v in summary.items()}
-                avg_sleep_debt = round(df["Sleep_debt_(min)"].mean(), 2) if "Sleep_debt_(min)" in df else "N/A"
+                for opt in OPTIONAL_COLUMNS:
+                    if opt in st:
+                        summary_stats[opt] = st.describe(opt)
+                has_debt = "Sleep_debt_(min)" in st
+                avg_sleep_debt = st.mean("Sleep_debt_(min)") if has_debt else "N/A"
 
                 # Low recovery and high sleep debt
-                low_recovery = df[df["Recovery_score_"] < 50][["Cycle_start_time", "Recovery_score_"]] \
-                    if "Cycle_start_time" in df.columns else df[df["Recovery_score_"] < 50][["Recovery_score_"]]
-                high_sleep_debt = (
-                    df[df["Sleep_debt_(min)"] > 100][["Cycle_start_time", "Sleep_debt_(min)"]]
-                    if "Sleep_debt_(min)" in df and "Cycle_start_time" in df.columns
-                    else df[df.get("Sleep_debt_(min)", pd.Series([])) > 100][["Sleep_debt_(min)"]] if "Sleep_debt_(min)" in df else pd.DataFrame()
-                )
-                low_recovery_count = len(low_recovery)
-                high_sleep_debt_count = len(high_sleep_debt)
-                total_days = len(df)
+                low_recovery_count = st.count("Recovery_score_", "<", 50)
+                high_sleep_debt_count = st.count("Sleep_debt_(min)", ">", 100) if has_debt else 0
+                total_days = st.rows
+
+                baseline_snapshot = baselines.snapshot(df) if df is not None else recent.snapshot()
 
                 # Bar chart for averages
                 averages = {
-                    "Recovery": round(df["Recovery_score_"].mean(), 2),
-                    "Rest HR": round(df["Resting_heart_rate_(bpm)"].mean(), 2),
-                    "HRV": round(df["Heart_rate_variability_(ms)"].mean(), 2),
-                    "Sleep Perf": round(df["Sleep_performance_"].mean(), 2),
-                    "Sleep Debt": round(df["Sleep_debt_(min)"].mean(), 2) if "Sleep_debt_(min)" in df else 0,
+                    "Recovery": st.mean("Recovery_score_"),
+                    "Rest HR": st.mean("Resting_heart_rate_(bpm)"),
+                    "HRV": st.mean("Heart_rate_variability_(ms)"),
+                    "Sleep Perf": st.mean("Sleep_performance_"),
+                    "Sleep Debt": st.mean("Sleep_debt_(min)") if has_debt else 0,
                 }
-                bar_chart = make_bar_chart(averages)
-
-                # Pie charts
-                pie_low_recovery = make_pie_chart(
-                    ["Low Recovery (<50)", "Normal/High"],
-                    [low_recovery_count, total_days - low_recovery_count],
-                    "Low Recovery Days"
-                )
-                pie_high_sleep_debt = make_pie_chart(
-                    ["High Sleep Debt (>100)", "Normal/Low"],
-                    [high_sleep_debt_count, total_days - high_sleep_debt_count],
-                    "High Sleep Debt Days"
-                )
+                # Bar chart + pie charts (cached, see charts.py)
+                with span("charts"):
+                    bar_chart, pie_low_recovery, pie_high_sleep_debt = render_charts([
+                        bar_spec(averages),
+                        pie_spec(
+                            ["Low Recovery (<50)", "Normal/High"],
+                            [low_recovery_count, total_days - low_recovery_count],
+                            "Low Recovery Days"
+                        ),
+                        pie_spec(
+                            ["High Sleep Debt (>100)", "Normal/Low"],
+                            [high_sleep_debt_count, total_days - high_sleep_debt_count],
+                            "High Sleep Debt Days"
+                        ),
+                    ])
 
                 # Distributions
-                recovery_dist = {
-                    "Low": int((df["Recovery_score_"] < 50).sum()),
-                    "Medium": int(((df["Recovery_score_"] >= 50) & (df["Recovery_score_"] < 80)).sum()),
-                    "High": int((df["Recovery_score_"] >= 80).sum())
-                }
-                if "Sleep_debt_(min)" in df:
-                    sleep_debt_dist = {
-                        "Low": int((df["Sleep_debt_(min)"] < 30).sum()),
-                        "Moderate": int(((df["Sleep_debt_(min)"] >= 30) & (df["Sleep_debt_(min)"] < 100)).sum()),
-                        "High": int((df["Sleep_debt_(min)"] >= 100).sum())
-                    }
+                recovery_dist = st.buckets("Recovery_score_")
+                if has_debt:
+                    sleep_debt_dist = st.buckets("Sleep_debt_(min)")
                 else:
                     sleep_debt_dist = {"Low": 0, "Moderate": 0, "High": 0}
 
                 # Highlights
-                best_recovery = df.nlargest(3, "Recovery_score_")[["Cycle_start_time", "Recovery_score_"]] \
-                    if "Cycle_start_time" in df.columns else df.nlargest(3, "Recovery_score_")[["Recovery_score_"]]
-                worst_recovery = df.nsmallest(3, "Recovery_score_")[["Cycle_start_time", "Recovery_score_"]] \
-                    if "Cycle_start_time" in df.columns else df.nsmallest(3, "Recovery_score_")[["Recovery_score_"]]
+                best_recovery = st.highlights("Recovery_score_")
+                worst_recovery = st.highlights("Recovery_score_", largest=False)
                 best_recovery_html = best_recovery.to_html(index=False) if not best_recovery.empty else "<i>None</i>"
                 worst_recovery_html = worst_recovery.to_html(index=False) if not worst_recovery.empty else "<i>None</i>"
 
-                if "Sleep_debt_(min)" in df:
-                    highest_sleep_debt = df.nlargest(3, "Sleep_debt_(min)")[["Cycle_start_time", "Sleep_debt_(min)"]] \
-                        if "Cycle_start_time" in df.columns else df.nlargest(3, "Sleep_debt_(min)")[["Sleep_debt_(min)"]]
-                    lowest_sleep_debt = df.nsmallest(3, "Sleep_debt_(min)")[["Cycle_start_time", "Sleep_debt_(min)"]] \
-                        if "Cycle_start_time" in df.columns else df.nsmallest(3, "Sleep_debt_(min)")[["Sleep_debt_(min)"]]
+                if has_debt:
+                    highest_sleep_debt = st.highlights("Sleep_debt_(min)")
+                    lowest_sleep_debt = st.highlights("Sleep_debt_(min)", largest=False)
                     highest_sleep_debt_html = highest_sleep_debt.to_html(index=False) if not highest_sleep_debt.empty else "<i>None</i>"
                     lowest_sleep_debt_html = lowest_sleep_debt.to_html(index=False) if not lowest_sleep_debt.empty else "<i>None</i>"
                 else:
@@ -301,38 +324,27 @@ def upload_file():
                 # If user entered a prompt on the same request, call OpenAI
                 prompt = request.form.get("prompt", "").strip()
                 answer = None
-                if prompt and client:
+                if prompt and llm:
+                    low_recovery = st.first_rows("Recovery_score_", "<", 50)
+                    high_sleep_debt = st.first_rows("Sleep_debt_(min)", ">", 100) if has_debt else pd.DataFrame()
                     context = df_to_summary_context(
-                        df, summary_stats, recovery_dist, sleep_debt_dist,
-                        low_recovery, high_sleep_debt
+                        st, summary_stats, recovery_dist, sleep_debt_dist,
+                        low_recovery, high_sleep_debt, baseline_snapshot
                     )
+                    def ask_openai():
+                        messages = [
+                            {"role":"system","content": COACH_SYSTEM},
+                            {"role":"user","content": f"Dataset summary:\n{context}\n\nUser prompt:\n{prompt}"}
+                        ]
+                        # Responses API where offered, else Chat Completions (probed once per process)
+                        return llm.ask(messages, model="gpt-4o-mini", temperature=0.2).strip()
                     try:
-                        # Try Responses API first; fall back to Chat Completions
-                        try:
-                            resp = client.responses.create(
-                                model="gpt-4o-mini",
-                                input=[
-                                    {"role":"system","content":"You are a health & sleep coach. Be concise, numeric, and actionable."},
-                                    {"role":"user","content": f"Dataset summary:\n{context}\n\nUser prompt:\n{prompt}"}
-                                ],
-                                temperature=0.2
-                            )
-                            answer = resp.output_text.strip()
-                        except Exception:
-                            resp = client.chat.completions.create(
-                                model="gpt-4o-mini",
-                                messages=[
-                                    {"role":"system","content":"You are a health & sleep coach. Be concise, numeric, and actionable."},
-                                    {"role":"user","content": f"Dataset summary:\n{context}\n\nUser prompt:\n{prompt}"}
-                                ],
-                                temperature=0.2
-                            )
-                            answer = resp.choices[0].message.content.strip()
+                        answer = answer_cache.get_or_call("gpt-4o-mini", COACH_SYSTEM, context, prompt, ask_openai)
                     except Exception as e:
                         answer = f"[OpenAI error] {e}"
 
-                return render_template_string(
-                    HTML_RESULT,
+                return render_template(
+                    "whoop_genai/result.html",
                     summary_stats=summary_stats,
                     avg_sleep_debt=avg_sleep_debt,
                     low_recovery_count=low_recovery_count,
@@ -346,21 +358,24 @@ def upload_file():
                     lowest_sleep_debt_html=lowest_sleep_debt_html,
                     recovery_dist=recovery_dist,
                     sleep_debt_dist=sleep_debt_dist,
+                    baselines=baseline_rows(baseline_snapshot),
                     prompt=prompt,
                     answer=answer
                 )
             except Exception as e:
                 error = f"Error processing file: {e}"
-                return render_template_string(HTML_FORM, error=error)
+                return render_template("whoop_genai/form.html", error=error)
+            finally:
+                uploads.release(holder)
         else:
             error = "Please upload a CSV file."
     # GET or initial state
-    return render_template_string(HTML_FORM, error=error)
+    return render_template("whoop_genai/form.html", error=error)
 
 # ---------- CLI chat mode (optional) ----------
 def cli_chat():
-    if not client:
-        print("OPENAI_API_KEY missing in C:\\EUacademy\\.env")
+    if not llm:
+        print(NOT_CONFIGURED)
         return
     # Load a CSV file for context (optional)
     try:
@@ -390,7 +405,8 @@ def cli_chat():
                 }
             low_recovery = df[df["Recovery_score_"] < 50]
             high_sleep_debt = df[df["Sleep_debt_(min)"] > 100] if "Sleep_debt_(min)" in df.columns else pd.DataFrame()
-            context = df_to_summary_context(df, summary_stats, recovery_dist, sleep_debt_dist, low_recovery, high_sleep_debt)
+            st = summarize(df, ["Sleep_debt_(min)"])
+            context = df_to_summary_context(st, summary_stats, recovery_dist, sleep_debt_dist, low_recovery, high_sleep_debt)
             print("Context prepared from CSV.")
         else:
             print("No CSV context. Chatting without context.")
@@ -408,27 +424,12 @@ def cli_chat():
             continue
         try:
             user_msg = f"Dataset summary:\n{context}\n\nUser prompt:\n{q}" if context else q
-            # same API strategy as web
-            try:
-                resp = client.responses.create(
-                    model="gpt-4o-mini",
-                    input=[
-                        {"role":"system","content":"You are a health & sleep coach. Be concise, numeric, and actionable."},
-                        {"role":"user","content": user_msg}
-                    ],
-                    temperature=0.2
-                )
-                print("\nAssistant:", resp.output_text.strip())
-            except Exception:
-                resp = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role":"system","content":"You are a health & sleep coach. Be concise, numeric, and actionable."},
-                        {"role":"user","content": user_msg}
-                    ],
-                    temperature=0.2
-                )
-                print("\nAssistant:", resp.choices[0].message.content.strip())
+            messages = [
+                {"role":"system","content":"You are a health & sleep coach. Be concise, numeric, and actionable."},
+                {"role":"user","content": user_msg}
+            ]
+            # same API strategy as web (Responses API, else chat.completions), streamed
+            print_stream(llm.stream(messages, model="gpt-4o-mini", temperature=0.2))
         except Exception as e:
             print(f"[OpenAI error] {e}")
 
@@ -1,148 +1,181 @@
 # whoop_flask_genai_2.py
-from flask import Flask, render_template_string, request, url_for, session, redirect
-import pandas as pd
-import os, io, base64
-import matplotlib.pyplot as plt
-from werkzeug.utils import secure_filename
-from dotenv import load_dotenv
-from openai import OpenAI
+from flask import Flask, render_template, request, url_for, session, redirect
+import os, re, sys, base64
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.llm_gateway import gateway, NOT_CONFIGURED
+from common.streaming import STREAM_SCRIPT, stream_answer, stream_error
+from common.answer_cache import AnswerCache, SEMANTIC_ENABLED
+from common.prompt_context import ContextBuilder, num, count_tokens, counter_name, stats as prompt_context_stats
+from common.server_session import install_session_store
+from common.api import etag_for, not_modified, json_response, binary_response, api_error
+from common.metrics import install_metrics, span, timed, stats as metrics_stats
+from common.templates import install_templates
+from page_cache import PageModelCache
+from charts import bar_spec, pie_spec, render_charts, STYLE_VERSION
+from stats_kernel import summarize
+from stats_stream import should_stream, summarize_csv
+from ingest import read_whoop_csv
+from history import open_history
+from baselines import BaselineTracker, OwnerBaselines, RecentCycles, baseline_rows, baseline_lines
+from cohort import CohortStore, cached_report
+from upload_store import UploadStore
 
 # --- Config & OpenAI ---
-load_dotenv("C:\\EUacademy\\.env")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+# The shared OpenAI gateway: one pooled async client with timeouts and bounded
+# concurrency, retries, a circuit breaker and a once-per-process choice between
+# the Responses and Chat Completions APIs (see common/llm_gateway.py).
+llm = gateway()
+# Repeat questions about the same summary are answered from memory (LLM_CACHE_*;
+# LLM_CACHE_SEMANTIC=1 also matches near-duplicate prompts via embeddings).
+answer_cache = AnswerCache(embed=llm.embed if llm and SEMANTIC_ENABLED else None)
+COACH_SYSTEM = "You are a health & sleep coach. Be concise, numeric, and actionable."
+# Uploads are merged into a deduplicated local history per session, owned by
+# its upload holder (WHOOP_HISTORY_DIR, see history.py); the dashboard covers
+# every cycle this session has uploaded so far, and /clear deletes it.
+history = open_history()
+# Rolling 7/30/90-day baselines per history owner, updated per new day (see baselines.py).
+baselines = OwnerBaselines()
+# Computed dashboards per (source, mtime, size), the source being the session's
+# history manifest or, with WHOOP_HISTORY=0, the uploaded CSV; WHOOP_PAGE_CACHE_MB bounds memory.
+# Exports above WHOOP_STREAM_MB are summarized from the upload in chunks (see
+# stats_stream.py) and skip the history; their baselines come from the export's
+# last 90 days.
+page_models = PageModelCache(max_bytes=int(os.environ.get("WHOOP_PAGE_CACHE_MB", "64")) * 1024 * 1024)
+# The JSON API (/api/v1/whoop/...) describes one upload on its own, never the
+# merged history, so its results depend only on the upload's hash (the ETag).
+api_models = PageModelCache(max_bytes=int(os.environ.get("WHOOP_PAGE_CACHE_MB", "64")) * 1024 * 1024)
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-# session cookie for context; OK for local dev
+# Uploads are stored by content hash with a size quota (see upload_store.py);
+# the session references its upload's hash until it is replaced or cleared.
+uploads = UploadStore(app.config['UPLOAD_FOLDER'])
+# Cohort athletes: a label plus an upload each (see cohort.py).
+cohort = CohortStore(uploads)
+
+# Summary context and upload hash live server-side (SESSION_BACKEND=memory|sqlite|cookie);
+# the cookie only carries an opaque session id.
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev-change-me")
 app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
 app.config["SESSION_COOKIE_SECURE"] = False
+install_session_store(app)
+# Per-stage timings: Server-Timing header + GET /metrics (APP_METRICS, see common/metrics.py).
+install_metrics(app, "whoop_genai_3")
 
 # ----------------- Helpers -----------------
-def plot_to_base64(fig):
-    buf = io.BytesIO()
-    fig.savefig(buf, format="png", bbox_inches='tight')
-    buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close(fig)
-    return img_base64
-
-def make_bar_chart(averages):
-    fig, ax = plt.subplots(figsize=(7, 3))
-    ax.bar(list(averages.keys()), list(averages.values()))  # default colors
-    ax.set_ylabel('Average Value')
-    ax.set_title('Average Key Metrics')
-    plt.xticks(rotation=20)
-    return plot_to_base64(fig)
-
-def make_pie_chart(labels, sizes, title):
-    fig, ax = plt.subplots(figsize=(8, 8))
-    ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90)
-    ax.set_title(title)
-    return plot_to_base64(fig)
-
-def df_to_summary_context(df, summary_stats, recovery_dist, sleep_debt_dist, low_recovery, high_sleep_debt):
-    lines = []
-    lines.append(f"Rows (days): {len(df)}")
-    lines.append(f"Avg Recovery: {summary_stats['Recovery_score_']['mean']}")
-    lines.append(f"Avg Rest HR (bpm): {summary_stats['Resting_heart_rate_(bpm)']['mean']}")
-    lines.append(f"Avg HRV (ms): {summary_stats['Heart_rate_variability_(ms)']['mean']}")
-    lines.append(f"Avg Sleep Perf: {summary_stats['Sleep_performance_']['mean']}")
-    if "Sleep_debt_(min)" in df.columns:
-        lines.append(f"Avg Sleep Debt (min): {round(df['Sleep_debt_(min)'].mean(),2)}")
-        lines.append(f"High Sleep Debt Days (>100): {len(high_sleep_debt)}")
-    lines.append(f"Recovery Dist Low/Med/High: {recovery_dist}")
+SUMMARY_COLUMNS = ["Recovery_score_", "Resting_heart_rate_(bpm)", "Heart_rate_variability_(ms)", "Sleep_performance_"]
+VIEW_COLUMNS = ["Cycle_start_time"] + SUMMARY_COLUMNS + ["Sleep_debt_(min)"]
+
+def df_to_summary_context(st, summary_stats, recovery_dist, sleep_debt_dist, high_sleep_debt_count, baselines=None,
+                          model="gpt-4o-mini"):
+    # Averages are kept first, then baselines, then distributions, within the
+    # model's token budget (see common/prompt_context.py).
+    ctx = ContextBuilder(model)
+    averages = [
+        f"Rows (days): {st.rows}",
+        f"Avg Recovery: {num(summary_stats['Recovery_score_']['mean'])}",
+        f"Avg Rest HR (bpm): {num(summary_stats['Resting_heart_rate_(bpm)']['mean'])}",
+        f"Avg HRV (ms): {num(summary_stats['Heart_rate_variability_(ms)']['mean'])}",
+        f"Avg Sleep Perf: {num(summary_stats['Sleep_performance_']['mean'])}",
+    ]
+    if "Sleep_debt_(min)" in st:
+        averages.append(f"Avg Sleep Debt (min): {num(st.mean('Sleep_debt_(min)'))}")
+        averages.append(f"High Sleep Debt Days (>100): {high_sleep_debt_count}")
+    ctx.add(averages, priority=0)
+    dists = [f"Recovery Days Low/Med/High: {'/'.join(map(str, recovery_dist.values()))}"]
     if sleep_debt_dist:
-        lines.append(f"Sleep Debt Dist Low/Moderate/High: {sleep_debt_dist}")
-    return "\n".join(lines)
+        dists.append(f"Sleep Debt Days Low/Moderate/High: {'/'.join(map(str, sleep_debt_dist.values()))}")
+    ctx.add(dists, priority=2)
+    ctx.add(baseline_lines(baselines) if baselines else [], priority=1)
+    return ctx.build()
+
+def session_history():
+    # The caller's own history store, or None (WHOOP_HISTORY=0, no upload yet).
+    holder = session.get("upload_holder")
+    return history.store(holder) if history and holder else None
+
+def page_source(csv_path, store):
+    return store.manifest_path if store and not should_stream(csv_path) else csv_path
+
+@timed("pandas")
+def summarize_source(source, tracker, store=None):
+    # (Summary, baseline snapshot) for a history manifest or a CSV.
+    if store and source == store.manifest_path:
+        df = store.frame(VIEW_COLUMNS)
+    elif should_stream(source):
+        df = None
+    else:
+        df = read_whoop_csv(source, columns=VIEW_COLUMNS)
+    if df is None:
+        recent = RecentCycles()
+        st = summarize_csv(source, SUMMARY_COLUMNS + ["Sleep_debt_(min)"], sinks=[recent])
+        return st, recent.snapshot()
+    # One kernel pass over the metric columns (see stats_kernel.py)
+    st = summarize(df, SUMMARY_COLUMNS + ["Sleep_debt_(min)"])
+    return st, tracker.snapshot(df)
+
+def chart_specs(st, low_recovery_count, high_sleep_debt_count):
+    # {name: spec}, in page order; the names are the API's chart resources.
+    has_debt = "Sleep_debt_(min)" in st
+    averages = {
+        "Recovery": st.mean("Recovery_score_"),
+        "Rest HR": st.mean("Resting_heart_rate_(bpm)"),
+        "HRV": st.mean("Heart_rate_variability_(ms)"),
+        "Sleep Perf": st.mean("Sleep_performance_"),
+        "Sleep Debt": st.mean("Sleep_debt_(min)") if has_debt else 0,
+    }
+    return {
+        "averages": bar_spec(averages),
+        "low_recovery": pie_spec(
+            ["Low Recovery (<50)", "Normal/High"],
+            [low_recovery_count, st.rows - low_recovery_count],
+            "Low Recovery Days", size=8
+        ),
+        "high_sleep_debt": pie_spec(
+            ["High Sleep Debt (>100)", "Normal/Low"],
+            [high_sleep_debt_count, st.rows - high_sleep_debt_count],
+            "High Sleep Debt Days", size=8
+        ),
+    }
 
-def build_page_from_csv(csv_path, prompt_text=None, answer_text=None):
-    df = pd.read_csv(csv_path)
-    df.columns = df.columns.str.strip()
+def compute_page_model(source, tracker, store=None):
+    st, baseline_snapshot = summarize_source(source, tracker, store)
+    has_debt = "Sleep_debt_(min)" in st
 
-    summary = {
-        "Recovery_score_": df["Recovery_score_"].describe(),
-        "Resting_heart_rate_(bpm)": df["Resting_heart_rate_(bpm)"].describe(),
-        "Heart_rate_variability_(ms)": df["Heart_rate_variability_(ms)"].describe(),
-        "Sleep_performance_": df["Sleep_performance_"].describe(),
-    }
-    summary_stats = {k: v.round(2).to_dict() for k, v in summary.items()}
-    avg_sleep_debt = round(df["Sleep_debt_(min)"].mean(), 2) if "Sleep_debt_(min)" in df else "N/A"
+    summary_stats = {c: st.describe(c) for c in SUMMARY_COLUMNS}
+    avg_sleep_debt = st.mean("Sleep_debt_(min)") if has_debt else "N/A"
 
     # Dists & counts
-    low_recovery = df[df["Recovery_score_"] < 50][["Cycle_start_time", "Recovery_score_"]] \
-        if "Cycle_start_time" in df.columns else df[df["Recovery_score_"] < 50][["Recovery_score_"]]
-    high_sleep_debt = (
-        df[df["Sleep_debt_(min)"] > 100][["Cycle_start_time", "Sleep_debt_(min)"]]
-        if "Sleep_debt_(min)" in df and "Cycle_start_time" in df.columns
-        else df[df.get("Sleep_debt_(min)", pd.Series([])) > 100][["Sleep_debt_(min)"]]
-        if "Sleep_debt_(min)" in df else pd.DataFrame()
-    )
-    low_recovery_count = len(low_recovery)
-    high_sleep_debt_count = len(high_sleep_debt)
-    total_days = len(df)
+    low_recovery_count = st.count("Recovery_score_", "<", 50)
+    high_sleep_debt_count = st.count("Sleep_debt_(min)", ">", 100) if has_debt else 0
 
     # Charts
-    averages = {
-        "Recovery": round(df["Recovery_score_"].mean(), 2),
-        "Rest HR": round(df["Resting_heart_rate_(bpm)"].mean(), 2),
-        "HRV": round(df["Heart_rate_variability_(ms)"].mean(), 2),
-        "Sleep Perf": round(df["Sleep_performance_"].mean(), 2),
-        "Sleep Debt": round(df["Sleep_debt_(min)"].mean(), 2) if "Sleep_debt_(min)" in df else 0,
-    }
-    bar_chart = make_bar_chart(averages)
+    with span("charts"):
+        bar_chart, pie_low_recovery, pie_high_sleep_debt = render_charts(
+            list(chart_specs(st, low_recovery_count, high_sleep_debt_count).values()))
 
-    pie_low_recovery = make_pie_chart(
-        ["Low Recovery (<50)", "Normal/High"],
-        [low_recovery_count, total_days - low_recovery_count],
-        "Low Recovery Days"
-    )
-    pie_high_sleep_debt = make_pie_chart(
-        ["High Sleep Debt (>100)", "Normal/Low"],
-        [high_sleep_debt_count, total_days - high_sleep_debt_count],
-        "High Sleep Debt Days"
-    )
-
-    recovery_dist = {
-        "Low": int((df["Recovery_score_"] < 50).sum()),
-        "Medium": int(((df["Recovery_score_"] >= 50) & (df["Recovery_score_"] < 80)).sum()),
-        "High": int((df["Recovery_score_"] >= 80).sum())
-    }
-    if "Sleep_debt_(min)" in df:
-        sleep_debt_dist = {
-            "Low": int((df["Sleep_debt_(min)"] < 30).sum()),
-            "Moderate": int(((df["Sleep_debt_(min)"] >= 30) & (df["Sleep_debt_(min)"] < 100)).sum()),
-            "High": int((df["Sleep_debt_(min)"] >= 100).sum())
-        }
-    else:
-        sleep_debt_dist = {"Low": 0, "Moderate": 0, "High": 0}
+    recovery_dist = st.buckets("Recovery_score_")
+    sleep_debt_dist = st.buckets("Sleep_debt_(min)") if has_debt else {"Low": 0, "Moderate": 0, "High": 0}
 
     # Highlights
-    best_recovery = df.nlargest(3, "Recovery_score_")[["Cycle_start_time", "Recovery_score_"]] \
-        if "Cycle_start_time" in df.columns else df.nlargest(3, "Recovery_score_")[["Recovery_score_"]]
-    worst_recovery = df.nsmallest(3, "Recovery_score_")[["Cycle_start_time", "Recovery_score_"]] \
-        if "Cycle_start_time" in df.columns else df.nsmallest(3, "Recovery_score_")[["Recovery_score_"]]
+    best_recovery = st.highlights("Recovery_score_")
+    worst_recovery = st.highlights("Recovery_score_", largest=False)
     best_recovery_html = best_recovery.to_html(index=False) if not best_recovery.empty else "<i>None</i>"
     worst_recovery_html = worst_recovery.to_html(index=False) if not worst_recovery.empty else "<i>None</i>"
 
-    if "Sleep_debt_(min)" in df.columns:
-        highest_sleep_debt = df.nlargest(3, "Sleep_debt_(min)")[["Cycle_start_time", "Sleep_debt_(min)"]] \
-            if "Cycle_start_time" in df.columns else df.nlargest(3, "Sleep_debt_(min)")[["Sleep_debt_(min)"]]
-        lowest_sleep_debt = df.nsmallest(3, "Sleep_debt_(min)")[["Cycle_start_time", "Sleep_debt_(min)"]] \
-            if "Cycle_start_time" in df.columns else df.nsmallest(3, "Sleep_debt_(min)")[["Sleep_debt_(min)"]]
+    if has_debt:
+        highest_sleep_debt = st.highlights("Sleep_debt_(min)")
+        lowest_sleep_debt = st.highlights("Sleep_debt_(min)", largest=False)
         highest_sleep_debt_html = highest_sleep_debt.to_html(index=False) if not highest_sleep_debt.empty else "<i>None</i>"
         lowest_sleep_debt_html = lowest_sleep_debt.to_html(index=False) if not lowest_sleep_debt.empty else "<i>None</i>"
     else:
         highest_sleep_debt_html = "<i>Not available</i>"
         lowest_sleep_debt_html = "<i>Not available</i>"
 
-    # Build + store context
-    context = df_to_summary_context(df, summary_stats, recovery_dist, sleep_debt_dist, low_recovery, high_sleep_debt)
-    session["csv_path"] = csv_path
-    session["summary_context"] = context
+    context = df_to_summary_context(st, summary_stats, recovery_dist, sleep_debt_dist, high_sleep_debt_count,
+                                    baseline_snapshot)
 
     return dict(
         summary_stats=summary_stats,
@@ -158,39 +191,78 @@ def build_page_from_csv(csv_path, prompt_text=None, answer_text=None):
         lowest_sleep_debt_html=lowest_sleep_debt_html,
         recovery_dist=recovery_dist,
         sleep_debt_dist=sleep_debt_dist,
-        prompt=prompt_text or "",
-        answer=answer_text or None
+        baselines=baseline_rows(baseline_snapshot),
+        summary_context=context,
     )
 
+def build_page_from_csv(csv_path, prompt_text=None, answer_text=None):
+    # Follow-up prompts reuse the cached model; only the LLM call is new.
+    store = session_history()
+    if store and not should_stream(csv_path) and not os.path.exists(store.manifest_path):
+        # Pruned, or a session from before per-session history: start from its upload.
+        store.upsert(csv_path)
+    tracker = baselines.tracker(session["upload_holder"], store) if store else BaselineTracker()
+    page = dict(page_models.get_or_build(page_source(csv_path, store),
+                                         lambda source: compute_page_model(source, tracker, store)))
+    context = page.pop("summary_context")
+    if session.get("summary_context") != context:
+        session["summary_context"] = context
+    return dict(page, prompt=prompt_text or "", answer=answer_text or None)
+
+def compute_api_model(csv_path):
+    # Baselines from the upload alone: a tracker without a history store.
+    st, baseline_snapshot = summarize_source(csv_path, BaselineTracker())
+    has_debt = "Sleep_debt_(min)" in st
+    low_recovery_count = st.count("Recovery_score_", "<", 50)
+    high_sleep_debt_count = st.count("Sleep_debt_(min)", ">", 100) if has_debt else 0
+    highlights = {
+        "best_recovery": st.highlights("Recovery_score_"),
+        "worst_recovery": st.highlights("Recovery_score_", largest=False),
+    }
+    if has_debt:
+        highlights["highest_sleep_debt"] = st.highlights("Sleep_debt_(min)")
+        highlights["lowest_sleep_debt"] = st.highlights("Sleep_debt_(min)", largest=False)
+    summary = {
+        "rows": st.rows,
+        "stats": {c: st.describe(c) for c in st.columns},
+        "counts": {"low_recovery": low_recovery_count, "high_sleep_debt": high_sleep_debt_count},
+        "recovery_dist": st.buckets("Recovery_score_"),
+        "sleep_debt_dist": st.buckets("Sleep_debt_(min)") if has_debt else None,
+        "highlights": {k: v.to_dict("records") for k, v in highlights.items()},
+        "baselines": baseline_snapshot,
+    }
+    return {"summary": summary, "charts": chart_specs(st, low_recovery_count, high_sleep_debt_count)}
+
+def api_model(digest):
+    csv_path = uploads.path(digest)
+    return api_models.get_or_build(csv_path, compute_api_model) if csv_path else None
+
+def coach_messages(context, prompt):
+    return [
+        {"role":"system","content": COACH_SYSTEM},
+        {"role":"user","content": f"Dataset summary:\n{context}\n\nUser prompt:\n{prompt}"}
+    ]
+
+def ask_openai(messages):
+    # Responses API where offered, else chat.completions (probed once by the gateway)
+    return llm.ask(messages, model="gpt-4o-mini", temperature=0.2).strip()
+
 def call_openai(context, prompt):
-    if not client:
-        return "[OpenAI not configured: set OPENAI_API_KEY in C:\\EUacademy\\.env]"
+    if not llm:
+        return NOT_CONFIGURED
+    messages = coach_messages(context, prompt)
     try:
-        # Try new Responses API first
-        try:
-            resp = client.responses.create(
-                model="gpt-4o-mini",
-                input=[
-                    {"role":"system","content":"You are a health & sleep coach. Be concise, numeric, and actionable."},
-                    {"role":"user","content": f"Dataset summary:\n{context}\n\nUser prompt:\n{prompt}"}
-                ],
-                temperature=0.2
-            )
-            return resp.output_text.strip()
-        except Exception:
-            # Fallback to chat.completions
-            resp = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role":"system","content":"You are a health & sleep coach. Be concise, numeric, and actionable."},
-                    {"role":"user","content": f"Dataset summary:\n{context}\n\nUser prompt:\n{prompt}"}
-                ],
-                temperature=0.2
-            )
-            return resp.choices[0].message.content.strip()
+        return answer_cache.get_or_call("gpt-4o-mini", COACH_SYSTEM, context, prompt,
+                                        lambda: ask_openai(messages))
     except Exception as e:
         return f"[OpenAI error] {e}"
 
+def stream_openai(context, prompt):
+    # Same API strategy (and cache) as call_openai, as a generator of text deltas.
+    messages = coach_messages(context, prompt)
+    return answer_cache.stream("gpt-4o-mini", COACH_SYSTEM, context, prompt,
+                               lambda: llm.stream(messages, model="gpt-4o-mini", temperature=0.2))
+
 # ----------------- Bootstrap Layout -----------------
 TEMPLATE = """
 <!doctype html>
@@ -216,6 +288,7 @@ TEMPLATE = """
           <div class="col-auto"><input class="form-control" type="file" name="file" accept=".csv" required></div>
           <div class="col-auto"><button class="btn btn-primary" type="submit">Analyze</button></div>
           <div class="col-auto"><a class="btn btn-outline-secondary" href="{{ url_for('clear') }}">Clear context</a></div>
+          <div class="col-auto"><a class="btn btn-outline-dark" href="{{ url_for('cohort_page') }}">Cohort</a></div>
           <div class="col-auto"><a class="btn btn-outline-dark" href="{{ url_for('debug') }}">/debug</a></div>
         </div>
       </form>
@@ -275,6 +348,23 @@ TEMPLATE = """
 
       <hr>
 
+      <h6>Rolling Baselines</h6>
+      {% if baselines %}
+      <p class="text-secondary small">Latest cycle vs the cycles of the previous 7 / 30 / 90 days: mean (min&ndash;max, n readings).</p>
+      <table class="table table-sm table-striped">
+        <thead><tr><th>Metric</th><th>Latest</th><th>7-day</th><th>30-day</th><th>90-day</th><th>vs 30-day mean</th></tr></thead>
+        <tbody>
+          {% for b in baselines %}
+          <tr><td>{{ b.label }}</td><td>{{ b.latest }}</td>{% for w in b.windows %}<td>{{ w }}</td>{% endfor %}<td>{{ b.deviation }}</td></tr>
+          {% endfor %}
+        </tbody>
+      </table>
+      {% else %}
+      <p><i>Not available</i></p>
+      {% endif %}
+
+      <hr>
+
       <h6>Highlights</h6>
       <div class="row">
         <div class="col-md-6">
@@ -301,22 +391,91 @@ TEMPLATE = """
       {% if not has_context %}
         <div class="text-secondary">Upload a CSV first to give the assistant context. You can still type a question—I'll remind you.</div>
       {% endif %}
-      <form method="post" action="{{ url_for('upload_file') }}">
+      <form method="post" action="{{ url_for('upload_file') }}" id="ask-form" data-stream="{{ url_for('ask_stream') }}">
         <textarea class="form-control" name="prompt" rows="4" placeholder="E.g., Suggest a 7-day plan to improve HRV given my averages and bad days.">{{ prompt or '' }}</textarea>
         <div class="mt-3">
           <button class="btn btn-primary" type="submit">Ask</button>
         </div>
       </form>
-      {% if answer %}
+      <div id="answer-box" {% if not answer %}style="display:none"{% endif %}>
         <hr>
         <div><b>Assistant:</b></div>
-        <pre class="monospace">{{ answer }}</pre>
-      {% endif %}
+        <pre class="monospace" id="answer">{{ answer or '' }}</pre>
+      </div>
     </div>
   </div>
 
+</div>
+""" + STREAM_SCRIPT
+
+# One row per cohort athlete, plus the cohort as a whole (see cohort.py).
+COHORT_TEMPLATE = """
+<!doctype html>
+<title>WHOOP Cohort</title>
+<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css">
+
+<div class="container-fluid my-4">
+
+  <div class="card mb-3">
+    <div class="card-body">
+      <h5 class="card-title">Cohort <span class="badge text-bg-secondary ms-2">{{ report.users|length }} athletes</span></h5>
+      <form method="post" action="{{ url_for('cohort_page') }}" enctype="multipart/form-data">
+        <div class="row g-2 align-items-center">
+          <div class="col-auto"><input class="form-control" type="file" name="files" accept=".csv" multiple required></div>
+          <div class="col-auto"><button class="btn btn-primary" type="submit">Add exports</button></div>
+          <div class="col-auto"><a class="btn btn-outline-secondary" href="{{ url_for('cohort_json') }}">JSON</a></div>
+          <div class="col-auto"><a class="btn btn-outline-dark" href="{{ url_for('upload_file') }}">Single athlete</a></div>
+        </div>
+      </form>
+      <div class="text-secondary small mt-2">One CSV per athlete; the file name is the athlete, and each upload adds a new one.</div>
+      {% if error %}<div class="text-danger mt-2">{{ error }}</div>{% endif %}
+      {% for user, err in report.errors.items() %}<div class="text-danger small">{{ user }}: {{ err }}</div>{% endfor %}
+    </div>
+  </div>
+
+  {% if report.users %}
+  <div class="card">
+    <div class="card-body">
+      <table class="table table-sm table-striped table-hover">
+        <thead>
+          <tr>
+            <th rowspan="2">Athlete</th><th rowspan="2">Days</th>
+            <th colspan="4">Averages</th>
+            <th colspan="4">Recovery</th>
+            <th colspan="5">Sleep debt percentiles (min)</th>
+            <th colspan="2">Low-recovery streak</th>
+          </tr>
+          <tr>
+            <th>Recovery</th><th>Rest HR</th><th>HRV</th><th>Sleep Perf</th>
+            <th>Low</th><th>Medium</th><th>High</th><th>% low</th>
+            {% for p in report.cohort.sleep_debt_pct %}<th>{{ p }}</th>{% endfor %}
+            <th>Longest</th><th>Current</th>
+          </tr>
+        </thead>
+        <tbody>
+          {% for r in report.users + [report.cohort] %}
+          <tr {% if r is sameas report.cohort %}class="table-primary fw-semibold"{% endif %}>
+            <td>{{ r.user }}</td><td>{{ r.days }}</td>
+            {% for c in ["Recovery_score_", "Resting_heart_rate_(bpm)", "Heart_rate_variability_(ms)", "Sleep_performance_"] %}
+            {% set v = r.means.get(c) %}<td>{{ "–" if v is none else v }}</td>
+            {% endfor %}
+            <td>{{ r.recovery_dist.Low }}</td><td>{{ r.recovery_dist.Medium }}</td><td>{{ r.recovery_dist.High }}</td>
+            <td>{{ "–" if r.low_recovery_pct is none else r.low_recovery_pct }}</td>
+            {% for v in r.sleep_debt_pct.values() %}<td>{{ "–" if v is none else v }}</td>{% endfor %}
+            <td>{{ r.low_streak.longest }}</td><td>{{ r.low_streak.current }}</td>
+          </tr>
+          {% endfor %}
+        </tbody>
+      </table>
+      <div class="text-secondary small">Streaks count consecutive scored cycles with recovery &lt; 50; the cohort row shows the longest of any athlete ({{ report.cohort.in_low_streak }} in a streak now).</div>
+    </div>
+  </div>
+  {% endif %}
+
 </div>
 """
+# Compiled once here, rendered by name (see common/templates.py).
+install_templates(app, {"whoop_genai_3/index.html": TEMPLATE, "whoop_genai_3/cohort.html": COHORT_TEMPLATE})
 
 # ----------------- Routes -----------------
 @app.route('/', methods=['GET', 'POST'])
@@ -324,25 +483,29 @@ def upload_file():
     # Branch A: prompt-only (reuse stored CSV/context)
     if request.method == 'POST' and ('file' not in request.files or request.files['file'].filename == ''):
         prompt = (request.form.get("prompt") or "").strip()
-        csv_path = session.get("csv_path")
+        csv_path = uploads.path(session.get("upload"), session.get("upload_holder"))
         context = session.get("summary_context")
-        if not csv_path or not os.path.exists(csv_path):
-            return render_template_string(TEMPLATE, has_context=False, error="Please upload a CSV first.")
+        if not csv_path:
+            return render_template("whoop_genai_3/index.html", has_context=False, error="Please upload a CSV first.")
         # Rebuild page vars
         page_vars = build_page_from_csv(csv_path, prompt_text=prompt)
         if prompt:
             page_vars["answer"] = call_openai(context or "", prompt)
-        return render_template_string(TEMPLATE, has_context=True, **page_vars)
+        return render_template("whoop_genai_3/index.html", has_context=True, **page_vars)
 
     # Branch B: fresh upload
     if request.method == 'POST' and 'file' in request.files:
         file = request.files['file']
         if file.filename == '':
-            return render_template_string(TEMPLATE, has_context=False, error="No selected file")
+            return render_template("whoop_genai_3/index.html", has_context=False, error="No selected file")
         if file and file.filename.endswith('.csv'):
-            filename = secure_filename(file.filename)
-            csv_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(csv_path)
+            # The session's reference moves to the new upload.
+            holder = session.setdefault("upload_holder", uploads.new_holder())
+            session["upload"] = uploads.put(file.stream, holder)
+            csv_path = uploads.path(session["upload"])
+            if history and not should_stream(csv_path):
+                with span("history"):
+                    history.store(holder).upsert(csv_path)
 
             page_vars = build_page_from_csv(csv_path)
             # Optional immediate prompt on same request
@@ -351,24 +514,116 @@ def upload_file():
                 page_vars["prompt"] = prompt
                 page_vars["answer"] = call_openai(session.get("summary_context",""), prompt)
 
-            return render_template_string(TEMPLATE, has_context=True, **page_vars)
+            return render_template("whoop_genai_3/index.html", has_context=True, **page_vars)
         else:
-            return render_template_string(TEMPLATE, has_context=False, error="Please upload a CSV file.")
+            return render_template("whoop_genai_3/index.html", has_context=False, error="Please upload a CSV file.")
 
     # GET
-    return render_template_string(TEMPLATE, has_context=bool(session.get("summary_context")), error=None)
+    return render_template("whoop_genai_3/index.html", has_context=bool(session.get("summary_context")), error=None)
+
+@app.route("/ask/stream", methods=["GET"])
+def ask_stream():
+    # SSE variant of the prompt form used by the page's script.
+    prompt = (request.args.get("prompt") or "").strip()
+    context = session.get("summary_context")
+    if not context:
+        return stream_error("Please upload a CSV first.")
+    if not llm:
+        return stream_error(NOT_CONFIGURED)
+    if not prompt:
+        return stream_error("Please type a question.")
+    return stream_answer(stream_openai(context, prompt))
+
+@app.route("/cohort", methods=["GET", "POST"])
+def cohort_page():
+    error = None
+    if request.method == "POST":
+        files = [f for f in request.files.getlist("files") if f.filename]
+        if not files or not all(f.filename.endswith(".csv") for f in files):
+            error = "Please upload CSV files."
+        else:
+            for f in files:
+                cohort.add(os.path.splitext(os.path.basename(f.filename))[0], f.stream)
+    return render_template("whoop_genai_3/cohort.html", report=cached_report(cohort.files()), error=error)
+
+@app.route("/cohort.json")
+def cohort_json():
+    return cached_report(cohort.files())
+
+# ----------------- JSON API -----------------
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+CHART_NAMES = ("averages", "low_recovery", "high_sleep_debt")  # chart_specs() keys
+
+def chart_urls(digest):
+    return {name: url_for("api_chart", digest=digest, name=name) for name in CHART_NAMES}
+
+@app.route("/api/v1/whoop/uploads", methods=["POST"])
+def api_upload():
+    # Stored like a page upload but unreferenced: kept as cache until the
+    # upload store's quota evicts it (then the resources 404; POST it again).
+    file = request.files.get("file")
+    if not file or not file.filename.endswith(".csv"):
+        return api_error("Please upload a CSV file (field 'file').", 400)
+    digest = uploads.put(file.stream)
+    summary_url = url_for("api_summary", digest=digest)
+    return json_response({"upload": digest, "summary": summary_url, "charts": chart_urls(digest)}, status=201,
+                         headers={"Location": summary_url})
+
+@app.route("/api/v1/whoop/<digest>/summary")
+def api_summary(digest):
+    if not _DIGEST_RE.match(digest):
+        return api_error("Unknown upload.", 404)
+    etag = etag_for(digest, "summary")
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    model = api_model(digest)
+    if model is None:
+        return api_error("Unknown or expired upload.", 404)
+    return json_response(dict(model["summary"], upload=digest, charts=chart_urls(digest)), etag)
+
+@app.route("/api/v1/whoop/<digest>/charts/<name>.png")
+def api_chart(digest, name):
+    if not _DIGEST_RE.match(digest) or name not in CHART_NAMES:
+        return api_error("Unknown chart.", 404)
+    # Chart ETags also change with the drawing code (charts.STYLE_VERSION).
+    etag = etag_for(digest, "chart", name, STYLE_VERSION)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    model = api_model(digest)
+    if model is None:
+        return api_error("Unknown or expired upload.", 404)
+    with span("charts"):
+        png = base64.b64decode(render_charts([model["charts"][name]])[0])
+    return binary_response(png, "image/png", etag)
 
 @app.route("/clear")
 def clear():
-    for k in ["csv_path", "summary_context"]:
+    uploads.release(session.get("upload_holder"))
+    if history and session.get("upload_holder"):
+        history.drop(session["upload_holder"])
+        baselines.drop(session["upload_holder"])
+    for k in ["upload", "upload_holder", "summary_context"]:
         session.pop(k, None)
     return redirect(url_for("upload_file"))
 
 @app.route("/debug")
 def debug():
+    store = session_history()
     return {
         "has_context": bool(session.get("summary_context")),
-        "csv_path": session.get("csv_path")
+        "upload": session.get("upload"),
+        "uploads": uploads.stats(),
+        "llm": llm.stats() if llm else None,
+        "answer_cache": answer_cache.stats(),
+        "context_tokens": count_tokens(session.get("summary_context") or ""),
+        "prompt_context": dict(prompt_context_stats(), counter=counter_name()),
+        "page_models": page_models.stats(),
+        "api_models": api_models.stats(),
+        "history": dict(history.stats(), session=store.stats()) if store else None,
+        "baselines": baselines.stats(),
+        "stage_ms": metrics_stats(),
     }
 
 if __name__ == '__main__':